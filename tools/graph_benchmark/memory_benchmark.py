@@ -0,0 +1,121 @@
+# Copyright 2018 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import gc
+import json
+import sys
+import uuid
+
+from vitrage.common.constants import EntityCategory
+from vitrage.common.constants import VertexProperties as VProps
+from vitrage.graph import utils as graph_utils
+
+"""
+Graph Elements Memory Benchmark:
+
+Measures the memory held by the vertices the transformers create, comparing
+the compact vertices (__slots__ and interned property keys and values) to
+plain vertices that keep a __dict__ and the strings decoded from the events.
+
+Usage: 'python memory_benchmark.py [NUM_OF_VERTICES]' (python 3 only, it uses
+tracemalloc). The default is 100,000 vertices.
+"""
+
+DEFAULT_VERTICES_NUM = 100000
+VITRAGE_TYPES = ['nova.host', 'nova.instance', 'nova.zone', 'neutron.port',
+                 'neutron.network', 'cinder.volume']
+STATES = ['ACTIVE', 'AVAILABLE', 'ERROR', 'SUSPENDED']
+PROJECTS_NUM = 20
+
+
+class LegacyVertex(object):
+    """A vertex with a __dict__, as the graph elements used to be"""
+
+    def __init__(self, vertex_id, properties=None):
+        self.properties = properties
+        self.vertex_id = vertex_id
+
+
+def _create_events(num):
+    """Json encoded events, decoded into new strings on every use"""
+    projects = [str(uuid.uuid4()) for _ in range(PROJECTS_NUM)]
+    for i in range(num):
+        yield json.dumps({
+            'vitrage_id': str(uuid.uuid4()),
+            'entity_id': str(uuid.uuid4()),
+            'name': 'entity-%s' % i,
+            'vitrage_category': EntityCategory.RESOURCE,
+            'vitrage_type': VITRAGE_TYPES[i % len(VITRAGE_TYPES)],
+            'state': STATES[i % len(STATES)],
+            'project_id': projects[i % PROJECTS_NUM],
+            'update_timestamp': '2018-01-01 10:00:%02d.000000' % (i % 60),
+            'host_name': 'compute-%s' % (i % 100),
+        })
+
+
+def _create_legacy_vertex(event):
+    properties = json.loads(event)
+    properties[VProps.VITRAGE_IS_DELETED] = False
+    properties[VProps.VITRAGE_IS_PLACEHOLDER] = False
+    return LegacyVertex(properties['vitrage_id'], properties)
+
+
+def _create_compact_vertex(event):
+    properties = json.loads(event)
+    return graph_utils.create_vertex(
+        properties.pop('vitrage_id'),
+        vitrage_category=properties.pop('vitrage_category'),
+        vitrage_type=properties.pop('vitrage_type'),
+        entity_id=properties.pop('entity_id'),
+        entity_state=properties.pop('state'),
+        update_timestamp=properties.pop('update_timestamp'),
+        project_id=properties.pop('project_id'),
+        metadata=properties)
+
+
+def measure(create_vertex, num):
+    """The memory in bytes held by num vertices"""
+    import tracemalloc
+
+    events = list(_create_events(num))
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    vertices = [create_vertex(event) for event in events]
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del vertices
+    return after - before
+
+
+def main():
+    if sys.version_info < (3, 4):
+        print('The memory benchmark requires python 3.4 or later')
+        return 1
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_VERTICES_NUM
+
+    legacy = measure(_create_legacy_vertex, num)
+    compact = measure(_create_compact_vertex, num)
+
+    print('Vertices:          %d' % num)
+    print('Legacy vertices:   %.1f MB' % (legacy / 1024.0 / 1024))
+    print('Compact vertices:  %.1f MB' % (compact / 1024.0 / 1024))
+    print('Saved per 100k:    %.1f MB (%d%%)' %
+          (float(legacy - compact) * 100000 / num / 1024 / 1024,
+           100 * (legacy - compact) // legacy))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
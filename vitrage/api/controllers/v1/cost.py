@@ -0,0 +1,51 @@
+# Copyright 2018 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+import pecan
+
+from oslo_log import log
+from oslo_utils import encodeutils
+from pecan.core import abort
+
+from vitrage.api.controllers.rest import RootRestController
+from vitrage.api.policy import enforce
+
+
+LOG = log.getLogger(__name__)
+
+
+class CostsController(RootRestController):
+
+    @pecan.expose('json')
+    def index(self):
+        return self.get()
+
+    @pecan.expose('json')
+    def get(self):
+        enforce("template costs", pecan.request.headers,
+                pecan.request.enforcer, {})
+
+        LOG.info('received get scenario costs')
+
+        try:
+            costs_json = pecan.request.client.call(
+                pecan.request.context, 'get_scenario_costs')
+
+            return json.loads(costs_json)['costs']
+
+        except Exception as e:
+            to_unicode = encodeutils.exception_to_unicode(e)
+            LOG.exception('failed to get scenario costs %s', to_unicode)
+            abort(404, to_unicode)
@@ -20,6 +20,7 @@ from osprofiler import profiler
 from pecan.core import abort
 
 from vitrage.api.controllers.rest import RootRestController
+from vitrage.api.controllers.v1 import cost
 from vitrage.api.policy import enforce
 from vitrage.common.constants import TemplateStatus as TStatus
 from vitrage.common.exception import VitrageError
@@ -30,6 +31,7 @@ LOG = log.getLogger(__name__)
 @profiler.trace_cls("template controller",
                     info={}, hide_args=False, trace_private=False)
 class TemplateController(RootRestController):
+    costs = cost.CostsController()
 
     @pecan.expose('json')
     def get_all(self):
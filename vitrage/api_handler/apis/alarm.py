@@ -86,7 +86,7 @@ class AlarmApis(EntityGraphApisBase):
 
         if all_tenants:
             alarms = self.entity_graph.get_vertices(
-                query_dict=ALARMS_ALL_QUERY)
+                query_dict=ALARMS_ALL_QUERY, read_only=True)
         else:
             alarms = self._get_alarms(project_id, is_admin_project)
             alarms += self._get_alarms_via_resource(project_id,
@@ -162,7 +162,8 @@ class EntityGraphApisBase(object):
                 cat_filter = {VProps.VITRAGE_CATEGORY: EntityCategory.RESOURCE}
                 alarms_resource = \
                     self.entity_graph.neighbors(alarm.vertex_id,
-                                                vertex_attr_filter=cat_filter)
+                                                vertex_attr_filter=cat_filter,
+                                                read_only=True)
                 if len(alarms_resource) > 0:
                     resource_project_id = \
                         alarms_resource[0].get(VProps.PROJECT_ID, None)
@@ -199,7 +200,8 @@ class EntityGraphApisBase(object):
             return True
         else:
             entities = self.entity_graph.neighbors(entity.vertex_id,
-                                                   direction=Direction.OUT)
+                                                   direction=Direction.OUT,
+                                                   read_only=True)
             for entity in entities:
                 if entity[VProps.VITRAGE_CATEGORY] == EntityCategory.RESOURCE:
                     resource_project_id = entity.get(VProps.PROJECT_ID)
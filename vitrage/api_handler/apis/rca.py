@@ -133,9 +133,11 @@ class RcaApis(EntityGraphApisBase):
         current_entity_id = root_id
 
         while len(rca_graph.neighbors(current_entity_id,
-                                      direction=Direction.IN)) > 0:
+                                      direction=Direction.IN,
+                                      read_only=True)) > 0:
             current_entity = rca_graph.neighbors(current_entity_id,
-                                                 direction=Direction.IN)[0]
+                                                 direction=Direction.IN,
+                                                 read_only=True)[0]
             current_entity_id = current_entity.vertex_id
             entities.append(current_entity.vertex_id)
             if not self._is_alarm_of_current_project(current_entity,
@@ -147,7 +149,8 @@ class RcaApis(EntityGraphApisBase):
 
     @staticmethod
     def _find_rca_index(found_graph, root):
-        for root_index, vertex in enumerate(found_graph._g):
-            if vertex == root:
+        for root_index, vertex in enumerate(
+                found_graph.get_vertices(read_only=True)):
+            if vertex.vertex_id == root:
                 return root_index
         return 0
@@ -92,6 +92,18 @@ class TemplateApis(object):
             self.notifier.notify("delete template",
                                  {'template_action': 'delete'})
 
+    def get_scenario_costs(self, ctx):
+        """The evaluation costs of the scenarios, the most costly first
+
+        The costs are measured by all the evaluator workers, and stored every
+        [evaluator] scenario_costs_interval seconds.
+        """
+        LOG.debug("TemplateApis get_scenario_costs")
+
+        costs = sorted(self.db.scenario_costs.query(),
+                       key=lambda cost: cost.duration, reverse=True)
+        return json.dumps({'costs': [_db_cost_to_dict(c) for c in costs]})
+
 
 def _to_result(result, template_path):
     if result.is_valid_config:
@@ -121,3 +133,13 @@ def _db_template_to_dict(template):
         "status details": template.status_details,
         "type": template.template_type,
     }
+
+
+def _db_cost_to_dict(cost):
+    return {
+        "scenario id": cost.scenario_id,
+        "evaluations": cost.evaluations,
+        "matches": cost.matches,
+        "actions": cost.actions,
+        "duration": cost.duration,
+    }
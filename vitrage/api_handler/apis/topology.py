@@ -161,7 +161,8 @@ class TopologyApis(EntityGraphApisBase):
                 cat_filter = {VProps.VITRAGE_CATEGORY: EntityCategory.RESOURCE}
                 resource_neighbors = \
                     self.entity_graph.neighbors(alarm.vertex_id,
-                                                vertex_attr_filter=cat_filter)
+                                                vertex_attr_filter=cat_filter,
+                                                read_only=True)
                 if len(resource_neighbors) > 0:
                     resource_proj_id = \
                         resource_neighbors[0].get(VProps.PROJECT_ID, None)
@@ -187,7 +188,7 @@ class TopologyApis(EntityGraphApisBase):
         3. Unify all the entities found and return them
 
         :type ga: NXAlgorithm
-        :type subgraph: networkx graph
+        :type subgraph: NXGraph
         :type root: string
         :rtype: list
         """
@@ -201,7 +202,8 @@ class TopologyApis(EntityGraphApisBase):
             ga.connected_component_subgraphs(subgraph)
 
         for component_subgraph in local_connected_component_subgraphs:
-            entities += list(component_subgraph.nodes())
+            entities += [v.vertex_id for v in
+                         component_subgraph.get_vertices(read_only=True)]
             instance_in_component_subgraph = \
                 self._find_instance_in_graph(component_subgraph)
             if instance_in_component_subgraph:
@@ -224,10 +226,10 @@ class TopologyApis(EntityGraphApisBase):
 
     @staticmethod
     def _find_instance_in_graph(graph):
-        for node, node_data in graph.nodes(data=True):
-            if node_data[VProps.VITRAGE_CATEGORY] == \
+        for vertex in graph.get_vertices(read_only=True):
+            if vertex[VProps.VITRAGE_CATEGORY] == \
                     EntityCategory.RESOURCE \
-                    and node_data[VProps.VITRAGE_TYPE] == \
+                    and vertex[VProps.VITRAGE_TYPE] == \
                     NOVA_INSTANCE_DATASOURCE:
-                return node
+                return vertex.vertex_id
         return None
@@ -71,6 +71,17 @@ rules = [
                 'method': 'GET'
             }
         ]
+    ),
+    policy.DocumentedRuleDefault(
+        name=TEMPLATE % 'costs',
+        check_str=base.ROLE_ADMIN,
+        description='Show the evaluation costs of the template scenarios',
+        operations=[
+            {
+                'path': '/template/costs',
+                'method': 'GET'
+            }
+        ]
     )
 ]
 
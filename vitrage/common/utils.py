@@ -18,6 +18,7 @@
 # under the License.
 from collections import defaultdict
 import copy
+import heapq
 import itertools
 import random
 import threading
@@ -82,6 +83,32 @@ def get_portion(lst, num_of_portions, portion_index):
     return portions[portion_index]
 
 
+def get_balanced_portion(lst, weights, num_of_portions, portion_index):
+    """Split a list into n slices of balanced weight, return the i'th slice
+
+    The heaviest items are added first, each to the slice that is lightest
+    at the time. Items of equal weight keep their order in the list, so the
+    same list and weights always give the same slices.
+
+    :param weights: the weight of each item, by its index in the list
+    :rtype: list
+    """
+    if num_of_portions < 1 or portion_index < 0 or \
+            portion_index >= num_of_portions:
+        raise Exception('Cannot get_balanced_portion %s %s',
+                        str(num_of_portions),
+                        str(portion_index))
+
+    order = sorted(range(len(lst)), key=lambda i: -weights[i])
+    portions = defaultdict(list)
+    loads = [(0, i) for i in range(num_of_portions)]
+    for item_index in order:
+        load, curr_portion = heapq.heappop(loads)
+        portions[curr_portion].append(lst[item_index])
+        heapq.heappush(loads, (load + weights[item_index], curr_portion))
+    return portions[portion_index]
+
+
 def spawn(target, *args, **kwargs):
     t = threading.Thread(target=target, args=args, kwargs=kwargs)
     t.daemon = True
@@ -29,7 +29,9 @@ OPTS = [
                     'notification messages.'),
     cfg.StrOpt('graph_driver',
                default='networkx',
-               help='graph driver implementation class'),
+               help='graph driver implementation class. "networkx" keeps the '
+                    'graph in a networkx MultiDiGraph, "compact" keeps it in '
+                    'array based storage that takes less memory'),
 ]
 
 EVALUATOR_TOPIC = 'vitrage.evaluator'
@@ -39,7 +41,7 @@ def get_graph_driver(conf):
     try:
         mgr = driver.DriverManager('vitrage.entity_graph',
                                    conf.entity_graph.graph_driver,
-                                   invoke_on_load=True)
+                                   invoke_on_load=False)
         return mgr.driver
     except ImportError:
         return None
@@ -37,8 +37,10 @@ class VitrageGraphInit(object):
             conf,
             self.process_event,
             conf.datasources.notification_topic_collector,
-            EVALUATOR_TOPIC)
-        self.scheduler = Scheduler(conf, graph, self.events_coordination)
+            EVALUATOR_TOPIC,
+            batch_func=graph.batch)
+        self.scheduler = Scheduler(conf, graph, self.events_coordination,
+                                   self.workers)
         self.processor = Processor(conf, graph, self.scheduler.graph_persistor)
 
     def run(self):
@@ -58,20 +60,27 @@ class VitrageGraphInit(object):
 
     def process_event(self, event):
         if event.get('template_action'):
-            self.workers.submit_template_event(event)
-            self.workers.submit_evaluators_reload_templates()
+            template_ids = self.workers.submit_template_event(event)
+            self.workers.submit_evaluators_reload_templates(template_ids)
         else:
             self.processor.process_event(event)
 
 
 PRIORITY_DELAY = 0.05
+# Snapshot events are processed in batches of this size, see Graph.batch
+EVENTS_BATCH_SIZE = 200
 
 
 class EventsCoordination(object):
-    def __init__(self, conf, do_work_func, topic_low, topic_high):
+    def __init__(self, conf, do_work_func, topic_low, topic_high,
+                 batch_func=None):
         self._conf = conf
         self._lock = threading.Lock()
         self._high_event_finish_time = 0
+        # high priority events waiting for the lock
+        self._high_events_waiting = 0
+        self._waiting_lock = threading.Lock()
+        self._batch_func = batch_func
 
         def do_work(event):
             try:
@@ -101,25 +110,59 @@ class EventsCoordination(object):
         self._high_pri_listener.wait()
 
     def _do_high_priority_work(self, event):
+        with self._waiting_lock:
+            self._high_events_waiting += 1
         self._lock.acquire()
+        with self._waiting_lock:
+            self._high_events_waiting -= 1
         self._do_work_func(event)
         self._high_event_finish_time = time.time()
         self._lock.release()
 
     def _do_low_priority_work(self, event):
+        self._acquire_low_priority()
+        self._do_work_func(event)
+        self._lock.release()
+
+    def _do_low_priority_batch(self, events):
+        """Process the events with coalesced graph notifications
+
+        The batch ends early when a high priority event is waiting, so it
+        waits for one low priority event at most, and the rest of the events
+        are processed in another batch.
+        """
+        while events:
+            self._acquire_low_priority()
+            try:
+                with self._batch_func():
+                    done = 0
+                    for event in events:
+                        self._do_work_func(event)
+                        done += 1
+                        if self._high_events_waiting:
+                            break
+                    events = events[done:]
+            finally:
+                self._lock.release()
+
+    def _acquire_low_priority(self):
         while True:
             self._lock.acquire()
-            if (time.time() - self._high_event_finish_time) < PRIORITY_DELAY:
+            if self._high_events_waiting or \
+                    (time.time() - self._high_event_finish_time) < \
+                    PRIORITY_DELAY:
                 self._lock.release()
                 time.sleep(PRIORITY_DELAY)
             else:
                 break
-        self._do_work_func(event)
-        self._lock.release()
 
     def handle_multiple_low_priority(self, events):
-        for e in events:
-            self._do_low_priority_work(e)
+        if not self._batch_func:
+            for e in events:
+                self._do_low_priority_work(e)
+            return
+        for i in range(0, len(events), EVENTS_BATCH_SIZE):
+            self._do_low_priority_batch(events[i:i + EVENTS_BATCH_SIZE])
 
     def _init_listener(self, topic, callback):
         if not topic:
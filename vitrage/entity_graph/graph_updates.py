@@ -0,0 +1,125 @@
+# Copyright 2018 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Graph updates, as sent from the entity graph to the graph workers
+
+A batch of graph changes is encoded once, and the same bytes are sent to
+all the workers. Each change holds only the properties that changed and
+the properties that were removed, since the graph of the worker already
+holds the element as it was before the change. Property names repeat
+along the batch, and are pickled once per batch.
+"""
+from six.moves import cPickle
+
+from vitrage.graph.driver.elements import Edge
+from vitrage.graph.driver.elements import Vertex
+
+
+def encode_updates(updates):
+    """Encode a batch of graph changes
+
+    :param updates: (before, current, is_vertex) of every change
+    :type updates: list of tuple
+    :rtype: bytes
+    """
+    return cPickle.dumps([_encode(before, current, is_vertex)
+                          for before, current, is_vertex in updates],
+                         cPickle.HIGHEST_PROTOCOL)
+
+
+def apply_updates(graph, data, is_notified=None):
+    """Apply a batch of encoded graph changes to the graph
+
+    :type graph: driver.Graph
+    :type data: bytes
+    :param is_notified: called with (element, is_vertex). If it returns
+     False for the element both before and after the change, the change is
+     applied without notifying the graph subscribers
+    :type is_notified: function
+    """
+    for is_vertex, element_id, changed, removed in cPickle.loads(data):
+        if is_vertex:
+            element = graph.get_vertex(element_id)
+        else:
+            element = graph.get_edge(*element_id)
+
+        if changed is None:
+            if element is None:
+                continue
+            elif is_vertex:
+                graph.remove_vertex(element)
+            else:
+                graph.remove_edge(element)
+            continue
+
+        notify = is_notified is None or \
+            (element is not None and is_notified(element, is_vertex))
+        if element is None:
+            # A new element, its properties are all in the changed ones
+            element = delta = _new_element(element_id, is_vertex, changed)
+            update = _add
+        else:
+            # update_vertex and update_edge delete the properties set to
+            # None, while add_vertex and add_edge would keep them
+            delta_props = dict(changed)
+            delta_props.update((key, None) for key in removed)
+            delta = _new_element(element_id, is_vertex, delta_props)
+            update = _update
+            element.properties.update(changed)
+            for key in removed:
+                element.properties.pop(key, None)
+        notify = notify or is_notified(element, is_vertex)
+
+        if notify:
+            update(graph, delta, is_vertex)
+        else:
+            with graph.muted():
+                update(graph, delta, is_vertex)
+
+
+def _new_element(element_id, is_vertex, properties):
+    if is_vertex:
+        return Vertex(element_id, properties)
+    return Edge(*element_id, properties=properties)
+
+
+def _add(graph, element, is_vertex):
+    if is_vertex:
+        graph.add_vertex(element)
+    else:
+        graph.add_edge(element)
+
+
+def _update(graph, element, is_vertex):
+    if is_vertex:
+        graph.update_vertex(element)
+    else:
+        graph.update_edge(element)
+
+
+def _encode(before, current, is_vertex):
+    element = current if current is not None else before
+    if is_vertex:
+        element_id = element.vertex_id
+    else:
+        element_id = (element.source_id, element.target_id, element.label)
+
+    if current is None:
+        return is_vertex, element_id, None, None
+
+    before_props = before.properties or {} if before is not None else {}
+    current_props = current.properties or {}
+    changed = {key: value for key, value in current_props.items()
+               if key not in before_props or before_props[key] != value}
+    removed = [key for key in before_props if key not in current_props]
+    return is_vertex, element_id, changed, removed
@@ -80,8 +80,10 @@ class Processor(processor.ProcessorBase):
         LOG.debug('Add entity to entity graph:\n%s', new_vertex)
 
         self._add_resource_details_to_alarm(new_vertex, neighbors)
-        self.entity_graph.add_vertex(new_vertex)
-        self._connect_neighbors(neighbors, set(), GraphAction.CREATE_ENTITY)
+        with self.entity_graph.batch():
+            self.entity_graph.add_vertex(new_vertex)
+            self._connect_neighbors(neighbors, set(),
+                                    GraphAction.CREATE_ENTITY)
 
     def update_entity(self, updated_vertex, neighbors):
         """Updates the vertex in the entity graph
@@ -103,10 +105,11 @@ class Processor(processor.ProcessorBase):
         if (not graph_vertex) or \
                 PUtils.is_newer_vertex(graph_vertex, updated_vertex):
             self._add_resource_details_to_alarm(updated_vertex, neighbors)
-            PUtils.update_entity_graph_vertex(self.entity_graph,
-                                              graph_vertex,
-                                              updated_vertex)
-            self._update_neighbors(updated_vertex, neighbors)
+            with self.entity_graph.batch():
+                PUtils.update_entity_graph_vertex(self.entity_graph,
+                                                  graph_vertex,
+                                                  updated_vertex)
+                self._update_neighbors(updated_vertex, neighbors)
         else:
             LOG.warning("Update event arrived on invalid resource: %s",
                         updated_vertex)
@@ -134,13 +137,15 @@ class Processor(processor.ProcessorBase):
             neighbor_edges = self.entity_graph.get_edges(
                 deleted_vertex.vertex_id)
 
-            for edge in neighbor_edges:
-                PUtils.mark_deleted(self.entity_graph, edge)
+            with self.entity_graph.batch():
+                for edge in neighbor_edges:
+                    PUtils.mark_deleted(self.entity_graph, edge)
 
-            for vertex in neighbor_vertices:
-                PUtils.delete_placeholder_vertex(self.entity_graph, vertex)
+                for vertex in neighbor_vertices:
+                    PUtils.delete_placeholder_vertex(self.entity_graph,
+                                                     vertex)
 
-            PUtils.mark_deleted(self.entity_graph, deleted_vertex)
+                PUtils.mark_deleted(self.entity_graph, deleted_vertex)
         else:
             LOG.warning("Delete event arrived on invalid resource: "
                         "deleted_vertex - %s, graph_vertex - %s",
@@ -63,11 +63,13 @@ def delete_placeholder_vertex(g, vertex):
     """Checks if it is a placeholder vertex, and if so deletes it """
 
     LOG.debug('Asked to delete a placeholder vertex: %s with %d neighbors',
-              str(vertex), len(g.get_edges(vertex.vertex_id)))
+              str(vertex),
+              len(g.get_edges(vertex.vertex_id, read_only=True)))
 
     if not vertex[VProps.VITRAGE_IS_PLACEHOLDER]:
         return
-    if not any(True for neighbor_edge in g.get_edges(vertex.vertex_id)
+    if not any(True for neighbor_edge in g.get_edges(vertex.vertex_id,
+                                                     read_only=True)
                if not is_deleted(neighbor_edge)):
         LOG.debug("Delete placeholder vertex: %s", vertex)
         g.remove_vertex(vertex)
@@ -30,11 +30,12 @@ LOG = log.getLogger(__name__)
 
 class Scheduler(object):
 
-    def __init__(self, conf, graph, events_coordination):
+    def __init__(self, conf, graph, events_coordination, workers=None):
         super(Scheduler, self).__init__()
         self.conf = conf
         self.graph = graph
         self.events_coordination = events_coordination
+        self.workers = workers
         self.graph_persistor = GraphPersistor(conf) if \
             self.conf.persistency.enable_persistency else None
         self.consistency = ConsistencyEnforcer(conf, graph)
@@ -47,6 +48,7 @@ class Scheduler(object):
         self.add_persist_timer()
         self.add_consistency_timer()
         self.add_rpc_datasources_timers()
+        self.add_scenario_costs_timer()
         spawn(self.periodic.start)
 
     def add_persist_timer(self):
@@ -78,6 +80,21 @@ class Scheduler(object):
         self.periodic.add(consistency_periodic)
         LOG.info("added consistency_periodic (spacing=%s)", spacing)
 
+    def add_scenario_costs_timer(self):
+        if not self.workers:
+            return
+        spacing = self.conf.evaluator.scenario_costs_interval
+
+        @periodics.periodic(spacing=spacing)
+        def scenario_costs_periodic():
+            try:
+                self.workers.submit_flush_scenario_costs()
+            except Exception as e:
+                LOG.exception('flush scenario costs failed %s', e)
+
+        self.periodic.add(scenario_costs_periodic)
+        LOG.info("added scenario_costs_periodic (spacing=%s)", spacing)
+
     def add_rpc_datasources_timers(self):
         spacing = self.conf.datasources.snapshots_interval
         rpc_client = ds_rpc.create_rpc_client_instance(self.conf)
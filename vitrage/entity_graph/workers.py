@@ -12,16 +12,23 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 import abc
+from collections import deque
 import cotyledon
 import multiprocessing
+from six.moves import queue
+import threading
 
 from oslo_concurrency import processutils as ps
 from oslo_log import log
+from oslo_utils import uuidutils
 
 from vitrage.common.constants import TemplateStatus as TStatus
 from vitrage.common.constants import TemplateTypes as TType
 from vitrage.common.exception import VitrageError
+from vitrage.common.utils import spawn
 from vitrage.entity_graph import EVALUATOR_TOPIC
+from vitrage.entity_graph.graph_updates import apply_updates
+from vitrage.entity_graph.graph_updates import encode_updates
 from vitrage.evaluator.actions.base import ActionMode
 from vitrage.evaluator.scenario_evaluator import ScenarioEvaluator
 from vitrage.evaluator.scenario_repository import ScenarioRepository
@@ -33,11 +40,26 @@ LOG = log.getLogger(__name__)
 GRAPH_UPDATE = 'graph_update'
 START_EVALUATION = 'start_evaluation'
 RELOAD_TEMPLATES = 'reload_templates'
+FLUSH_SCENARIO_COSTS = 'flush_scenario_costs'
+FLUSH_ACTIVE_ACTIONS = 'flush_active_actions'
 TEMPLATE_ACTION = 'template_action'
+BARRIER = 'barrier'
 
 ADD = 'add'
 DELETE = 'delete'
 
+# Graph updates are sent to the workers in batches of up to
+# GRAPH_UPDATES_BATCH_SIZE changes, with up to GRAPH_UPDATES_WINDOW batches
+# not yet processed by each worker. When MAX_PENDING_GRAPH_UPDATES changes
+# are waiting to be sent, the graph waits for the workers.
+GRAPH_UPDATES_BATCH_SIZE = 100
+GRAPH_UPDATES_WINDOW = 10
+MAX_PENDING_GRAPH_UPDATES = 10000
+
+# The first template worker waits up to TEMPLATE_SWEEP_TIMEOUT seconds for
+# the sweep of each other template worker
+TEMPLATE_SWEEP_TIMEOUT = 600
+
 
 class GraphWorkersManager(cotyledon.ServiceManager):
     """GraphWorkersManager
@@ -45,6 +67,10 @@ class GraphWorkersManager(cotyledon.ServiceManager):
      - worker processes
      - the queues used to communicate with these workers
      - methods interface to submit tasks to workers
+
+    Graph updates are sent to the workers in numbered batches, without
+    waiting for the workers to process them. Other tasks wait until the
+    workers processed them, and all the graph updates before them.
     """
     def __init__(self, conf, entity_graph, db):
         super(GraphWorkersManager, self).__init__()
@@ -54,6 +80,12 @@ class GraphWorkersManager(cotyledon.ServiceManager):
         self._evaluator_queues = []
         self._template_queues = []
         self._all_queues = []
+        self._all_windows = []
+        self._pending = deque()
+        self._pending_updates = 0
+        self._pending_condition = threading.Condition()
+        self._sender = None
+        self._sequence = 0
         self.add_evaluator_workers()
         self.add_template_workers()
 
@@ -68,16 +100,20 @@ class GraphWorkersManager(cotyledon.ServiceManager):
         submit_graph_update(..)
         submit_start_evaluations(..)
         submit_evaluators_reload_templates(..)
+        submit_flush_scenario_costs(..)
         """
         if self._evaluator_queues:
             raise VitrageError('add_evaluator_workers called more than once')
         workers = self._conf.evaluator.workers or ps.get_worker_count()
         queues = [multiprocessing.JoinableQueue() for i in range(workers)]
+        windows = self._create_windows(workers)
         self.add(EvaluatorWorker,
-                 args=(self._conf, queues, self._entity_graph, workers),
+                 args=(self._conf, queues, windows, self._entity_graph,
+                       workers),
                  workers=workers)
         self._evaluator_queues = queues
         self._all_queues.extend(queues)
+        self._all_windows.extend(windows)
 
     def add_template_workers(self):
         """Add template workers
@@ -86,20 +122,26 @@ class GraphWorkersManager(cotyledon.ServiceManager):
         Each template worker holds a disabled scenario-evaluator that does
         not process changes.
         The scenario-evaluator is enabled when a template add/delete arrives,
-        so this worker will run the added template on the entire graph.
+        so these workers will run the added template on the entire graph.
+        Each template worker evaluates a portion of the graph, and the first
+        one executes the actions of all of them.
         Interface to these workers is:
         submit_graph_update(..)
         submit_template_event(..)
         """
         if self._template_queues:
             raise VitrageError('add_template_workers called more than once')
-        workers = 1  # currently more than one worker is not supported
+        workers = self._conf.evaluator.template_workers
         queues = [multiprocessing.JoinableQueue() for i in range(workers)]
+        windows = self._create_windows(workers)
+        sweeps = multiprocessing.Queue()
         self.add(TemplateLoaderWorker,
-                 args=(self._conf, queues, self._entity_graph),
+                 args=(self._conf, queues, windows, self._entity_graph,
+                       workers, sweeps),
                  workers=workers)
         self._template_queues = queues
         self._all_queues.extend(queues)
+        self._all_windows.extend(windows)
 
     def submit_graph_update(self, before, current, is_vertex, *args, **kwargs):
         """Graph update all workers
@@ -107,10 +149,15 @@ class GraphWorkersManager(cotyledon.ServiceManager):
         This method is subscribed to entity graph changes.
         Per each change in the main entity graph, this method will notify
          each of the workers, causing them to update their own graph.
+        The change is sent later, in a batch, and this method does not wait
+        for the workers unless too many changes are waiting to be sent.
         """
-        self._submit_and_wait(
-            self._all_queues,
-            (GRAPH_UPDATE, before, current, is_vertex))
+        with self._pending_condition:
+            while self._pending_updates >= MAX_PENDING_GRAPH_UPDATES:
+                self._pending_condition.wait()
+            self._pending.append((GRAPH_UPDATE, (before, current, is_vertex)))
+            self._pending_updates += 1
+            self._notify_sender()
 
     def submit_start_evaluations(self):
         """Enable scenario-evaluator in all evaluator workers
@@ -121,17 +168,43 @@ class GraphWorkersManager(cotyledon.ServiceManager):
         self._entity_graph.subscribe(self.submit_graph_update)
         LOG.info('Init Finished')
 
-    def submit_evaluators_reload_templates(self):
-        """Recreate the scenario-repository in all evaluator workers
+    def submit_evaluators_reload_templates(self, template_ids=None):
+        """Update the scenario-repository in all evaluator workers
 
         So that new/deleted templates are added/removed
+        Only the templates of template_ids are loaded or unloaded, and if it
+        is None the scenario-repository is recreated.
+        The scenario costs are stored first, so that all the workers
+        balance the scenarios by the same costs, and so are the active
+        actions, so that all the workers reload the same active actions.
+        """
+        self.submit_flush_scenario_costs()
+        self.submit_flush_active_actions()
+        self._submit_and_wait(self._evaluator_queues,
+                              (RELOAD_TEMPLATES, template_ids))
+
+    def submit_flush_scenario_costs(self):
+        """Store the scenario costs measured by all evaluator workers
+
+        The costs are only stored this way, and never while the workers
+        reload the templates.
+        """
+        self._submit_and_wait(self._evaluator_queues, (FLUSH_SCENARIO_COSTS,))
+
+    def submit_flush_active_actions(self):
+        """Write the active actions changes of all evaluator workers
+
+        The actions held by their dampers are executed first. Called before
+        the active actions are loaded again, by the evaluator workers or by
+        the template workers.
         """
-        self._submit_and_wait(self._evaluator_queues, (RELOAD_TEMPLATES,))
+        self._submit_and_wait(self._evaluator_queues, (FLUSH_ACTIVE_ACTIONS,))
 
     def submit_template_event(self, event):
         """Template worker to load the new/deleted template
 
         Load the template to scenario-evaluator and run it on the entire graph
+        :return: the uuids of the new/deleted templates
         """
         template_action = event.get(TEMPLATE_ACTION)
 
@@ -146,6 +219,7 @@ class GraphWorkersManager(cotyledon.ServiceManager):
         else:
             raise VitrageError('Invalid template_action %s' % template_action)
 
+        self.submit_flush_active_actions()
         self._submit_and_wait(
             self._template_queues,
             (
@@ -153,17 +227,78 @@ class GraphWorkersManager(cotyledon.ServiceManager):
                 [t.name for t in templates
                  if t.template_type == TType.STANDARD],
                 action_mode,
+                uuidutils.generate_uuid(),
             ))
 
         for t in templates:
             self._db.templates.update(t.uuid, 'status', new_status)
+        return [t.uuid for t in templates]
+
+    def _submit_and_wait(self, queues, payload):
+        """Send the payload after the pending graph updates, and wait
+
+        Waits until the workers processed the payload, and everything that
+        was sent to them before it.
+        """
+        done = threading.Event()
+        with self._pending_condition:
+            self._pending.append((BARRIER, (queues, payload, done)))
+            self._notify_sender()
+        done.wait()
 
     @staticmethod
-    def _submit_and_wait(queues, payload):
-        for q in queues:
-            q.put(payload)
-        for q in queues:
-            q.join()
+    def _create_windows(workers):
+        return [multiprocessing.Semaphore(GRAPH_UPDATES_WINDOW)
+                for i in range(workers)]
+
+    def _notify_sender(self):
+        if self._sender is None:
+            self._sender = spawn(self._send_pending)
+        self._pending_condition.notify_all()
+
+    def _send_pending(self):
+        """Send the pending graph updates and barriers, in order"""
+        while True:
+            with self._pending_condition:
+                while not self._pending:
+                    self._pending_condition.wait()
+                is_barrier = self._pending[0][0] == BARRIER
+            try:
+                if is_barrier:
+                    self._send_barrier()
+                else:
+                    self._send_graph_updates()
+            except Exception as e:
+                LOG.exception("Graph may not be in sync: exception %s", e)
+
+    def _send_barrier(self):
+        with self._pending_condition:
+            queues, payload, done = self._pending.popleft()[1]
+        try:
+            for q in queues:
+                q.put(payload)
+            for q in queues:
+                q.join()
+        finally:
+            done.set()
+
+    def _send_graph_updates(self):
+        # while waiting for the workers, more updates join the batch
+        for window in self._all_windows:
+            window.acquire()
+        with self._pending_condition:
+            updates = []
+            while self._pending and self._pending[0][0] == GRAPH_UPDATE \
+                    and len(updates) < GRAPH_UPDATES_BATCH_SIZE:
+                updates.append(self._pending.popleft()[1])
+            self._pending_updates -= len(updates)
+            self._sequence += 1
+            sequence = self._sequence
+            self._pending_condition.notify_all()
+        # encoded once for all the workers
+        data = encode_updates(updates)
+        for q in self._all_queues:
+            q.put((GRAPH_UPDATE, sequence, data))
 
 
 class GraphCloneWorkerBase(cotyledon.Service):
@@ -171,12 +306,15 @@ class GraphCloneWorkerBase(cotyledon.Service):
                  worker_id,
                  conf,
                  task_queues,
+                 task_windows,
                  entity_graph):
         super(GraphCloneWorkerBase, self).__init__(worker_id)
         self._conf = conf
         self._task_queue = task_queues[worker_id]
+        self._task_window = task_windows[worker_id]
         self._entity_graph = entity_graph
         self._running = False
+        self._sequence = 0
 
     name = 'GraphCloneWorkerBase'
 
@@ -188,7 +326,7 @@ class GraphCloneWorkerBase(cotyledon.Service):
     def run(self):
         LOG.info("%s - Starting %s", self.__class__.__name__, self.worker_id)
         self._running = True
-        self._entity_graph.notifier._subscriptions = []  # Quick n dirty
+        self._entity_graph.unsubscribe_all()
         self._init_instance()
         self._read_queue()
 
@@ -200,30 +338,47 @@ class GraphCloneWorkerBase(cotyledon.Service):
         LOG.debug("%s - reading queue %s",
                   self.__class__.__name__, self.worker_id)
         while self._running:
+            next_task = None
             try:
                 next_task = self._task_queue.get()
                 self.do_task(next_task)
             except Exception as e:
                 LOG.exception("Graph may not be in sync: exception %s", e)
-            self._task_queue.task_done()
+            finally:
+                self._task_finished(next_task)
+
+    def _task_finished(self, task):
+        """Free the window slot of a graph update, and mark the task done
+
+        A task that could not be read is assumed to be a graph update, so
+        the sender does not run out of window slots.
+        """
+        try:
+            if task is None or task[0] == GRAPH_UPDATE:
+                self._task_window.release()
+        finally:
+            try:
+                self._task_queue.task_done()
+            except ValueError as e:
+                LOG.exception("Task queue out of sync: exception %s", e)
 
     def do_task(self, task):
         action = task[0]
         if action == GRAPH_UPDATE:
-            (action, before, current, is_vertex) = task
-            self._graph_update(before, current, is_vertex)
-
-    def _graph_update(self, before, current, is_vertex):
-        if current:
-            if is_vertex:
-                self._entity_graph.add_vertex(current)
-            else:
-                self._entity_graph.add_edge(current)
-        else:
-            if is_vertex:
-                self._entity_graph.delete_vertex(before)
-            else:
-                self._entity_graph.delete_edge(before)
+            (action, sequence, data) = task
+            if sequence != self._sequence + 1:
+                LOG.error("%s - Graph may not be in sync: updates %s to %s "
+                          "are missing", self.__class__.__name__,
+                          self._sequence + 1, sequence - 1)
+            self._sequence = sequence
+            apply_updates(self._entity_graph, data, self._is_evaluated)
+
+    def _is_evaluated(self, element, is_vertex):
+        """Can a change of the element trigger the worker's evaluator
+
+        Changes that can not are applied to the graph without notifying it.
+        """
+        return True
 
 
 class EvaluatorWorker(GraphCloneWorkerBase):
@@ -231,12 +386,14 @@ class EvaluatorWorker(GraphCloneWorkerBase):
                  worker_id,
                  conf,
                  task_queues,
+                 task_windows,
                  e_graph,
                  workers_num):
         super(EvaluatorWorker, self).__init__(
-            worker_id, conf, task_queues, e_graph)
+            worker_id, conf, task_queues, task_windows, e_graph)
         self._workers_num = workers_num
         self._evaluator = None
+        self._trigger_filter = None
 
     name = 'EvaluatorWorker'
 
@@ -252,23 +409,53 @@ class EvaluatorWorker(GraphCloneWorkerBase):
             self._entity_graph,
             scenario_repo,
             actions_callback,
-            enabled=False)
+            enabled=False,
+            batched=self._conf.evaluator.batch_evaluation,
+            damping_window=self._conf.evaluator.actions_damping_window,
+            actions_rate_limit=self._conf.evaluator.actions_rate_limit)
         self._evaluator.scenario_repo.log_enabled_scenarios()
+        self._trigger_filter = scenario_repo.get_trigger_filter()
 
     def do_task(self, task):
-        super(EvaluatorWorker, self).do_task(task)
         action = task[0]
+        if action == GRAPH_UPDATE and self._conf.evaluator.batch_evaluation:
+            with self._evaluator.evaluation_batch():
+                super(EvaluatorWorker, self).do_task(task)
+        else:
+            super(EvaluatorWorker, self).do_task(task)
         if action == START_EVALUATION:
             self._evaluator.run_evaluator()
         elif action == RELOAD_TEMPLATES:
-            self._reload_templates()
+            (action, template_ids) = task
+            self._reload_templates(template_ids)
+        elif action == FLUSH_SCENARIO_COSTS:
+            self._evaluator.flush_scenario_costs()
+        elif action == FLUSH_ACTIVE_ACTIONS:
+            self._evaluator.flush_active_actions()
 
-    def _reload_templates(self):
+    def terminate(self):
+        # execute the held actions, that are already tracked as active
+        if self._evaluator is not None:
+            self._evaluator.flush_active_actions()
+        super(EvaluatorWorker, self).terminate()
+
+    def _is_evaluated(self, element, is_vertex):
+        return self._evaluator.enabled and \
+            self._trigger_filter(element, is_vertex)
+
+    def _reload_templates(self, template_ids):
         LOG.info("reloading evaluator scenarios")
-        scenario_repo = ScenarioRepository(self._conf, self.worker_id,
-                                           self._workers_num)
-        self._evaluator.scenario_repo = scenario_repo
-        self._evaluator.scenario_repo.log_enabled_scenarios()
+        if template_ids is None:
+            scenario_repo = ScenarioRepository(self._conf, self.worker_id,
+                                               self._workers_num)
+            self._evaluator.scenario_repo = scenario_repo
+        else:
+            scenario_repo = self._evaluator.scenario_repo
+            scenario_repo.update_templates(template_ids)
+        scenario_repo.log_enabled_scenarios()
+        self._trigger_filter = scenario_repo.get_trigger_filter()
+        # the template worker has just run the added or deleted templates
+        self._evaluator.load_active_actions()
 
 
 class TemplateLoaderWorker(GraphCloneWorkerBase):
@@ -276,11 +463,17 @@ class TemplateLoaderWorker(GraphCloneWorkerBase):
                  worker_id,
                  conf,
                  task_queues,
-                 e_graph):
+                 task_windows,
+                 e_graph,
+                 workers_num,
+                 sweeps):
         super(TemplateLoaderWorker, self).__init__(worker_id,
                                                    conf,
                                                    task_queues,
+                                                   task_windows,
                                                    e_graph)
+        self._workers_num = workers_num
+        self._sweeps = sweeps
         self._evaluator = None
 
     name = 'TemplateLoaderWorker'
@@ -301,13 +494,63 @@ class TemplateLoaderWorker(GraphCloneWorkerBase):
         super(TemplateLoaderWorker, self).do_task(task)
         action = task[0]
         if action == TEMPLATE_ACTION:
-            (action, template_names, action_mode) = task
-            self._template_action(template_names, action_mode)
-
-    def _template_action(self, template_names, action_mode):
-        self._enable_evaluator_templates(template_names)
-        self._evaluator.run_evaluator(action_mode)
-        self._disable_evaluator()
+            (action, template_names, action_mode, action_id) = task
+            self._template_action(template_names, action_mode, action_id)
+
+    def _is_evaluated(self, element, is_vertex):
+        # the evaluator is enabled only while running a template
+        return self._evaluator.enabled
+
+    def _template_action(self, template_names, action_mode, action_id):
+        # a sweep of None marks a worker that failed to sweep the graph
+        sweep = None
+        try:
+            self._enable_evaluator_templates(template_names)
+            sweep = self._evaluator.sweep(action_mode,
+                                          self.worker_id,
+                                          self._workers_num)
+        except Exception as e:
+            LOG.exception("Template sweep failed: exception %s", e)
+        finally:
+            try:
+                if self.worker_id == 0:
+                    self._execute_sweeps(action_id, sweep)
+                else:
+                    self._sweeps.put((action_id, sweep))
+            finally:
+                self._disable_evaluator()
+
+    def _execute_sweeps(self, action_id, sweep):
+        sweeps = [sweep] + self._receive_sweeps(action_id)
+        failed = len([s for s in sweeps if s is None])
+        if failed:
+            LOG.error('Template action %s: %d of %d template workers '
+                      'failed to sweep the graph',
+                      action_id, failed, self._workers_num)
+        self._evaluator.load_active_actions()
+        self._evaluator.execute_sweeps([s for s in sweeps if s is not None])
+        # written before the evaluator workers reload their templates
+        self._evaluator.flush_active_actions()
+
+    def _receive_sweeps(self, action_id):
+        """The sweeps of the other template workers, for the same action
+
+        A sweep of another template action is left over from an action
+        that timed out, and is dropped. A worker that did not send its
+        sweep in time is counted as failed.
+        """
+        sweeps = []
+        while len(sweeps) < self._workers_num - 1:
+            try:
+                sweep_id, sweep = self._sweeps.get(
+                    timeout=TEMPLATE_SWEEP_TIMEOUT)
+            except queue.Empty:
+                LOG.error('Template action %s: timed out waiting for the '
+                          'template workers sweeps', action_id)
+                break
+            if sweep_id == action_id:
+                sweeps.append(sweep)
+        return sweeps + [None] * (self._workers_num - 1 - len(sweeps))
 
     def _enable_evaluator_templates(self, template_names):
         scenario_repo = ScenarioRepository(self._conf)
@@ -321,5 +564,5 @@ class TemplateLoaderWorker(GraphCloneWorkerBase):
         self._evaluator.enabled = True
 
     def _disable_evaluator(self):
-        self._entity_graph.notifier._subscriptions = []  # Quick n dirty
+        self._entity_graph.unsubscribe_all()
         self._evaluator.enabled = False
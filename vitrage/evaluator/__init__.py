@@ -26,6 +26,45 @@ OPTS = [
                     'equal to the number of CPUs available if that can be '
                     'determined, else a default worker count of 1 is returned.'
                ),
+    cfg.IntOpt('template_workers',
+               default=1,
+               min=1,
+               max=32,
+               help='Number of workers that run an added or deleted template '
+                    'on the entire graph. Each of them runs the template on '
+                    'a portion of the graph.'
+               ),
+    cfg.IntOpt('scenario_costs_interval',
+               default=600,
+               min=1,
+               help='Interval in seconds for storing the evaluation costs of '
+                    'the scenarios. The scenarios are balanced between the '
+                    'workers by these costs.'
+               ),
+    cfg.BoolOpt('batch_evaluation',
+                default=False,
+                help='Evaluate each batch of graph updates that an evaluator '
+                     'worker receives together. An entity that changed '
+                     'several times in the batch is evaluated once, and the '
+                     'actions of the batch are executed together.'
+                ),
+    cfg.FloatOpt('actions_damping_window',
+                 default=0,
+                 min=0,
+                 help='Seconds to hold the actions of the evaluator workers '
+                      'before they are executed. Repeated actions on the same '
+                      'target in this time are merged, without changing the '
+                      'final state of the graph. 0 executes the actions at '
+                      'once.'
+                 ),
+    cfg.IntOpt('actions_rate_limit',
+               default=0,
+               min=0,
+               help='Maximal number of actions of each action type that an '
+                    'evaluator worker executes per second. Further actions '
+                    'are held in order, and executed later. 0 means no '
+                    'limit.'
+               ),
 ]
 
 init_template_schemas()
@@ -77,7 +77,8 @@ class EvaluatorEventTransformer(transformer_base.TransformerBase):
                 properties[VProps.IS_MARKED_DOWN] = \
                     event.get(VProps.IS_MARKED_DOWN)
 
-            return Vertex(event[VProps.VITRAGE_ID], properties)
+            return Vertex(event[VProps.VITRAGE_ID],
+                          graph_utils.intern_properties(properties))
 
         if event_type in [ADD_VERTEX, REMOVE_VERTEX]:
 
@@ -140,7 +141,8 @@ class EvaluatorEventTransformer(transformer_base.TransformerBase):
                 VProps.VITRAGE_TYPE: event[VProps.VITRAGE_RESOURCE_TYPE],
                 VProps.VITRAGE_CATEGORY: EntityCategory.RESOURCE,
             }
-            neighbor = Vertex(event[TFields.TARGET], neighbor_props)
+            neighbor = Vertex(event[TFields.TARGET],
+                              graph_utils.intern_properties(neighbor_props))
             return [Neighbor(neighbor, relation_edge)]
 
         return []
@@ -15,6 +15,7 @@
 from vitrage.common.constants import VertexProperties as VProps
 from vitrage.entity_graph.mappings.datasource_info_mapper \
     import DEFAULT_INFO_MAPPER
+from vitrage.evaluator.actions.base import ActionType
 from vitrage.evaluator.template_fields import TemplateFields
 
 
@@ -58,3 +59,10 @@ class SetStateTools(object):
     @classmethod
     def get_extra_info(cls, action_specs):
         return None
+
+
+def get_extra_info(action_specs):
+    """The extra info that similar actions of the type have in common"""
+    tools = RaiseAlarmTools if action_specs.type == ActionType.RAISE_ALARM \
+        else BaselineTools
+    return tools.get_extra_info(action_specs)
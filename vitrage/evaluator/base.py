@@ -24,3 +24,15 @@ def is_function(str):
     Search for a regex with open and close parenthesis
     """
     return re.match('.*\(.*\)', str)
+
+
+def parse_function(str):
+    """Split a function call to the function name and its arguments
+
+    For example, 'get_attr(host_1, name)' is split to
+    ('get_attr', ['host_1', 'name'])
+    """
+    func_and_args = re.split('[(),]', str)
+    func_name = func_and_args.pop(0).strip()
+    args = [arg.strip() for arg in func_and_args if arg.strip()]
+    return func_name, args
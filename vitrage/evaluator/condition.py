@@ -14,11 +14,11 @@
 
 import abc
 from collections import namedtuple
-from sympy.logic.boolalg import And
-from sympy.logic.boolalg import Not
-from sympy.logic.boolalg import Or
-from sympy.logic.boolalg import to_dnf as sympy_to_dfn
-from sympy import Symbol
+from collections import OrderedDict
+import re
+import threading
+
+from vitrage.common.exception import VitrageError
 
 
 ConditionVar = namedtuple('ConditionVar', ['symbol_name', 'positive'])
@@ -129,60 +129,189 @@ def parse_condition(condition_str):
 
       [[and_var1, and_var2, ...], or_list_2, ...]
 
+    The clauses and their variables are in the order that sympy gives its
+    DNF arguments, which this parser used before.
+
     :param condition_str: the string as it written in the template
     :return: condition_vars_lists
     """
+    return [list(clause) for clause in _CONDITIONS_CACHE.get(condition_str)]
 
-    condition_dnf = convert_to_dnf_format(condition_str)
-
-    if isinstance(condition_dnf, Or):
-        return extract_or_condition(condition_dnf)
-
-    if isinstance(condition_dnf, And):
-        return [extract_and_condition(condition_dnf)]
-
-    if isinstance(condition_dnf, Not):
-        return [(extract_not_condition_var(condition_dnf))]
-
-    if isinstance(condition_dnf, Symbol):
-        return [[(extract_condition_var(condition_dnf, True))]]
 
+# A parsed expression is a tuple, one of:
+#   (SYMBOL, name)
+#   (NOT, expression)
+#   (AND, frozenset of expressions)
+#   (OR, frozenset of expressions)
+# Like sympy, AND and OR are flattened and their duplicate arguments are
+# removed, and a double NOT is removed, whenever an expression is created.
+SYMBOL = 'symbol'
+NOT = 'not'
+AND = 'and'
+OR = 'or'
 
-def convert_to_dnf_format(condition_str):
+_TOKENS = re.compile(r'\(|\)|[^\s()]+')
 
-    condition_str = condition_str.replace(' and ', '&')
-    condition_str = condition_str.replace(' or ', '|')
-    condition_str = condition_str.replace(' not ', '~')
-    condition_str = condition_str.replace('not ', '~')
+# condition strings of the loaded templates
+CONDITIONS_CACHE_SIZE = 1024
 
-    return sympy_to_dfn(condition_str)
 
+def _new_not(expression):
+    if expression[0] == NOT:
+        return expression[1]
+    return NOT, expression
 
-def extract_or_condition(or_condition):
 
-    vars_ = []
-    for var in or_condition.args:
-
-        if isinstance(var, And):
-            vars_.append(extract_and_condition(var))
+def _new_op(op, args):
+    flat_args = set()
+    for arg in args:
+        if arg[0] == op:
+            flat_args.update(arg[1])
         else:
-            is_symbol = isinstance(var, Symbol)
-            vars_.append([extract_condition_var(var, is_symbol)])
-
-    return vars_
-
+            flat_args.add(arg)
+    if len(flat_args) == 1:
+        return flat_args.pop()
+    return op, frozenset(flat_args)
 
-def extract_and_condition(and_condition):
-    return [extract_condition_var(arg, isinstance(arg, Symbol))
-            for arg in and_condition.args]
 
+class _Parser(object):
+    """Recursive descent parser of the condition grammar
 
-def extract_not_condition_var(not_condition):
-    return [extract_condition_var(arg, False)
-            for arg in not_condition.args]
-
+    expression := and_expression ('or' and_expression)*
+    and_expression := not_expression ('and' not_expression)*
+    not_expression := 'not' not_expression | '(' expression ')' | symbol
+    """
 
-def extract_condition_var(symbol, positive):
-    if isinstance(symbol, Not):
-        return extract_not_condition_var(symbol)[0]
-    return ConditionVar(symbol.name, positive)
+    def __init__(self, condition_str):
+        self._condition_str = condition_str
+        self._tokens = _TOKENS.findall(condition_str)
+        self._index = 0
+
+    def parse(self):
+        expression = self._expression()
+        if self._peek() is not None:
+            self._error()
+        return expression
+
+    def _expression(self):
+        args = [self._and_expression()]
+        while self._peek() == OR:
+            self._index += 1
+            args.append(self._and_expression())
+        return _new_op(OR, args)
+
+    def _and_expression(self):
+        args = [self._not_expression()]
+        while self._peek() == AND:
+            self._index += 1
+            args.append(self._not_expression())
+        return _new_op(AND, args)
+
+    def _not_expression(self):
+        token = self._next()
+        if token == NOT:
+            return _new_not(self._not_expression())
+        if token == '(':
+            expression = self._expression()
+            if self._next() != ')':
+                self._error()
+            return expression
+        if token in (None, ')', AND, OR):
+            self._error()
+        return SYMBOL, token
+
+    def _peek(self):
+        if self._index < len(self._tokens):
+            return self._tokens[self._index]
+
+    def _next(self):
+        token = self._peek()
+        self._index += 1
+        return token
+
+    def _error(self):
+        raise VitrageError('Invalid condition: %s' % self._condition_str)
+
+
+def _to_nnf(expression, negative=False):
+    """Negation normal form, NOT is only applied to symbols"""
+    op = expression[0]
+    if op == SYMBOL:
+        return _new_not(expression) if negative else expression
+    if op == NOT:
+        return _to_nnf(expression[1], not negative)
+    if negative:
+        op = AND if op == OR else OR
+    return _new_op(op, [_to_nnf(arg, negative) for arg in expression[1]])
+
+
+def _to_dnf_clauses(expression):
+    """The set of clauses of the NNF expression, each a set of literals"""
+    op = expression[0]
+    if op == OR:
+        return set(clause for arg in expression[1]
+                   for clause in _to_dnf_clauses(arg))
+    if op == AND:
+        clauses = {frozenset()}
+        for arg in expression[1]:
+            clauses = set(clause | arg_clause
+                          for clause in clauses
+                          for arg_clause in _to_dnf_clauses(arg))
+        return clauses
+    return {frozenset([expression])}
+
+
+def _literal_var(literal):
+    if literal[0] == NOT:
+        return ConditionVar(literal[1][1], False)
+    return ConditionVar(literal[1], True)
+
+
+def _literal_sort_key(var):
+    # sympy orders a symbol before a negated symbol, then by name
+    return not var.positive, var.symbol_name
+
+
+def _clause_sort_key(clause):
+    # sympy orders by the number of nodes in the expression tree, then by
+    # class (symbol, and, not) and then by the arguments
+    negatives = sum(1 for var in clause if not var.positive)
+    if len(clause) > 1:
+        nodes = 1 + len(clause) + negatives
+        return nodes, 1, len(clause), \
+            tuple(_literal_sort_key(var) for var in clause)
+    return 1 + negatives, 2 * negatives, clause[0].symbol_name
+
+
+def _compile_condition(condition_str):
+    """The DNF clauses of the condition, in the order of sympy to_dnf"""
+    expression = _to_nnf(_Parser(condition_str).parse())
+    clauses = [tuple(sorted((_literal_var(literal) for literal in clause),
+                            key=_literal_sort_key))
+               for clause in _to_dnf_clauses(expression)]
+    return tuple(sorted(clauses, key=_clause_sort_key))
+
+
+class _ConditionsCache(object):
+    """Least recently used cache of the compiled conditions"""
+
+    def __init__(self, size):
+        self._size = size
+        self._conditions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, condition_str):
+        with self._lock:
+            clauses = self._conditions.pop(condition_str, None)
+            if clauses is not None:
+                self._conditions[condition_str] = clauses
+                return clauses
+        clauses = _compile_condition(condition_str)
+        with self._lock:
+            self._conditions[condition_str] = clauses
+            while len(self._conditions) > self._size:
+                self._conditions.popitem(last=False)
+        return clauses
+
+
+_CONDITIONS_CACHE = _ConditionsCache(CONDITIONS_CACHE_SIZE)
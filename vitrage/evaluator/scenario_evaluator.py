@@ -11,31 +11,35 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+from collections import Counter
+from collections import deque
 from collections import namedtuple
 from collections import OrderedDict
+import contextlib
 import copy
-import re
+import itertools
+import threading
 import time
 
 from oslo_log import log
+from oslo_utils import timeutils
 
 from vitrage.common.constants import EdgeProperties as EProps
 from vitrage.common.constants import VertexProperties as VProps
+from vitrage.common.utils import get_portion
 from vitrage.common.utils import recursive_keypairs
-from vitrage.datasources.listener_service import defaultdict
+from vitrage.common.utils import spawn
 from vitrage.entity_graph.mappings.datasource_info_mapper \
     import DatasourceInfoMapper
 from vitrage.evaluator.actions.action_executor import ActionExecutor
 from vitrage.evaluator.actions.base import ActionMode
 from vitrage.evaluator.actions.base import ActionType
 import vitrage.evaluator.actions.priority_tools as pt
-from vitrage.evaluator.base import is_function
 from vitrage.evaluator.template_data import ActionSpecs
 from vitrage.evaluator.template_data import EdgeDescription
-from vitrage.evaluator.template_schema_factory import TemplateSchemaFactory
+from vitrage.evaluator.template_functions.compiled_properties import \
+    evaluate_properties
 from vitrage.graph.algo_driver.algorithm import Mapping
-from vitrage.graph.algo_driver.sub_graph_matching import \
-    NEG_CONDITION
 from vitrage.graph.driver import Vertex
 from vitrage import storage
 
@@ -50,9 +54,27 @@ LOG = log.getLogger(__name__)
 ActionInfo = \
     namedtuple('ActionInfo', ['specs', 'mode', 'action_id', 'trigger_id'])
 
+# An active action, as kept by the ActiveActionsTracker
+ActiveActionRecord = namedtuple(
+    'ActiveActionRecord',
+    ['action_type', 'extra_info', 'source_vertex_id', 'target_vertex_id',
+     'action_id', 'trigger', 'score', 'created_at'])
+
 TARGET = 'target'
 SOURCE = 'source'
 
+ACTIVE_ACTIONS_BATCH_SIZE = 100
+ACTIVE_ACTIONS_FLUSH_INTERVAL = 1
+
+# The kinds of keys that the ActionsDamper merges actions by
+ACTION_KEY = 'action'
+TARGET_KEY = 'target'
+UNIQUE_KEY = 'unique'
+
+# The progress of a sweep over the graph is logged every
+# SWEEP_PROGRESS_INTERVAL vertices
+SWEEP_PROGRESS_INTERVAL = 10000
+
 
 class ScenarioEvaluator(object):
 
@@ -61,17 +83,36 @@ class ScenarioEvaluator(object):
                  e_graph,
                  scenario_repo,
                  actions_callback,
-                 enabled=False):
+                 enabled=False,
+                 batched=False,
+                 damping_window=0,
+                 actions_rate_limit=0):
+        """Create an instance of ScenarioEvaluator
+
+        :param batched: evaluate the changes made in an evaluation_batch
+         together, when the batch ends
+        :param damping_window: seconds to hold the actions before they are
+         executed, and merge the repeated ones, see ActionsDamper
+        :param actions_rate_limit: actions of each type to execute per second
+        """
         self._conf = conf
         self._entity_graph = e_graph
         self._db_connection = storage.get_connection_from_config(self._conf)
         self._scenario_repo = scenario_repo
         self._action_executor = ActionExecutor(self._conf, actions_callback)
-        self._entity_graph.subscribe(self.process_event)
+        # scenarios are matched on the graph, at the state of each change,
+        # or when batched, at the state of the end of the batch
+        self._entity_graph.subscribe(self.process_event,
+                                     immediate=not batched)
         self._active_actions_tracker = ActiveActionsTracker(
             self._conf, self._db_connection)
+        self._scenario_costs = ScenarioCosts()
+        self._actions_damper = ActionsDamper(self._execute_action,
+                                             damping_window,
+                                             actions_rate_limit)
+        # the changes of the evaluation batch
+        self._batch_changes = None
         self.enabled = enabled
-        self.connected_component_cache = defaultdict(dict)
 
     @property
     def scenario_repo(self):
@@ -81,18 +122,106 @@ class ScenarioEvaluator(object):
     def scenario_repo(self, scenario_repo):
         self._scenario_repo = scenario_repo
 
+    def load_active_actions(self):
+        """Reload the active actions, to see the changes of other workers"""
+        self._active_actions_tracker.load()
+
+    def flush_active_actions(self):
+        """Write the active actions changes, for other workers to see
+
+        The actions held by the damper are executed first, as they are
+        already tracked as active.
+        """
+        self._actions_damper.flush()
+        self._active_actions_tracker.flush()
+
+    def flush_scenario_costs(self):
+        """Add the costs measured since the last flush to the stored ones"""
+        self._scenario_costs.flush(self._db_connection)
+
     def run_evaluator(self, action_mode=ActionMode.DO):
         self.enabled = True
-        vertices = self._entity_graph.get_vertices()
+        self.execute_sweeps([self.sweep(action_mode)])
+
+    def sweep(self, action_mode, portion_index=0, num_of_portions=1):
+        """Evaluate the enabled scenarios on a portion of the graph vertices
+
+        Only vertices that can trigger the enabled scenarios are evaluated,
+        and the vertices are split between the portions. The actions are
+        returned without being executed, see execute_sweeps.
+
+        :return: the actions of each evaluated vertex, by vertex id
+        :rtype: list of (vertex_id, list of ActionInfo)
+        """
+        trigger_filter = self._scenario_repo.get_trigger_filter()
+        # sorted before the split, as the graphs of the workers may iterate
+        # the vertices in a different order
+        vertices = sorted((v for v in self._entity_graph.get_vertices()
+                           if trigger_filter(v, True)),
+                          key=lambda v: v.vertex_id)
+        vertices = get_portion(vertices, num_of_portions, portion_index)
         start_time = time.time()
-        for vertex in vertices:
+        results = []
+        for i, vertex in enumerate(vertices):
+            if i and not i % SWEEP_PROGRESS_INTERVAL:
+                LOG.info('Run %s Evaluator - %s of %s items',
+                         action_mode, i, len(vertices))
             if action_mode == ActionMode.DO:
-                self.process_event(None, vertex, True)
-            elif action_mode == ActionMode.UNDO:
-                self.process_event(vertex, None, True)
+                actions = self._get_actions(None, vertex, True)
+            else:
+                actions = self._get_actions(vertex, None, True)
+            if actions:
+                results.append((vertex.vertex_id, actions))
         LOG.info(
             'Run %s Evaluator on %s items - took %s',
             action_mode, str(len(vertices)), str(time.time() - start_time))
+        return results
+
+    def execute_sweeps(self, sweeps):
+        """Execute the actions of all the sweep portions
+
+        The actions of each vertex are executed as if the vertex changed,
+        in the order of the vertex ids, so the result does not depend on the
+        number of portions.
+        """
+        for _, actions in sorted(itertools.chain(*sweeps),
+                                 key=lambda vertex_actions: vertex_actions[0]):
+            self._execute_actions(actions)
+
+    @contextlib.contextmanager
+    def evaluation_batch(self):
+        """Evaluate the graph changes made in the context together
+
+        For an evaluator that is created with batched=True. The graph notifies
+        the net change of every changed element when the context ends, so
+        an element that changed many times is evaluated once, on the graph
+        at the end of the context. The actions of all the changes are
+        analyzed and executed together, and an action that is found again in
+        the same mode is executed once.
+        """
+        self._batch_changes = []
+        try:
+            with self._entity_graph.batch():
+                yield
+        finally:
+            changes, self._batch_changes = self._batch_changes, None
+            self._execute_actions(self._get_batch_actions(changes))
+
+    def _get_batch_actions(self, changes):
+        # an edge is undone with its vertices as they were before the batch
+        vertices_before = {before.vertex_id: before
+                           for before, _, is_vertex in changes
+                           if is_vertex and before is not None}
+        actions = []
+        modes = {}
+        for before, current, is_vertex in changes:
+            for action in self._get_actions(before, current, is_vertex,
+                                            vertices_before):
+                key = (action.action_id, action.trigger_id)
+                if modes.get(key) != action.mode:
+                    modes[key] = action.mode
+                    actions.append(action)
+        return actions
 
     def process_event(self, before, current, is_vertex, *args, **kwargs):
         """Notification of a change in the entity graph.
@@ -109,12 +238,27 @@ class ScenarioEvaluator(object):
             LOG.debug("Process event disabled")
             return
 
+        # before reading the graph, skip the many changes that can not
+        # change the matched scenarios
+        trigger_filter = self._scenario_repo.get_trigger_filter()
+        if not trigger_filter.is_relevant_change(before, current, is_vertex):
+            return
+
         LOG.debug('Process event - starting')
         LOG.debug("Element before event: %s, Current element: %s",
                   str(before),
                   str(current))
 
-        before_scenarios = self._get_element_scenarios(before, is_vertex)
+        if self._batch_changes is not None:
+            self._batch_changes.append((before, current, is_vertex))
+            return
+
+        self._execute_actions(self._get_actions(before, current, is_vertex))
+        LOG.debug('Process event - completed')
+
+    def _get_actions(self, before, current, is_vertex, vertices_before=None):
+        before_scenarios = self._get_element_scenarios(before, is_vertex,
+                                                       vertices_before)
         current_scenarios = self._get_element_scenarios(current, is_vertex)
         before_scenarios, current_scenarios = \
             self._remove_overlap_scenarios(before_scenarios, current_scenarios)
@@ -130,6 +274,9 @@ class ScenarioEvaluator(object):
         actions.extend(self._process_and_get_actions(current,
                                                      current_scenarios,
                                                      ActionMode.DO))
+        return actions
+
+    def _execute_actions(self, actions):
         actions_to_preform = []
         try:
             actions_to_preform = self._analyze_and_filter_actions(actions)
@@ -138,13 +285,13 @@ class ScenarioEvaluator(object):
                       str(actions))
             LOG.exception("Caught: %s", e)
 
-        for action in actions_to_preform:
-            LOG.info('Action: %s', self._action_str(action))
-            self._action_executor.execute(action.specs, action.mode)
+        self._actions_damper.add(actions_to_preform)
 
-        LOG.debug('Process event - completed')
+    def _execute_action(self, action):
+        LOG.info('Action: %s', self._action_str(action))
+        self._action_executor.execute(action.specs, action.mode)
 
-    def _get_element_scenarios(self, element, is_vertex):
+    def _get_element_scenarios(self, element, is_vertex, vertices=None):
         if not element \
                 or element.get(VProps.VITRAGE_IS_DELETED) \
                 or element.get(EProps.VITRAGE_IS_DELETED):
@@ -152,20 +299,40 @@ class ScenarioEvaluator(object):
         elif is_vertex:
             return self._scenario_repo.get_scenarios_by_vertex(element)
         else:  # is edge
-            edge_desc = self._get_edge_description(element)
+            edge_desc = self._get_edge_description(element, vertices)
             return self._scenario_repo.get_scenarios_by_edge(edge_desc)
 
-    def _get_edge_description(self, element):
-        source = self._entity_graph.get_vertex(element.source_id)
-        target = self._entity_graph.get_vertex(element.target_id)
+    def _get_edge_description(self, element, vertices=None):
+        """The edge and its vertices
+
+        :param vertices: vertex id -> vertex, for vertices that are taken
+         from it rather than from the graph
+        :type vertices: dict
+        """
+        vertices = vertices or {}
+        source = vertices.get(element.source_id)
+        if source is None:
+            source = self._entity_graph.get_vertex(element.source_id,
+                                                   read_only=True)
+        target = vertices.get(element.target_id)
+        if target is None:
+            target = self._entity_graph.get_vertex(element.target_id,
+                                                   read_only=True)
         edge_desc = EdgeDescription(element, source, target)
         return edge_desc
 
     @staticmethod
     def _remove_overlap_scenarios(before, current):
-        intersection = list(filter(lambda x: x in before, current))
-        before = list(filter(lambda x: x not in intersection, before))
-        current = list(filter(lambda x: x not in intersection, current))
+        # the scenarios are taken from the same scenario repository lists,
+        # so an overlapping (element, scenario) pair is the same objects
+        def key(scenario):
+            return id(scenario[0]), id(scenario[1])
+
+        intersection = set(map(key, before)) & set(map(key, current))
+        if not intersection:
+            return before, current
+        before = [x for x in before if key(x) not in intersection]
+        current = [x for x in current if key(x) not in intersection]
         return before, current
 
     def _process_and_get_actions(self, element, triggered_scenarios, mode):
@@ -183,39 +350,44 @@ class ScenarioEvaluator(object):
     def _process_scenario(self, element, scenario, scenario_elements, mode):
         if not isinstance(scenario_elements, list):
             scenario_elements = [scenario_elements]
+        start_time = time.time()
+        matches_count = 0
         actions = []
         for action in scenario.actions:
             for scenario_element in scenario_elements:
-                matches = self._evaluate_subgraphs(scenario.subgraphs,
+                matches = self._evaluate_subgraphs(scenario.match_plans,
                                                    element,
                                                    scenario_element,
                                                    action.targets[TARGET])
+                matches_count += sum(len(m) for _, m in matches)
 
-                actions.extend(self._get_actions_from_matches(scenario.version,
-                                                              matches,
+                actions.extend(self._get_actions_from_matches(matches,
                                                               mode,
                                                               action))
 
+        self._scenario_costs.add(scenario.id,
+                                 time.time() - start_time,
+                                 matches_count,
+                                 len(actions))
         return actions
 
     def _evaluate_subgraphs(self,
-                            subgraphs,
+                            match_plans,
                             element,
                             scenario_element,
                             action_target):
         if isinstance(element, Vertex):
-            return self._find_vertex_subgraph_matching(subgraphs,
+            return self._find_vertex_subgraph_matching(match_plans,
                                                        action_target,
                                                        element,
                                                        scenario_element)
         else:
-            return self._find_edge_subgraph_matching(subgraphs,
+            return self._find_edge_subgraph_matching(match_plans,
                                                      action_target,
                                                      element,
                                                      scenario_element)
 
     def _get_actions_from_matches(self,
-                                  scenario_version,
                                   combined_matches,
                                   mode,
                                   action_spec):
@@ -226,67 +398,17 @@ class ScenarioEvaluator(object):
                 new_mode = ActionMode.UNDO \
                     if mode == ActionMode.DO else ActionMode.DO
 
-            template_schema = \
-                TemplateSchemaFactory().template_schema(scenario_version)
-
             for match in matches:
                 match_action_spec = self._get_action_spec(action_spec, match)
                 items_ids = \
                     [match_item[1].vertex_id for match_item in match.items()]
                 match_hash = hash(tuple(sorted(items_ids)))
-                self._evaluate_property_functions(template_schema, match,
-                                                  match_action_spec.properties)
 
                 actions.append(ActionInfo(match_action_spec, new_mode,
                                           match_action_spec.id, match_hash))
 
         return actions
 
-    def _evaluate_property_functions(self, template_schema, match,
-                                     action_props):
-        """Evaluate the action properties, in case they contain functions
-
-        In template version 2 we introduced functions, and specifically the
-        get_attr function. This method evaluate its value and updates the
-        action properties, before the action is being executed.
-
-        Example:
-
-        - action:
-            action_type: execute_mistral
-            properties:
-              workflow: evacuate_vm
-              input:
-                vm_name: get_attr(instance1,name)
-                force: false
-
-        In this example, the method will iterate over 'properties', and then
-        recursively over 'input', and for 'vm_name' it will replace the
-        call for get_attr with the actual name of the VM. The input for the
-        Mistral workflow will then be:
-        vm_name: vm_1
-        force: false
-
-        """
-        for key, value in action_props.items():
-            if isinstance(value, dict):
-                # Recursive call for a dictionary
-                self._evaluate_property_functions(template_schema,
-                                                  match, value)
-
-            elif value is not None and is_function(value):
-                # The value is a function
-                func_and_args = re.split('[(),]', value)
-                func_name = func_and_args.pop(0)
-                args = [arg.strip() for arg in func_and_args if len(arg) > 0]
-
-                # Get the function, execute it and update the property value
-                func = template_schema.functions.get(func_name)
-                action_props[key] = func(match, *args)
-
-                LOG.debug('Changed property %s value from %s to %s', key,
-                          value, action_props[key])
-
     @staticmethod
     def _get_action_spec(action_spec, match):
         targets = action_spec.targets
@@ -296,7 +418,7 @@ class ScenarioEvaluator(object):
         return ActionSpecs(action_spec.id,
                            action_spec.type,
                            real_items,
-                           action_spec.properties)
+                           evaluate_properties(action_spec.properties, match))
 
     @staticmethod
     def _generate_action_id(action_spec):
@@ -348,7 +470,7 @@ class ScenarioEvaluator(object):
         return unique_ordered_actions.values()
 
     def _find_vertex_subgraph_matching(self,
-                                       subgraphs,
+                                       match_plans,
                                        action_target,
                                        vertex,
                                        scenario_vertex):
@@ -358,19 +480,18 @@ class ScenarioEvaluator(object):
         in the same connected component as the action then run subgraph
         matching on the vertex and return its result, otherwise return an
         empty list of matches.
+
+        :type match_plans: list of MatchPlan
         """
 
         matches = []
-        for subgraph in subgraphs:
-            connected_component = self.get_connected_component(subgraph,
-                                                               action_target)
-
-            is_switch_mode = \
-                connected_component.get_vertex(scenario_vertex.vertex_id)
+        for match_plan in match_plans:
+            connected_component = \
+                match_plan.connected_component(action_target)
 
-            if is_switch_mode:
+            if scenario_vertex.vertex_id in connected_component:
                 initial_map = Mapping(scenario_vertex, vertex, True)
-                mat = self._entity_graph.algo.sub_graph_matching(subgraph,
+                mat = self._entity_graph.algo.sub_graph_matching(match_plan,
                                                                  initial_map)
                 matches.append((False, mat))
             else:
@@ -378,63 +499,49 @@ class ScenarioEvaluator(object):
         return matches
 
     def _find_edge_subgraph_matching(self,
-                                     subgraphs,
+                                     match_plans,
                                      action_target,
                                      edge,
                                      scenario_edge):
         """calculates subgraph matching for edge
 
         iterates over all the subgraphs, and checks if the triggered edge is a
-        negative edge then mark it as deleted=false and negative=false so that
-        subgraph matching on that edge will work correctly. after running
-        subgraph matching, we need to remove the negative vertices that were
-        added due to the change above.
+        negative edge then runs subgraph matching on the plan where it is not
+        deleted and not negative, so that subgraph matching on that edge will
+        work correctly. after running subgraph matching, we need to remove
+        the negative vertices that were added due to the change above.
+
+        :type match_plans: list of MatchPlan
         """
 
         matches = []
-        for subgraph in subgraphs:
-            subgraph_edge = subgraph.get_edge(scenario_edge.source.vertex_id,
-                                              scenario_edge.target.vertex_id,
-                                              scenario_edge.edge.label)
+        for match_plan in match_plans:
+            edge_key = (scenario_edge.source.vertex_id,
+                        scenario_edge.target.vertex_id,
+                        scenario_edge.edge.label)
+            subgraph_edge = match_plan.get_edge(*edge_key)
             if not subgraph_edge:
                 continue
 
-            is_switch_mode = subgraph_edge.get(NEG_CONDITION, False)
+            is_switch_mode = subgraph_edge.negative
 
-            connected_component = self.get_connected_component(subgraph,
-                                                               action_target)
-            # change the vitrage_is_deleted and negative_condition props to
-            # false when is_switch_mode=true so that when we have an event on a
-            # negative_condition=true edge it will find the correct subgraph
-            self._switch_edge_negative_props(is_switch_mode, scenario_edge,
-                                             subgraph, False)
+            connected_component = \
+                match_plan.connected_component(action_target)
+            if is_switch_mode:
+                match_plan = match_plan.positive_edge_plan(*edge_key)
+                subgraph_edge = match_plan.get_edge(*edge_key)
 
-            initial_map = Mapping(scenario_edge.edge, edge, False)
+            initial_map = Mapping(subgraph_edge, edge, False)
             curr_matches = \
-                self._entity_graph.algo.sub_graph_matching(subgraph,
+                self._entity_graph.algo.sub_graph_matching(match_plan,
                                                            initial_map)
 
-            # switch back to the original values
-            self._switch_edge_negative_props(is_switch_mode, scenario_edge,
-                                             subgraph, True)
-
             self._remove_negative_vertices_from_matches(curr_matches,
                                                         connected_component)
 
             matches.append((is_switch_mode, curr_matches))
         return matches
 
-    def get_connected_component(self, subgraph, target):
-        connected_component = self.connected_component_cache.get(
-            id(subgraph), {}).get(id(target))
-        if not connected_component:
-            connected_component = subgraph.algo.graph_query_vertices(
-                root_id=target,
-                edge_query_dict={'!=': {NEG_CONDITION: True}})
-            self.connected_component_cache[id(subgraph)][id(target)] = \
-                connected_component
-        return connected_component
-
     def _db_action_to_action_info(self, db_action):
         target = self._entity_graph.get_vertex(db_action.target_vertex_id)
         targets = {TARGET: target}
@@ -442,7 +549,12 @@ class ScenarioEvaluator(object):
             source = self._entity_graph.get_vertex(db_action.source_vertex_id)
             targets[SOURCE] = source
         scenario_action = self._scenario_repo.actions.get(db_action.action_id)
-        properties = copy.copy(scenario_action.properties)
+        # the template functions see only the vertices of the stored action
+        match = {scenario_action.targets[target]: vertex
+                 for target, vertex in targets.items()
+                 if target in scenario_action.targets}
+        properties = copy.copy(
+            evaluate_properties(scenario_action.properties, match))
         action_specs = ActionSpecs(
             id=db_action.action_id,
             type=db_action.action_type,
@@ -457,21 +569,11 @@ class ScenarioEvaluator(object):
         )
         return action_info
 
-    @staticmethod
-    def _switch_edge_negative_props(is_switch_mode,
-                                    scenario_edge,
-                                    subgraph,
-                                    status):
-        if is_switch_mode:
-            scenario_edge.edge[NEG_CONDITION] = status
-            scenario_edge.edge[EProps.VITRAGE_IS_DELETED] = status
-            subgraph.update_edge(scenario_edge.edge)
-
     @staticmethod
     def _remove_negative_vertices_from_matches(matches, connected_component):
         for match in matches:
-            ver_ids = [v.vertex_id for v in connected_component.get_vertices()]
-            ver_to_remove = [id for id in match.keys() if id not in ver_ids]
+            ver_to_remove = [id for id in match.keys()
+                             if id not in connected_component]
             for v_id in ver_to_remove:
                 del match[v_id]
 
@@ -484,6 +586,184 @@ class ScenarioEvaluator(object):
                                                  action.action_id, s, t)
 
 
+class ScenarioCosts(object):
+    """The evaluation cost of each scenario, since the last flush
+
+    The cost is the time it took to evaluate the scenario, the number of
+    subgraph matches that were found for it, and the number of actions that
+    these matches emitted. The stored costs are used to balance the scenarios
+    between the evaluator workers, and are shown to the admin by the
+    get_scenario_costs api.
+    """
+
+    def __init__(self):
+        # scenario id -> [evaluations, matches, actions, duration]
+        self._costs = {}
+
+    def add(self, scenario_id, duration, matches, actions=0):
+        cost = self._costs.setdefault(scenario_id, [0, 0, 0, 0])
+        cost[0] += 1
+        cost[1] += matches
+        cost[2] += actions
+        cost[3] += duration
+
+    def flush(self, db_connection):
+        """Add the costs to the stored ones
+
+        Costs that failed to be stored are kept, and stored by the next flush.
+        """
+        costs, self._costs = self._costs, {}
+        if not costs:
+            return
+        try:
+            db_connection.scenario_costs.update(
+                [storage.sqlalchemy.models.ScenarioCost(
+                    scenario_id=scenario_id,
+                    evaluations=evaluations,
+                    matches=matches,
+                    actions=actions,
+                    duration=duration)
+                 for scenario_id, (evaluations, matches, actions, duration)
+                 in sorted(costs.items())])
+        except Exception as e:
+            LOG.exception('Failed to store the costs of %s scenarios: %s',
+                          len(costs), e)
+            for scenario_id, cost in costs.items():
+                added = self._costs.setdefault(scenario_id, [0, 0, 0, 0])
+                added[:] = [a + b for a, b in zip(added, cost)]
+
+
+class ActionsDamper(object):
+    """Damps storms of actions, before they are executed
+
+    The actions are held for up to window seconds, and in that time:
+
+    - A set_state or mark_down action replaces the held action of the same
+      type on the same target, since both set the same vertex property
+    - Other actions replace the same held action, or cancel it if it is of
+      the opposite mode. Executing a DO and then its UNDO, or an UNDO and
+      then a DO of the same action, leaves the graph as it is
+    - execute_mistral actions are never merged
+
+    The held actions are executed in order, and at most rate_limit actions
+    of each action type are executed per second. Every replaced or canceled
+    action is counted as suppressed.
+
+    A held action is either executed, or suppressed by a later action that
+    leaves the graph in the same state, so the damping does not change the
+    final state of the graph. Without a window and a rate limit the actions
+    are executed at once.
+    """
+
+    def __init__(self, execute, window=0, rate_limit=0):
+        self._execute = execute
+        self._window = window
+        self._rate_limit = rate_limit
+        # merge key -> (action, release time), in the execution order
+        self._held = OrderedDict()
+        # action type -> times of the executions in the last second
+        self._executions = {}
+        self._unique_keys = itertools.count()
+        self._condition = threading.Condition()
+        self._execute_lock = threading.Lock()
+        self._thread = None
+        self.suppressed = Counter()
+        self._unreported = Counter()
+
+    @property
+    def enabled(self):
+        return self._window > 0 or self._rate_limit > 0
+
+    def add(self, actions):
+        if not self.enabled:
+            for action in actions:
+                self._execute(action)
+            return
+
+        with self._condition:
+            release_time = time.time() + self._window
+            for action in actions:
+                self._hold(action, release_time)
+            if self._thread is None:
+                self._thread = spawn(self._run)
+            self._condition.notify()
+
+    def flush(self):
+        """Execute all the held actions now"""
+        self._execute_released(flush=True)
+
+    def _hold(self, action, release_time):
+        key = self._merge_key(action)
+        held = self._held.pop(key, None)
+        if held is not None:
+            held_action, release_time = held
+            self._suppress(held_action)
+            if key[0] == ACTION_KEY and held_action.mode != action.mode:
+                self._suppress(action)
+                return
+        self._held[key] = (action, release_time)
+
+    def _merge_key(self, action):
+        specs = action.specs
+        if specs.type in (ActionType.SET_STATE, ActionType.MARK_DOWN):
+            return TARGET_KEY, specs.type, specs.targets[TARGET].vertex_id
+        elif specs.type == ActionType.EXECUTE_MISTRAL:
+            return UNIQUE_KEY, next(self._unique_keys)
+        return ACTION_KEY, ScenarioEvaluator._generate_action_id(specs)
+
+    def _suppress(self, action):
+        self.suppressed[action.specs.type] += 1
+        self._unreported[action.specs.type] += 1
+
+    def _release(self, now, flush):
+        """Take the held actions that can be executed now
+
+        :return: the actions, and the time to wait for the next action
+        """
+        released = []
+        while self._held:
+            action, release_time = next(iter(self._held.values()))
+            executions = self._executions.setdefault(action.specs.type,
+                                                     deque())
+            while executions and executions[0] <= now - 1:
+                executions.popleft()
+            if not flush:
+                if release_time > now:
+                    return released, release_time - now
+                if 0 < self._rate_limit <= len(executions):
+                    return released, executions[0] + 1 - now
+            self._held.popitem(last=False)
+            executions.append(now)
+            released.append(action)
+
+        if self._unreported:
+            LOG.info('Suppressed repeated actions: %s',
+                     dict(self._unreported))
+            self._unreported = Counter()
+        return released, None
+
+    def _execute_released(self, flush=False):
+        with self._execute_lock:
+            with self._condition:
+                actions, wait = self._release(time.time(), flush)
+            for action in actions:
+                try:
+                    self._execute(action)
+                except Exception as e:
+                    LOG.exception('Failed to execute action %s: %s',
+                                  str(action), e)
+        return wait
+
+    def _run(self):
+        while True:
+            wait = self._execute_released()
+            with self._condition:
+                if not self._held:
+                    self._condition.wait()
+                elif wait:
+                    self._condition.wait(wait)
+
+
 class ActiveActionsTracker(object):
     """Keeps track of all active actions and relative dominance/priority.
 
@@ -504,6 +784,14 @@ class ActiveActionsTracker(object):
 
     The score is used to determine which action in each group of similar
     actions to be executed next.
+
+    The active actions are kept in memory, by group of similar actions, and
+    are loaded from the active_actions table when the tracker is created.
+    Changes are written to the table in the background, in batches.
+
+    The scenarios that may take similar actions are enabled in the same
+    evaluator worker, see ScenarioRepository, so the priority is decided by
+    the active actions of a single tracker.
     """
 
     def __init__(self, conf, db_connection):
@@ -518,29 +806,51 @@ class ActiveActionsTracker(object):
             ActionType.MARK_DOWN: pt.BaselineTools,
             ActionType.EXECUTE_MISTRAL: pt.BaselineTools
         }
+        self._writer = _ActiveActionsWriter(db_connection)
+        self._active_actions = {}
+        self.load()
+
+    def load(self):
+        """Load the active actions from the active_actions table
+
+        Pending changes are written first, so the table also holds the
+        actions of this tracker.
+        """
+        self.flush()
+        self._active_actions = {}
+        for db_row in self._db.active_actions.query():
+            record = self._from_db_row(db_row)
+            self._similar_actions(record[:4])[
+                record.action_id, record.trigger] = record
+        LOG.debug('Loaded %s active actions',
+                  sum(len(a) for a in self._active_actions.values()))
+
+    def flush(self):
+        """Write the pending changes to the active_actions table"""
+        self._writer.flush()
 
     def calc_do_action(self, action_info):
-        """Add this action to active_actions table, if not exists
+        """Add this action to active actions, if not exists
 
         return value to help decide if action should be performed
         Only a top scored action that is new should be performed
         :return: (is top score, is it already existing)
         """
-        # TODO(idan_hefetz): DB read and write not in a transaction
-        active_actions = self._query_similar_actions(action_info)
-        exists = any(
-            a.action_id == action_info.action_id and
-            a.trigger == action_info.trigger_id for a in active_actions)
+        similar_key = self._similar_key(action_info)
+        similar_actions = self._similar_actions(similar_key)
+        action_key = (action_info.action_id, action_info.trigger_id)
+        exists = action_key in similar_actions
         if not exists:
-            db_row = self._to_db_row(action_info)
-            active_actions.append(db_row)
-            LOG.debug("DB Insert active_actions %s", str(db_row))
-            self._db.active_actions.create(db_row)
+            record = self._to_record(similar_key, action_info)
+            similar_actions[action_key] = record
+            LOG.debug("Insert active_actions %s", str(record))
+            self._writer.update(record)
 
-        return self._is_highest_score(active_actions, action_info), exists
+        return self._is_highest_score(list(similar_actions.values()),
+                                      action_info), exists
 
     def calc_undo_action(self, action_info):
-        """Delete this action form active_actions table, if exists
+        """Delete this action from active actions, if exists
 
         return value to help decide if action should be performed
         A top scored action should be 'undone' if there is not a second action.
@@ -548,15 +858,16 @@ class ActiveActionsTracker(object):
         :param action_info: action to delete
         :return: is_highest_score, second highest action if exists
         """
-        # TODO(idan_hefetz): DB read and write not in a transaction
-        active_actions = self._query_similar_actions(action_info)
+        similar_key = self._similar_key(action_info)
+        similar_actions = self._active_actions.get(similar_key, {})
+        active_actions = list(similar_actions.values())
 
-        LOG.debug("DB delete active_actions %s %s",
-                  action_info.action_id,
-                  str(action_info.trigger_id))
-        self._db.active_actions.delete(
-            action_id=action_info.action_id,
-            trigger=action_info.trigger_id)
+        action_key = (action_info.action_id, action_info.trigger_id)
+        LOG.debug("Delete active_actions %s %s", *action_key)
+        similar_actions.pop(action_key, None)
+        if not similar_actions:
+            self._active_actions.pop(similar_key, None)
+        self._writer.delete(action_key)
 
         is_highest_score = self._is_highest_score(active_actions, action_info)
         if is_highest_score and len(active_actions) > 1:
@@ -564,33 +875,49 @@ class ActiveActionsTracker(object):
         else:
             return is_highest_score, None
 
-    def _to_db_row(self, action_info):
+    def _similar_actions(self, similar_key):
+        similar_actions = self._active_actions.get(similar_key)
+        if similar_actions is None:
+            similar_actions = OrderedDict()
+            self._active_actions[similar_key] = similar_actions
+        return similar_actions
+
+    @staticmethod
+    def _from_db_row(db_row):
+        return ActiveActionRecord(
+            action_type=db_row.action_type,
+            extra_info=db_row.extra_info,
+            source_vertex_id=db_row.source_vertex_id,
+            target_vertex_id=db_row.target_vertex_id,
+            action_id=db_row.action_id,
+            trigger=db_row.trigger,
+            score=db_row.score,
+            created_at=db_row.created_at)
+
+    def _similar_key(self, action_info):
+        """The properties that are the same for all similar actions"""
         source = action_info.specs.targets.get(SOURCE, {})
         target = action_info.specs.targets.get(TARGET, {})
+        extra_info = self._action_tools[action_info.specs.type].get_extra_info(
+            action_info.specs)
+        return (action_info.specs.type,
+                extra_info,
+                source.get(VProps.VITRAGE_ID),
+                target.get(VProps.VITRAGE_ID))
+
+    def _to_record(self, similar_key, action_info):
         action_score = self._action_tools[action_info.specs.type].\
             get_score(action_info)
-        extra_info = self._action_tools[action_info.specs.type].\
-            get_extra_info(action_info.specs)
-        return storage.sqlalchemy.models.ActiveAction(
-            action_type=action_info.specs.type,
+        action_type, extra_info, source_id, target_id = similar_key
+        return ActiveActionRecord(
+            action_type=action_type,
             extra_info=extra_info,
-            source_vertex_id=source.get(VProps.VITRAGE_ID),
-            target_vertex_id=target.get(VProps.VITRAGE_ID),
+            source_vertex_id=source_id,
+            target_vertex_id=target_id,
             action_id=action_info.action_id,
             trigger=action_info.trigger_id,
-            score=action_score)
-
-    def _query_similar_actions(self, action_info):
-        """Query DB for all actions with same properties"""
-        source = action_info.specs.targets.get(SOURCE, {})
-        target = action_info.specs.targets.get(TARGET, {})
-        extra_info = self._action_tools[action_info.specs.type].get_extra_info(
-            action_info.specs)
-        return self._db.active_actions.query(
-            action_type=action_info.specs.type,
-            extra_info=extra_info,
-            source_vertex_id=source.get(VProps.VITRAGE_ID),
-            target_vertex_id=target.get(VProps.VITRAGE_ID))
+            score=action_score,
+            created_at=timeutils.utcnow())
 
     @classmethod
     def _is_highest_score(cls, db_actions, action_info):
@@ -618,3 +945,90 @@ class ActiveActionsTracker(object):
             db_actions,
             key=lambda action: (-action.score, action.created_at),
             reverse=False)
+
+
+class _ActiveActionsWriter(object):
+    """Writes the active actions changes to the active_actions table
+
+    Changes are written by a background thread, in batches of up to
+    ACTIVE_ACTIONS_BATCH_SIZE changes or every ACTIVE_ACTIONS_FLUSH_INTERVAL
+    seconds. A deleted action is deleted before it is created again. Changes
+    that failed to be written are kept, and written again after
+    ACTIVE_ACTIONS_FLUSH_INTERVAL seconds.
+    """
+
+    def __init__(self, db_connection):
+        self._db = db_connection
+        self._updated = OrderedDict()
+        self._deleted = set()
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    def update(self, record):
+        with self._condition:
+            self._updated[record.action_id, record.trigger] = record
+            self._notify()
+
+    def delete(self, action_key):
+        with self._condition:
+            self._updated.pop(action_key, None)
+            self._deleted.add(action_key)
+            self._notify()
+
+    def flush(self):
+        """Write the pending changes
+
+        :return: False if the changes failed to be written
+        """
+        with self._flush_lock:
+            with self._condition:
+                updated, self._updated = self._updated, OrderedDict()
+                deleted, self._deleted = self._deleted, set()
+            if not updated and not deleted:
+                return True
+            try:
+                if deleted:
+                    self._db.active_actions.bulk_delete(list(deleted))
+                if updated:
+                    self._db.active_actions.bulk_update(
+                        [storage.sqlalchemy.models.ActiveAction(
+                            **record._asdict())
+                         for record in updated.values()])
+                return True
+            except Exception as e:
+                LOG.exception('Failed to write %s active actions changes: %s',
+                              len(updated) + len(deleted), e)
+                self._restore(updated, deleted)
+                return False
+
+    def _restore(self, updated, deleted):
+        """Keep the changes that failed, before the changes made since"""
+        with self._condition:
+            restored = OrderedDict(
+                (key, record) for key, record in updated.items()
+                if key not in self._updated and key not in self._deleted)
+            restored.update(self._updated)
+            self._updated = restored
+            # an action deleted and then created again is deleted first
+            self._deleted |= deleted
+
+    def _pending(self):
+        return len(self._updated) + len(self._deleted)
+
+    def _notify(self):
+        if self._thread is None:
+            self._thread = spawn(self._run)
+        pending = self._pending()
+        if pending == 1 or pending == ACTIVE_ACTIONS_BATCH_SIZE:
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending():
+                    self._condition.wait()
+                if self._pending() < ACTIVE_ACTIONS_BATCH_SIZE:
+                    self._condition.wait(ACTIVE_ACTIONS_FLUSH_INTERVAL)
+            if not self.flush():
+                time.sleep(ACTIVE_ACTIONS_FLUSH_INTERVAL)
@@ -13,17 +13,23 @@
 # under the License.
 from collections import defaultdict
 from collections import namedtuple
+from collections import OrderedDict
 
 import itertools
 from oslo_log import log
+import six
 
+from vitrage.common.constants import EdgeProperties as EProps
 from vitrage.common.constants import TemplateStatus
 from vitrage.common.constants import TemplateTypes as TType
-from vitrage.common.utils import get_portion
+from vitrage.common.constants import VertexProperties as VProps
+from vitrage.common.utils import get_balanced_portion
+from vitrage.evaluator.actions.priority_tools import get_extra_info
 from vitrage.evaluator.base import Template
 from vitrage.evaluator.equivalence_repository import EquivalenceRepository
 from vitrage.evaluator.template_fields import TemplateFields
-from vitrage.evaluator.template_loading.scenario_loader import ScenarioLoader
+from vitrage.evaluator.template_loading.subgraph_builder import \
+    SubGraphBuilder
 from vitrage.evaluator.template_loading.template_loader import TemplateLoader
 from vitrage.evaluator.template_validation.template_syntax_validator import \
     EXCEPTION
@@ -37,7 +43,141 @@ EdgeKeyScenario = namedtuple('EdgeKeyScenario', ['label', 'source', 'target'])
 DEF_TEMPLATES_DIR_OPT = 'def_templates_dir'
 
 
+class _ScenarioIndex(object):
+    """Scenario keys by the properties that every graph element has
+
+    A key is added with its index keys, e.g. the vitrage_category and
+    vitrage_type of an entity and of the entities that are equivalent to
+    it. A key that has no index key, because of a regex, a list of values or
+    a missing property, is added to a fallback bucket that is returned for
+    every lookup with the same fallback key.
+
+    The candidates are returned in the order they were added.
+    """
+
+    def __init__(self):
+        self._buckets = defaultdict(list)
+        self._fallback = defaultdict(list)
+        self._counter = 0
+
+    def add(self, index_keys, fallback_key, entry):
+        self._counter += 1
+        for index_key in set(index_keys):
+            if index_key is None:
+                self._fallback[fallback_key].append((self._counter, entry))
+            else:
+                self._buckets[index_key].append((self._counter, entry))
+
+    def remove(self, index_keys, fallback_key, scenarios):
+        """Remove the entry that holds the scenarios list"""
+        for index_key in set(index_keys):
+            buckets, key = (self._fallback, fallback_key) \
+                if index_key is None else (self._buckets, index_key)
+            bucket = [c for c in buckets.get(key, [])
+                      if c[1][-1] is not scenarios]
+            if bucket:
+                buckets[key] = bucket
+            else:
+                buckets.pop(key, None)
+
+    def get(self, index_key, fallback_key):
+        candidates = self._buckets.get(index_key, [])
+        fallback = self._fallback.get(fallback_key, [])
+        if fallback:
+            # an entry may be in both, if only some of its keys are indexed
+            candidates = sorted(dict(candidates + fallback).items())
+        return [entry for _, entry in candidates]
+
+
+def _check_any(properties, attr_filters):
+    return any(check_subset(properties, f) for f in attr_filters)
+
+
+def _index_value(properties, key):
+    """The property value, if it can be used in an index key"""
+    value = properties.get(key)
+    return value if isinstance(value, six.string_types) else None
+
+
+class TriggerFilter(object):
+    """Can a change of a graph element trigger the enabled scenarios
+
+    Vertices are checked by their vitrage_category and vitrage_type, or only
+    by their vitrage_category for entities that are not defined by a type,
+    e.g. alarms that are defined by name. Edges are checked by their label.
+    The check may pass elements that do not match any scenario, but it does
+    not fail elements that do.
+
+    An update of an element triggers the scenarios only if it changes the
+    scenarios that the element matches, see is_relevant_change.
+    """
+
+    def __init__(self, scenario_repo):
+        self._all_vertices = False
+        self._vertex_keys = set()
+        self._categories = set()
+        self._labels = set()
+        # the vertex properties that the entity scenarios are matched by
+        self._property_keys = {VProps.VITRAGE_IS_DELETED}
+        for key, scenarios in scenario_repo.entity_scenarios.items():
+            if not any(s.enabled for _, s in scenarios):
+                continue
+            for properties in scenario_repo.get_equivalent_properties(
+                    dict(key)):
+                self._add_entity(properties)
+        for key, scenarios in scenario_repo.relationship_scenarios.items():
+            if any(s.enabled for _, s in scenarios):
+                self._labels.add(key.label)
+
+    def _add_entity(self, properties):
+        self._property_keys.update(
+            k[:-len(TemplateFields.REGEX)]
+            if k.lower().endswith(TemplateFields.REGEX) else k
+            for k in properties)
+        index_key = ScenarioRepository._entity_index_key(properties)
+        category = _index_value(properties, VProps.VITRAGE_CATEGORY)
+        if index_key is not None:
+            self._vertex_keys.add(index_key)
+        elif category is not None:
+            self._categories.add(category)
+        else:
+            self._all_vertices = True
+
+    def __call__(self, element, is_vertex):
+        if not is_vertex:
+            return element.label in self._labels
+        properties = element.properties or {}
+        return self._all_vertices or \
+            properties.get(VProps.VITRAGE_CATEGORY) in self._categories or \
+            ScenarioRepository._entity_index_key(properties) in \
+            self._vertex_keys
+
+    def is_relevant_change(self, before, current, is_vertex):
+        """Can the change of the element trigger the enabled scenarios
+
+        The scenarios that an updated vertex matches depend only on the
+        property keys of the entity scenarios. The scenarios that an updated
+        edge matches depend only on whether it is deleted, since the same
+        source and target vertices are used before and after the change.
+        An update that does not change the matched scenarios is ignored by
+        the evaluator, and does not need to be evaluated.
+        """
+        if not any(self(e, is_vertex) for e in (before, current) if e):
+            return False
+        if before is None or current is None:
+            return True
+        before_props = before.properties or {}
+        current_props = current.properties or {}
+        keys = self._property_keys if is_vertex \
+            else (EProps.VITRAGE_IS_DELETED,)
+        return any(before_props.get(k) != current_props.get(k) for k in keys)
+
+
 class ScenarioRepository(object):
+    _LOADED_STATUSES = (TemplateStatus.ACTIVE,
+                        TemplateStatus.LOADING,
+                        TemplateStatus.DELETING)
+
     def __init__(self, conf, worker_index=None, workers_num=None):
         """Create an instance of ScenarioRepository
 
@@ -45,16 +185,51 @@ class ScenarioRepository(object):
         :param worker_index: Index of the current evaluator worker
         :param workers_num: Total number of evaluator workers
         """
+        self._worker_index = worker_index
+        self._workers_num = workers_num
+        self._db = storage.get_connection_from_config(conf)
+        self._load()
+
+    def _load(self):
         self._templates = {}
         self._def_templates = {}
         self._all_scenarios = []
-        self._db = storage.get_connection_from_config(conf)
+        # template uuid -> the scenarios that were loaded from the template
+        self._template_scenarios = {}
+        self._costs = {}
         self.entity_equivalences = EquivalenceRepository().load(self._db)
         self.relationship_scenarios = defaultdict(list)
         self.entity_scenarios = defaultdict(list)
+        self._relationship_index = _ScenarioIndex()
+        self._entity_index = _ScenarioIndex()
         self._load_def_templates_from_db()
         self._load_templates_from_db()
-        self._enable_worker_scenarios(worker_index, workers_num)
+        self._enable_worker_scenarios(self._worker_index, self._workers_num)
+        self.actions = self._create_actions_collection()
+
+    def update_templates(self, template_uuids):
+        """Load the added templates, and unload the deleted ones
+
+        The scenarios of the other templates are kept as they are. A change
+        of a definition or an equivalence template may change the scenarios
+        of every template, so all the templates are loaded again.
+
+        :param template_uuids: the uuids of the added and deleted templates
+        """
+        changed = [t for uuid in template_uuids
+                   for t in self._db.templates.query(uuid=uuid)]
+        if any(t.template_type != TType.STANDARD for t in changed):
+            LOG.info('Definition or equivalence templates changed, '
+                     'loading all templates')
+            self._load()
+            return
+
+        for uuid in template_uuids:
+            self._remove_template(uuid)
+        for t in changed:
+            if t.status in self._LOADED_STATUSES:
+                self._add_template(t)
+        self._enable_worker_scenarios(self._worker_index, self._workers_num)
         self.actions = self._create_actions_collection()
 
     @property
@@ -73,29 +248,53 @@ class ScenarioRepository(object):
     def templates(self, templates):
         self._templates = templates
 
+    def get_trigger_filter(self):
+        """Which graph changes can trigger the enabled scenarios
+
+        The filter is kept until the enabled scenarios change.
+        :rtype: TriggerFilter
+        """
+        if self._trigger_filter is None:
+            self._trigger_filter = TriggerFilter(self)
+        return self._trigger_filter
+
+    def get_equivalent_properties(self, properties):
+        """The entity properties, and those of its equivalent entities
+
+        :type properties: dict
+        :rtype: list of dict
+        """
+        entity_key = frozenset(properties.items())
+        equivalence = self.entity_equivalences.get(entity_key)
+        if not equivalence:
+            return [properties]
+        return [properties] + [dict(key) for key in sorted(
+            equivalence - {entity_key}, key=lambda k: sorted(map(str, k)))]
+
     def get_scenarios_by_vertex(self, vertex):
 
         entity_key = vertex.properties
 
         scenarios = []
-        for scenario_key, value in self.entity_scenarios.items():
-            if check_subset(entity_key, dict(scenario_key)):
+        for attr_filters, value in self._entity_index.get(
+                self._entity_index_key(entity_key), None):
+            if _check_any(entity_key, attr_filters):
                 scenarios += [(e, s) for e, s in value if s.enabled]
         return scenarios
 
     def get_scenarios_by_edge(self, edge_description):
 
-        key = self._create_edge_scenario_key(edge_description)
+        source = edge_description.source.properties
+        target = edge_description.target.properties
+        label = edge_description.edge.label
         scenarios = []
 
-        for scenario_key, value in self.relationship_scenarios.items():
-
-            check_label = key.label == scenario_key.label
-            if check_label \
-                    and check_subset(dict(key.source),
-                                     dict(scenario_key.source)) \
-                    and check_subset(dict(key.target),
-                                     dict(scenario_key.target)):
+        for source_filters, target_filters, value in \
+                self._relationship_index.get(
+                    self._relationship_index_key(label, source, target),
+                    label):
+            if _check_any(source, source_filters) \
+                    and _check_any(target, target_filters):
                 scenarios += [(e, s) for e, s in value if s.enabled]
 
         return scenarios
@@ -106,9 +305,39 @@ class ScenarioRepository(object):
                                                  template.created_at)
         template_data = TemplateLoader().load(template.file_content,
                                               self._def_templates)
-        for scenario in template_data.scenarios:
-            for equivalent_scenario in self._expand_equivalence(scenario):
-                self._add_scenario(equivalent_scenario)
+        scenarios = template_data.scenarios
+        for scenario in scenarios:
+            self._add_equivalences(scenario)
+            self._add_scenario(scenario)
+        self._template_scenarios[template.uuid] = scenarios
+
+    def _remove_template(self, uuid):
+        self.templates.pop(uuid, None)
+        scenarios = self._template_scenarios.pop(uuid, [])
+        if not scenarios:
+            return
+        removed = set(id(s) for s in scenarios)
+
+        def is_kept(item):
+            return id(item[1]) not in removed
+
+        self._all_scenarios = [s for s in self._all_scenarios
+                               if id(s) not in removed]
+        for key, value in list(self.entity_scenarios.items()):
+            value[:] = filter(is_kept, value)
+            if not value:
+                self._entity_index.remove(
+                    self._entity_index_keys(dict(key)), None, value)
+                del self.entity_scenarios[key]
+        for key, value in list(self.relationship_scenarios.items()):
+            value[:] = filter(is_kept, value)
+            if not value:
+                self._relationship_index.remove(
+                    self._relationship_index_keys(key.label,
+                                                  dict(key.source),
+                                                  dict(key.target)),
+                    key.label, value)
+                del self.relationship_scenarios[key]
 
     def _add_def_template(self, def_template):
         self.def_templates[def_template.uuid] = Template(
@@ -116,29 +345,21 @@ class ScenarioRepository(object):
             def_template.file_content,
             def_template.created_at)
 
-    def _expand_equivalence(self, scenario):
-        equivalent_scenarios = [scenario]
-        for symbol_name, entity in scenario.entities.items():
-            entity_key = frozenset(entity.properties.items())
-            if entity_key not in self.entity_equivalences:
-                continue
-            equivalent_scenarios = self._expand_on_symbol(
-                equivalent_scenarios,
-                symbol_name,
-                self.entity_equivalences[entity_key] - {entity_key})
-        return equivalent_scenarios
+    def _add_equivalences(self, scenario):
+        """Match the equivalent entities in the scenario subgraphs
 
-    @staticmethod
-    def _expand_on_symbol(scenarios_in, symbol_name, entity_keys):
-        scenarios_out = list(scenarios_in)
-        for entity_key in entity_keys:
-            for scenario in scenarios_in:
-                equivalent_scenario = \
-                    ScenarioLoader.build_equivalent_scenario(scenario,
-                                                             symbol_name,
-                                                             entity_key)
-                scenarios_out.append(equivalent_scenario)
-        return scenarios_out
+        The scenario is kept once, and its template entities match the
+        graph vertices of the equivalent entities as well.
+        """
+        equivalent_entities = {}
+        for template_id, entity in scenario.entities.items():
+            equivalent_properties = \
+                self.get_equivalent_properties(entity.properties)
+            if len(equivalent_properties) > 1:
+                equivalent_entities[template_id] = equivalent_properties[1:]
+        if equivalent_entities:
+            scenario.match_plans = SubGraphBuilder.compile(
+                scenario.subgraphs, equivalent_entities)
 
     def _add_scenario(self, scenario):
         for entity in scenario.entities.values():
@@ -157,9 +378,7 @@ class ScenarioRepository(object):
     def _load_templates_from_db(self):
         items = self._db.templates.query(template_type=TType.STANDARD)
         # TODO(ikinory): statuses may cause loading templates to be running
-        templates = [x for x in items if x.status in [TemplateStatus.ACTIVE,
-                                                      TemplateStatus.LOADING,
-                                                      TemplateStatus.DELETING]]
+        templates = [x for x in items if x.status in self._LOADED_STATUSES]
         for t in templates:
             self._add_template(t)
 
@@ -181,8 +400,30 @@ class ScenarioRepository(object):
     def _add_relationship_scenario(self, scenario, edge_desc):
 
         key = self._create_edge_scenario_key(edge_desc)
+        if key not in self.relationship_scenarios:
+            self._relationship_index.add(
+                self._relationship_index_keys(key.label,
+                                              edge_desc.source.properties,
+                                              edge_desc.target.properties),
+                key.label,
+                (self.get_equivalent_properties(dict(key.source)),
+                 self.get_equivalent_properties(dict(key.target)),
+                 self.relationship_scenarios[key]))
         self.relationship_scenarios[key].append((edge_desc, scenario))
 
+    def _relationship_index_keys(self, label, source_props, target_props):
+        return [self._relationship_index_key(label, source, target)
+                for source in self.get_equivalent_properties(source_props)
+                for target in self.get_equivalent_properties(target_props)]
+
+    @staticmethod
+    def _relationship_index_key(label, source_props, target_props):
+        source_type = _index_value(source_props, VProps.VITRAGE_TYPE)
+        target_type = _index_value(target_props, VProps.VITRAGE_TYPE)
+        if source_type is None or target_type is None:
+            return None
+        return label, source_type, target_type
+
     @staticmethod
     def _create_edge_scenario_key(edge_desc):
         try:
@@ -198,18 +439,110 @@ class ScenarioRepository(object):
     def _add_entity_scenario(self, scenario, entity):
 
         key = frozenset(list(entity.properties.items()))
+        if key not in self.entity_scenarios:
+            self._entity_index.add(
+                self._entity_index_keys(entity.properties),
+                None,
+                (self.get_equivalent_properties(dict(key)),
+                 self.entity_scenarios[key]))
         self.entity_scenarios[key].append((entity, scenario))
 
+    def _entity_index_keys(self, properties):
+        return [self._entity_index_key(equivalent_properties)
+                for equivalent_properties in
+                self.get_equivalent_properties(properties)]
+
+    @staticmethod
+    def _entity_index_key(properties):
+        category = _index_value(properties, VProps.VITRAGE_CATEGORY)
+        vitrage_type = _index_value(properties, VProps.VITRAGE_TYPE)
+        if category is None or vitrage_type is None:
+            return None
+        return category, vitrage_type
+
     def _enable_worker_scenarios(self, worker_ind, n):
-        """Enable a portion of the scenarios"""
-        self._all_scenarios.sort(key=lambda scenario: scenario.id)
+        """Enable a portion of the scenarios
 
-        scenarios = self._all_scenarios if \
-            worker_ind is None or n is None else\
-            get_portion(self._all_scenarios, n, worker_ind)
+        The scenarios that may take similar actions are enabled in the same
+        worker, see _group_by_actions. The groups of scenarios are balanced
+        between the workers by their stored costs. Scenarios without a stored
+        cost, e.g. of new templates, are given the average cost. If no costs
+        are stored yet, every worker gets about the same number of scenarios.
+        """
+        self._all_scenarios.sort(key=lambda scenario: scenario.id)
+        self._costs = self._load_costs()
+        self._trigger_filter = None
+        for s in self._all_scenarios:
+            s.enabled = False
+
+        if worker_ind is None or n is None:
+            scenarios = self._all_scenarios
+        else:
+            groups = self._group_by_actions()
+            if self._costs:
+                average = sum(self._costs.values()) / len(self._costs)
+                weights = [sum(self._costs.get(s.id, average) for s in group)
+                           for group in groups]
+            else:
+                weights = [len(group) for group in groups]
+            scenarios = itertools.chain(
+                *get_balanced_portion(groups, weights, n, worker_ind))
         for s in scenarios:
             s.enabled = True
 
+    def _group_by_actions(self):
+        """Group the scenarios that may take similar actions
+
+        The priority of similar actions is decided by the active actions of
+        a single evaluator worker, see ActiveActionsTracker. Actions may be
+        similar if they are of the same type and extra info, on targets of
+        the same vitrage type. An action on a target of any vitrage type may
+        be similar to all of them.
+
+        :return: the groups of scenarios, by the order of their first one
+        :rtype: list of lists
+        """
+        scenario_kinds = [(s, set(self._action_kinds(s)))
+                          for s in self._all_scenarios]
+        any_target = set(kind[:2] for _, kinds in scenario_kinds
+                         for kind in kinds if kind[2] is None)
+        parents = {}
+
+        def find(key):
+            while parents.setdefault(key, key) != key:
+                key = parents[key]
+            return key
+
+        def union(key1, key2):
+            parents[find(key1)] = find(key2)
+
+        for scenario, kinds in scenario_kinds:
+            for kind in kinds:
+                union(scenario.id, kind)
+                if kind[:2] in any_target:
+                    union(kind, kind[:2] + (None,))
+
+        groups = OrderedDict()
+        for scenario, _ in scenario_kinds:
+            groups.setdefault(find(scenario.id), []).append(scenario)
+        return list(groups.values())
+
+    @staticmethod
+    def _action_kinds(scenario):
+        for action in scenario.actions:
+            target = scenario.entities.get(action.targets.get(
+                TemplateFields.TARGET))
+            target_type = target.get(VProps.VITRAGE_TYPE) \
+                if target is not None else None
+            yield action.type, get_extra_info(action), target_type
+
+    def _load_costs(self):
+        """The stored evaluation time of each loaded scenario"""
+        scenario_ids = set(s.id for s in self._all_scenarios)
+        return {c.scenario_id: c.duration
+                for c in self._db.scenario_costs.query()
+                if c.scenario_id in scenario_ids}
+
     def _create_actions_collection(self):
         action_lists = (s.actions for s in self._all_scenarios)
         actions = (a for a in itertools.chain(*action_lists))
@@ -218,3 +551,12 @@ class ScenarioRepository(object):
     def log_enabled_scenarios(self):
         scenarios = [s for s in self._all_scenarios if s.enabled]
         LOG.info("Scenarios:\n%s", sorted([s.id for s in scenarios]))
+        LOG.info("Scenarios load: %s", self.get_enabled_load())
+        LOG.debug("Scenarios costs:\n%s",
+                  sorted(((s.id, self._costs.get(s.id)) for s in scenarios),
+                         key=lambda cost: -(cost[1] or 0)))
+
+    def get_enabled_load(self):
+        """The stored evaluation time of the enabled scenarios"""
+        return sum(self._costs.get(s.id, 0)
+                   for s in self._all_scenarios if s.enabled)
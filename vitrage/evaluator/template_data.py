@@ -25,7 +25,7 @@ RELATIONSHIP = 'relationship'
 
 class Scenario(object):
     def __init__(self, id, version, condition, actions, subgraphs, entities,
-                 relationships, enabled=False):
+                 relationships, enabled=False, match_plans=None):
         self.id = id
         self.version = version
         self.condition = condition
@@ -34,6 +34,7 @@ class Scenario(object):
         self.entities = entities
         self.relationships = relationships
         self.enabled = enabled
+        self.match_plans = match_plans
 
     def __eq__(self, other):
         return self.id == other.id and \
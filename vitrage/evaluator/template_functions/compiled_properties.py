@@ -0,0 +1,83 @@
+# Copyright 2018 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Action properties that call template functions
+
+The function calls in the action properties are parsed once, when the
+template is loaded. When the scenario is matched, only the functions
+themselves are called.
+"""
+from collections import namedtuple
+
+import six
+
+from vitrage.evaluator.base import is_function
+from vitrage.evaluator.base import parse_function
+
+
+class TemplateFunction(namedtuple('TemplateFunction',
+                                  ['call', 'func', 'args'])):
+    """A call of a template function, with its arguments
+
+    call is the function call, as written in the template
+    """
+    __slots__ = ()
+
+    def __call__(self, match):
+        return self.func(match, *self.args)
+
+
+def compile_properties(properties, functions):
+    """Replace the function calls in the action properties
+
+    :param properties: the action properties, as written in the template
+    :param functions: the template functions, by name
+    :return: a copy of the properties, where every call of a known
+     function is a TemplateFunction
+    """
+    compiled = {}
+    for key, value in properties.items():
+        if isinstance(value, dict):
+            value = compile_properties(value, functions)
+        elif isinstance(value, six.string_types) and is_function(value):
+            func_name, args = parse_function(value)
+            if func_name in functions:
+                value = TemplateFunction(value, functions[func_name],
+                                         tuple(args))
+        compiled[key] = value
+    return compiled
+
+
+def evaluate_properties(properties, match):
+    """Call the template functions in the properties for the match
+
+    :param properties: compiled action properties
+    :param match: the evaluator's match structure, {template_id: Vertex}
+    :return: the properties, with the value returned by every function.
+     The properties themselves are returned if they call no function
+    """
+    evaluated = properties
+    for key, value in properties.items():
+        if isinstance(value, TemplateFunction):
+            new_value = value(match)
+        elif isinstance(value, dict):
+            new_value = evaluate_properties(value, match)
+            if new_value is value:
+                continue
+        else:
+            continue
+
+        if evaluated is properties:
+            evaluated = dict(properties)
+        evaluated[key] = new_value
+    return evaluated
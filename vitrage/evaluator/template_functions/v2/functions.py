@@ -76,3 +76,8 @@ def get_attr(match, *args):
               template_id, attr_name, str(entity_props), attr)
 
     return attr
+
+
+FUNCTIONS = {
+    GET_ATTR: get_attr,
+}
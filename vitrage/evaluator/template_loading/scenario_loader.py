@@ -14,7 +14,6 @@
 
 from oslo_log import log
 
-from vitrage.common.exception import VitrageError
 from vitrage.evaluator.condition import get_condition_common_targets
 from vitrage.evaluator.condition import parse_condition
 from vitrage.evaluator.condition import SymbolResolver
@@ -23,9 +22,10 @@ from vitrage.evaluator.template_data import ENTITY
 from vitrage.evaluator.template_data import RELATIONSHIP
 from vitrage.evaluator.template_data import Scenario
 from vitrage.evaluator.template_fields import TemplateFields as TFields
+from vitrage.evaluator.template_functions.compiled_properties import \
+    compile_properties
 from vitrage.evaluator.template_loading.subgraph_builder import \
     SubGraphBuilder
-from vitrage.graph import Vertex
 
 LOG = log.getLogger(__name__)
 
@@ -59,42 +59,11 @@ class ScenarioLoader(object):
             scenarios.append(
                 Scenario(scenario_id, self._template_schema.version(),
                          condition, actions, subgraphs,
-                         self.entities, self.relationships))
+                         self.entities, self.relationships,
+                         match_plans=SubGraphBuilder.compile(subgraphs)))
 
         return scenarios
 
-    @classmethod
-    def build_equivalent_scenario(cls, scenario, template_id, entity_props):
-        entities = scenario.entities.copy()
-        entities[template_id] = Vertex(
-            vertex_id=entities[template_id].vertex_id,
-            properties={k: v for k, v in entity_props})
-        relationships = {
-            rel_id: cls._build_equivalent_relationship(rel,
-                                                       template_id,
-                                                       entity_props)
-            for rel_id, rel in scenario.relationships.items()}
-
-        def extract_var(symbol_name):
-            if symbol_name in entities:
-                return entities[symbol_name], ENTITY
-            elif symbol_name in relationships:
-                return relationships[symbol_name], RELATIONSHIP
-            else:
-                raise VitrageError('invalid symbol name: {}'
-                                   .format(symbol_name))
-
-        subgraphs = SubGraphBuilder.from_condition(
-            scenario.condition, extract_var)
-
-        return Scenario(id=scenario.id + '_equivalence',
-                        version=scenario.version,
-                        condition=scenario.condition,
-                        actions=scenario.actions,
-                        subgraphs=subgraphs,
-                        entities=entities,
-                        relationships=relationships)
-
     def _build_actions(self, actions_def, scenario_id):
         actions = []
 
@@ -104,8 +73,10 @@ class ScenarioLoader(object):
             action_loader = self._template_schema.loaders.get(action_type)
 
             if action_loader:
-                actions.append(action_loader.load(action_id, self.valid_target,
-                                                  action_def))
+                action = action_loader.load(action_id, self.valid_target,
+                                            action_def)
+                actions.append(action._replace(properties=compile_properties(
+                    action.properties, self._template_schema.functions)))
             else:
                 LOG.warning('Failed to load action of type %s', action_type)
 
@@ -154,19 +125,3 @@ class ScenarioLoader(object):
 
         def get_entity_id(self, entity):
             return entity.vertex_id
-
-    @staticmethod
-    def _build_equivalent_relationship(relationship,
-                                       template_id,
-                                       entity_props):
-        source = relationship.source
-        target = relationship.target
-        if relationship.edge.source_id == template_id:
-            source = Vertex(vertex_id=source.vertex_id,
-                            properties={k: v for k, v in entity_props})
-        elif relationship.edge.target_id == template_id:
-            target = Vertex(vertex_id=target.vertex_id,
-                            properties={k: v for k, v in entity_props})
-        return EdgeDescription(source=source,
-                               target=target,
-                               edge=relationship.edge)
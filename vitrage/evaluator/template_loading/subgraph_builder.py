@@ -16,6 +16,7 @@ from vitrage.common.constants import EdgeProperties as EProps
 from vitrage.common.constants import VertexProperties as VProps
 from vitrage.evaluator.template_data import EdgeDescription
 from vitrage.evaluator.template_data import ENTITY
+from vitrage.graph.algo_driver.sub_graph_matching import MatchPlan
 from vitrage.graph.algo_driver.sub_graph_matching import NEG_CONDITION
 from vitrage.graph.driver.networkx_graph import NXGraph
 
@@ -34,8 +35,7 @@ class SubGraphBuilder(object):
             variable, var_type = extract_var(term.symbol_name)
             if var_type == ENTITY:
                 vertex = variable.copy()
-                vertex[VProps.VITRAGE_IS_DELETED] = False
-                vertex[VProps.VITRAGE_IS_PLACEHOLDER] = False
+                cls._set_vertex_info(vertex)
                 condition_g.add_vertex(vertex)
 
             else:  # type = relationship
@@ -46,10 +46,36 @@ class SubGraphBuilder(object):
                 cls._set_edge_relationship_info(edge_desc, term.positive)
                 cls._add_edge_relationship(condition_g, edge_desc)
 
+        condition_g.freeze()
         return condition_g
 
+    @classmethod
+    def compile(cls, subgraphs, equivalent_entities=None):
+        """The match plans of the subgraphs, used by the evaluator
+
+        :param equivalent_entities: template id -> the properties of the
+         entities that are equivalent to the template entity
+        :type equivalent_entities: dict
+        :rtype: list of MatchPlan
+        """
+        equivalent_properties = {}
+        for template_id, entities in (equivalent_entities or {}).items():
+            equivalent_properties[template_id] = []
+            for entity_props in entities:
+                vertex_props = dict(entity_props)
+                cls._set_vertex_info(vertex_props)
+                equivalent_properties[template_id].append(vertex_props)
+        return [MatchPlan(subgraph,
+                          equivalent_properties=equivalent_properties)
+                for subgraph in subgraphs]
+
     @staticmethod
-    def _set_edge_relationship_info(edge_description,
+    def _set_vertex_info(vertex):
+        vertex[VProps.VITRAGE_IS_DELETED] = False
+        vertex[VProps.VITRAGE_IS_PLACEHOLDER] = False
+
+    @classmethod
+    def _set_edge_relationship_info(cls, edge_description,
                                     is_positive_condition):
         if not is_positive_condition:
             edge_description.edge[NEG_CONDITION] = True
@@ -58,10 +84,8 @@ class SubGraphBuilder(object):
             edge_description.edge[EProps.VITRAGE_IS_DELETED] = False
             edge_description.edge[NEG_CONDITION] = False
 
-        edge_description.source[VProps.VITRAGE_IS_DELETED] = False
-        edge_description.source[VProps.VITRAGE_IS_PLACEHOLDER] = False
-        edge_description.target[VProps.VITRAGE_IS_DELETED] = False
-        edge_description.target[VProps.VITRAGE_IS_PLACEHOLDER] = False
+        cls._set_vertex_info(edge_description.source)
+        cls._set_vertex_info(edge_description.target)
 
     @staticmethod
     def _add_edge_relationship(condition_graph, edge_description):
@@ -15,8 +15,7 @@ from oslo_log import log
 
 from vitrage.evaluator.actions.base import ActionType
 from vitrage.evaluator.template_fields import TemplateFields
-from vitrage.evaluator.template_functions.v2.functions import get_attr
-from vitrage.evaluator.template_functions.v2.functions import GET_ATTR
+from vitrage.evaluator.template_functions.v2.functions import FUNCTIONS
 from vitrage.evaluator.template_loading.v1.action_loader import ActionLoader
 from vitrage.evaluator.template_loading.v1.execute_mistral_loader import \
     ExecuteMistralLoader
@@ -82,7 +81,7 @@ class TemplateSchema2(TemplateSchema1):
         self.validators[ActionType.EXECUTE_MISTRAL] = \
             V2ExecuteMistralValidator
         self.loaders[ActionType.EXECUTE_MISTRAL] = ActionLoader()
-        self.functions[GET_ATTR] = get_attr
+        self.functions.update(FUNCTIONS)
 
     def version(self):
         return '2'
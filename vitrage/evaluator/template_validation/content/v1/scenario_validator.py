@@ -12,14 +12,10 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-from sympy.logic.boolalg import Not
-from sympy import Symbol
-
 from oslo_log import log
 from six.moves import reduce
 
 from vitrage.common.constants import EdgeProperties as EProps
-from vitrage.evaluator.condition import convert_to_dnf_format
 from vitrage.evaluator.condition import get_condition_common_targets
 from vitrage.evaluator.condition import is_condition_include_positive_clause
 from vitrage.evaluator.condition import parse_condition
@@ -75,14 +71,14 @@ class ScenarioValidator(object):
     @classmethod
     def _validate_scenario_condition(cls, def_index, condition):
         try:
-            dnf_result = convert_to_dnf_format(condition)
+            condition_dnf = parse_condition(condition)
         except Exception:
             LOG.error('%s status code: %s' % (status_msgs[85], 85))
             return get_content_fault_result(85)
 
         # not condition validation
         not_condition_result = cls._validate_not_condition(def_index,
-                                                           dnf_result)
+                                                           condition_dnf)
         if not not_condition_result.is_valid_config:
             return not_condition_result
 
@@ -104,7 +100,7 @@ class ScenarioValidator(object):
 
         # condition structure validation
         condition_structure_result = cls._validate_condition_structure(
-            def_index, parse_condition(condition))
+            def_index, condition_dnf)
         if not condition_structure_result.is_valid_config:
             return condition_structure_result
 
@@ -132,36 +128,27 @@ class ScenarioValidator(object):
             else get_content_fault_result(134)
 
     @classmethod
-    def _validate_not_condition(cls, def_index, dnf_result):
+    def _validate_not_condition(cls, def_index, condition_dnf):
         """Not operator validation
 
         Not operator can appear only on edges.
 
-        :param dnf_result:
+        :param condition_dnf:
         :param def_index:
         :return:
         """
 
-        if isinstance(dnf_result, Not):
-            for arg in dnf_result.args:
-                if isinstance(arg, Symbol):
-                    definition = def_index.get(str(arg), None)
-                    if not (definition and
-                            definition.get(EProps.RELATIONSHIP_TYPE)):
-                        msg = status_msgs[86] + ' template id: %s' % arg
-                        LOG.error('%s status code: %s' % (msg, 86))
-                        return get_content_fault_result(86, msg)
-                else:
-                    res = cls._validate_not_condition(def_index, arg)
-                    if not res.is_valid_config:
-                        return res
-            return get_content_correct_result()
-
-        for arg in dnf_result.args:
-            if not isinstance(arg, Symbol):
-                res = cls._validate_not_condition(def_index, arg)
-                if not res.is_valid_config:
-                    return res
+        for clause in condition_dnf:
+            for term in clause:
+                if term.positive:
+                    continue
+                definition = def_index.get(term.symbol_name, None)
+                if not (definition and
+                        definition.get(EProps.RELATIONSHIP_TYPE)):
+                    msg = status_msgs[86] + ' template id: %s' % \
+                        term.symbol_name
+                    LOG.error('%s status code: %s' % (msg, 86))
+                    return get_content_fault_result(86, msg)
 
         return get_content_correct_result()
 
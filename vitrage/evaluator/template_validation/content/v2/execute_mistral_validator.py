@@ -18,7 +18,9 @@ import re
 from vitrage.evaluator.actions.recipes.execute_mistral import INPUT
 from vitrage.evaluator.actions.recipes.execute_mistral import WORKFLOW
 from vitrage.evaluator.base import is_function
+from vitrage.evaluator.base import parse_function
 from vitrage.evaluator.template_fields import TemplateFields
+from vitrage.evaluator.template_functions.v2.functions import FUNCTIONS
 from vitrage.evaluator.template_validation.content.base import \
     ActionValidator
 from vitrage.evaluator.template_validation.content.base import \
@@ -54,5 +56,9 @@ class ExecuteMistralValidator(ActionValidator):
             if re.findall('[(),]', value) and not is_function(value):
                 LOG.error('%s status code: %s' % (status_msgs[138], 138))
                 return get_content_warning_result(138)
+            if is_function(value) and \
+                    parse_function(value)[0] not in FUNCTIONS:
+                LOG.error('%s status code: %s' % (status_msgs[139], 139))
+                return get_content_fault_result(139)
 
         return get_content_correct_result()
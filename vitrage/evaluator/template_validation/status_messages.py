@@ -92,6 +92,7 @@ status_msgs = {
     137: 'Functions are supported only from version 2',
     138: 'Warning: only open or close parenthesis exists. Did you try to use '
          'a function?',
+    139: 'Unknown function in action properties',
 
     # def_templates status messages 140-159
     140: 'At least one template must be included',
@@ -17,6 +17,12 @@ from collections import namedtuple
 from osprofiler import profiler
 import six
 
+from vitrage.common.constants import EdgeProperties as EProps
+from vitrage.graph.algo_driver.sub_graph_matching import NEG_CONDITION
+from vitrage.graph.algo_driver.sub_graph_matching import subgraph_matching
+from vitrage.graph.driver import Edge
+from vitrage.graph.driver import Vertex
+
 Mapping = \
     namedtuple('Mapping', ['subgraph_element', 'graph_element', 'is_vertex'])
 
@@ -53,19 +59,47 @@ class GraphAlgorithm(object):
         """
         pass
 
-    @abc.abstractmethod
-    def sub_graph_matching(self, sub_graph, known_mappings, validate=False):
-        """Search for occurrences of a template graph in the graph
+    def sub_graph_matching(self,
+                           subgraph,
+                           known_match,
+                           validate=False):
+        """Finds all the matching subgraphs in the graph
 
         In sub-graph matching algorithms complexity is high in the general case
         Here it is considerably mitigated  as we have an anchor in the graph.
 
-        :type known_mappings: list
-        :type sub_graph: driver.Graph
+        In case the known_match has a subgraph edge with property
+        "negative_condition" then run subgraph matching on the edge vertices
+        and unite the results.
+        Otherwise just run subgraph matching and return its result.
+
+        :param subgraph: the subgraph to match
+        :type subgraph: driver.Graph or MatchPlan
+        :param known_match: starting point at the subgraph and the graph
+        :type known_match: Mapping
         :type validate: bool
+        :return: all the matching subgraphs in the graph
         :rtype: list of dict
         """
-        pass
+        sge = known_match.subgraph_element
+        ge = known_match.graph_element
+
+        if not known_match.is_vertex and sge.get(NEG_CONDITION):
+            source_matches = self._filtered_subgraph_matching(ge.source_id,
+                                                              sge.source_id,
+                                                              subgraph,
+                                                              validate)
+            target_matches = self._filtered_subgraph_matching(ge.target_id,
+                                                              sge.target_id,
+                                                              subgraph,
+                                                              validate)
+
+            return self._list_union(source_matches, target_matches)
+        else:
+            return subgraph_matching(self.graph,
+                                     subgraph,
+                                     [known_match],
+                                     validate)
 
     @abc.abstractmethod
     def subgraph(self, entities):
@@ -75,19 +109,20 @@ class GraphAlgorithm(object):
         the edges between those nodes.
 
         :type entities: list
-        :rtype: NXGraph
+        :rtype: driver.Graph
         """
         pass
 
-    @staticmethod
-    def connected_component_subgraphs(subgraph):
-        """Generate connected components as subgraphs.
+    @abc.abstractmethod
+    def connected_component_subgraphs(self, subgraph):
+        """Generate the (weakly) connected components of subgraph as graphs.
 
-        :type subgraph: NetworkX graph.
-        :rtype: list of NXGraphs
+        :type subgraph: driver.Graph
+        :rtype: list of driver.Graph
         """
         pass
 
+    @abc.abstractmethod
     def all_simple_paths(self, source, target):
         """Generate all simple paths in the graph G from source to target.
 
@@ -112,6 +147,58 @@ class GraphAlgorithm(object):
         :type vertex_attr_filter: dictionary
         :type query_dict: dictionary
         :type edge_attr_filter: dictionary
-        :rtype: NXGraph
+        :rtype: driver.Graph
         """
         pass
+
+    def _filtered_subgraph_matching(self,
+                                    ge_v_id,
+                                    sge_v_id,
+                                    subgraph,
+                                    validate):
+        """Runs subgraph_matching on edges vertices with filtering
+
+        Runs subgraph_matching on edges vertices after checking if that vertex
+        has real neighbors in the entity graph.
+        """
+        if self.graph.neighbors(ge_v_id,
+                                edge_attr_filter={EProps.VITRAGE_IS_DELETED:
+                                                  False},
+                                read_only=True):
+            template_vertex = subgraph.get_vertex(sge_v_id)
+            graph_vertex = self.graph.get_vertex(ge_v_id)
+            match = Mapping(template_vertex, graph_vertex, True)
+            return subgraph_matching(self.graph, subgraph, [match], validate)
+
+        return []
+
+    @staticmethod
+    def _edge_result_to_list(edge_result):
+        d = dict()
+        for source_id, target_id, label, data in edge_result:
+            d[(source_id, target_id, label)] = \
+                Edge(source_id, target_id, label, properties=data)
+        return d.values()
+
+    @staticmethod
+    def _vertex_result_to_list(vertex_result):
+        d = dict()
+        for v_id, data in vertex_result:
+            d[v_id] = Vertex(vertex_id=v_id, properties=data)
+        return d.values()
+
+    @staticmethod
+    def _list_union(list_1, list_2):
+        """Union of list that aren't hashable
+
+        Can't use here set union because the items in the lists are
+        dictionaries and they are not hashable for set.
+
+        :return: list - union list
+        """
+
+        for target_item in list_2:
+            if target_item not in list_1:
+                list_1.append(target_item)
+
+        return list_1
@@ -0,0 +1,193 @@
+# Copyright 2018 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from oslo_log import log as logging
+
+from vitrage.common.exception import VitrageError
+from vitrage.graph.algo_driver.algorithm import GraphAlgorithm
+from vitrage.graph.driver import Direction
+from vitrage.graph.driver import Edge
+from vitrage.graph.filter import check_filter
+from vitrage.graph.query import create_predicate
+
+LOG = logging.getLogger(__name__)
+
+
+class CompactAlgorithm(GraphAlgorithm):
+
+    def __init__(self, graph):
+        """Create a new GraphAlgorithm
+
+        :param graph: graph instance
+        :type graph: driver.CompactGraph
+        """
+        super(CompactAlgorithm, self).__init__(graph)
+
+    @classmethod
+    def _create_new_graph(cls, *args, **kwargs):
+        from vitrage.graph.driver.compact_graph import CompactGraph
+        return CompactGraph(*args, **kwargs)
+
+    def graph_query_vertices(self,
+                             root_id,
+                             query_dict=None,
+                             depth=None,
+                             direction=Direction.BOTH,
+                             edge_query_dict=None):
+        graph = self._create_new_graph('graph')
+
+        root_data = self.graph.get_vertex(root_id, read_only=True).properties
+
+        match_func = create_predicate(query_dict) if query_dict else None
+        edge_match_func = create_predicate(edge_query_dict) \
+            if edge_query_dict else None
+
+        if match_func and not match_func(root_data):
+            LOG.info('graph_query_vertices: root %s does not match filter %s',
+                     str(root_id), str(query_dict))
+            return graph
+
+        n_result = []
+        visited_nodes = set()
+        n_result.append((root_id, root_data))
+        e_result = []
+        nodes_q = [(root_id, 0)]
+        while nodes_q:
+            node_id, curr_depth = nodes_q.pop(0)
+            if (node_id in visited_nodes) or (depth and curr_depth >= depth):
+                continue
+            visited_nodes.add(node_id)
+            (n_list, e_list) = self.graph._neighboring_nodes_edges_query(
+                node_id,
+                direction=direction,
+                vertex_predicate=match_func,
+                edge_predicate=edge_match_func)
+            n_result.extend(n_list)
+            e_result.extend(e_list)
+            nodes_q.extend([(v_id, curr_depth + 1) for v_id, data in n_list])
+
+        graph = self._create_new_graph(
+            graph.name,
+            vertices=self._vertex_result_to_list(n_result),
+            edges=self._edge_result_to_list(e_result))
+
+        LOG.debug('graph_query_vertices: find graph: nodes %s, edges %s',
+                  graph.num_vertices(), graph.num_edges())
+        return graph
+
+    def create_graph_from_matching_vertices(self,
+                                            vertex_attr_filter=None,
+                                            query_dict=None,
+                                            edge_attr_filter=None):
+        if query_dict:
+            vertices = self.graph.get_vertices(query_dict=query_dict,
+                                               read_only=True)
+        elif vertex_attr_filter:
+            vertices = self.graph.get_vertices(
+                vertex_attr_filter=vertex_attr_filter, read_only=True)
+        else:
+            vertices = self.graph.get_vertices(read_only=True)
+
+        graph = self.subgraph([vertex.vertex_id for vertex in vertices])
+
+        # delete non matching edges
+        if edge_attr_filter:
+            self._apply_edge_attr_filter(graph, edge_attr_filter)
+
+        LOG.debug('match query, find graph: nodes %s, edges %s',
+                  graph.num_vertices(), graph.num_edges())
+        return graph
+
+    def subgraph(self, entities):
+        vertices = {}
+        for v_id in entities:
+            vertex = self.graph.get_vertex(v_id, read_only=True)
+            if vertex is not None:
+                vertices[v_id] = vertex
+
+        edges = []
+        for v_id in vertices:
+            edges.extend(e for e in self.graph.get_edges(
+                v_id, direction=Direction.OUT, read_only=True)
+                if e.target_id in vertices)
+
+        return self._create_new_graph('graph',
+                                      vertices=vertices.values(),
+                                      edges=edges)
+
+    def connected_component_subgraphs(self, subgraph):
+        components = []
+        visited = set()
+        for vertex in subgraph.get_vertices(read_only=True):
+            if vertex.vertex_id in visited:
+                continue
+            component = [vertex.vertex_id]
+            visited.add(vertex.vertex_id)
+            for v_id in component:
+                for neighbor in subgraph.neighbors(v_id, read_only=True):
+                    if neighbor.vertex_id not in visited:
+                        visited.add(neighbor.vertex_id)
+                        component.append(neighbor.vertex_id)
+            components.append(subgraph.algo.subgraph(component))
+        return components
+
+    def all_simple_paths(self, source, target):
+        """Same paths as networkx all_simple_paths
+
+        Like networkx on a multi graph, a path is generated for every edge
+        between the last two vertices of the path.
+        """
+        for v_id in (source, target):
+            if self.graph.get_vertex(v_id, read_only=True) is None:
+                raise VitrageError('node %s not in graph' % str(v_id))
+        return self._all_simple_paths(source, target,
+                                      self.graph.num_vertices() - 1)
+
+    def _all_simple_paths(self, source, target, cutoff):
+        if cutoff < 1:
+            return
+
+        visited = [source]
+        stack = [iter(self._successors(source))]
+        while stack:
+            children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                visited.pop()
+            elif len(visited) < cutoff:
+                if child == target:
+                    yield visited + [target]
+                elif child not in visited:
+                    visited.append(child)
+                    stack.append(iter(self._successors(child)))
+            else:  # len(visited) == cutoff
+                count = ([child] + list(children)).count(target)
+                for i in range(count):
+                    yield visited + [target]
+                stack.pop()
+                visited.pop()
+
+    def _successors(self, v_id):
+        """The target of every out edge of the vertex"""
+        return [target_id for source_id, target_id, label, data in
+                self.graph._neighboring_nodes_edges_query(
+                    v_id, direction=Direction.OUT)[1]]
+
+    @staticmethod
+    def _apply_edge_attr_filter(graph, edge_attr_filter):
+        edges_to_remove = [(u, v, k) for (u, v, k, d) in graph._edges()
+                           if not check_filter(d, edge_attr_filter)]
+        for source, target, key in edges_to_remove:
+            graph.remove_edge(Edge(source, target, key))
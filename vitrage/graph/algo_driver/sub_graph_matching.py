@@ -11,303 +11,461 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+from collections import namedtuple
 
 from oslo_log import log as logging
 import six
 
+from vitrage.common.constants import EdgeProperties as EProps
 from vitrage.common.exception import VitrageAlgorithmError
+from vitrage.graph.driver.elements import Vertex
 from vitrage.graph.filter import check_filter
 
 LOG = logging.getLogger(__name__)
 
-MAPPED_V_ID = 'mapped_v_id'
-NEIGHBORS_MAPPED = 'neighbors_mapped'
-GRAPH_VERTEX = 'graph_vertex'
 NEG_VERTEX = 'negative vertex'
 NEG_CONDITION = 'negative_condition'
 
 
-def subgraph_matching(base_graph, subgraph, matches, validate=False):
-    """Find all occurrences of subgraph in the graph
-
-    In the following, a partial mapping is a copy of the sub-graph.
-    As we go, vertices of curr_mapping graph will be updated with new
-    fields used only for the traversal:
+class TemplateEdge(namedtuple('TemplateEdge', ['source_id',
+                                               'target_id',
+                                               'label',
+                                               'properties',
+                                               'negative'])):
+    __slots__ = ()
 
-     - MAPPED_V_ID:
-       The vertex_id of the corresponding vertex in the graph.
-       If it is not empty, than this vertex is already mapped
+    def get(self, key, default=None):
+        return self.properties.get(key, default)
 
-     - NEIGHBORS_MAPPED:
-       True or None. When set True it means all the
-       neighbors of this vertex have already been mapped
 
-    Implementation Details:
-    ----------------------
+# Map template vertex v_id, a neighbor of the mapped template vertex
+# mapped_id, and check the template edges to the vertices mapped before it.
+# A graph vertex matches the template vertex if it matches any of filters
+Step = namedtuple(
+    'Step', ['mapped_id', 'v_id', 'filters', 'pos_edges', 'neg_edges'])
 
-    - Init Step:
-      copy the sub-graph to create the first candidate mapping graph. In which
-      known vertices mappings are added to vertices MAPPED_V_ID. So, we now
-      have a sub-graph copy where some of the vertices already have a mapping
 
-    Main loop steps:
+class MatchPlan(object):
+    """A template subgraph, compiled for subgraph_matching
 
-    - Steps 1:
-      Pop a partially mapped sub-graph from the queue.
-      If all its vertices have a MAPPED_V_ID, add it to final mappings
+    Compiled once, when the scenario is loaded:
 
-    - Steps 2 & 3:
-      Find one template vertex that is not mapped but has a mapped neighbor
+    - The template vertices and edges, so the template graph is not read
+      during the matching
+    - The steps of the matching from every template vertex and every
+      template edge: the order in which the template vertices are mapped,
+      and the edges to check for each one of them. The order does not
+      depend on the entity graph, only on the template vertices that are
+      already mapped
+    - For every negative edge, the plan of the same subgraph where the edge
+      is positive. It is matched when the edge itself has changed
+    - The connected component of every template vertex, over the positive
+      edges
+    - The filters of every template vertex: its properties, and the
+      properties of the equivalent entities
 
-    - Step 4: CHECK PROPERTIES
-      In the graph find candidate vertices that are linked to that neighbor
-      and match the template vertex properties
+    A MatchPlan is not changed after it is created.
+    """
 
-    - Step 5: CHECK STRUCTURE
-      Filter candidate vertices according to edges
+    def __init__(self, subgraph, positive_edge=None,
+                 equivalent_properties=None):
+        """Compile the subgraph
+
+        :type subgraph: driver.Graph
+        :param positive_edge: (source_id, target_id, label) of a negative
+         edge that is positive in this plan
+        :type positive_edge: tuple
+        :param equivalent_properties: template vertex id -> the properties
+         of the entities that are equivalent to the template vertex
+        :type equivalent_properties: dict
+        """
+        if equivalent_properties is None:
+            equivalent_properties = {}
+        vertex_ids = []
+        self.properties = {}
+        self.filters = {}
+        self.neighbors = {}
+        self.edges = {}
+        for vertex in subgraph.get_vertices(read_only=True):
+            v_id = vertex.vertex_id
+            vertex_ids.append(v_id)
+            self.properties[v_id] = vertex.properties.copy()
+            self.filters[v_id] = (self.properties[v_id],) + tuple(
+                equivalent_properties.get(v_id, ()))
+            self.neighbors[v_id] = tuple(
+                neighbor.vertex_id for neighbor in
+                subgraph.neighbors(v_id, read_only=True))
+            self.edges[v_id] = tuple(
+                self._template_edge(e, positive_edge)
+                for e in subgraph.get_edges(v_id, read_only=True))
+        self.vertex_ids = tuple(vertex_ids)
+
+        self._steps = {}
+        for v_id in self.vertex_ids:
+            self._steps[frozenset([v_id])] = self._compile_steps([v_id])
+            for e in self.edges[v_id]:
+                key = frozenset([e.source_id, e.target_id])
+                if key not in self._steps:
+                    self._steps[key] = self._compile_steps(key)
+
+        self._positive_edge_plans = {}
+        if positive_edge is None:
+            for e in self._all_edges():
+                if e.negative:
+                    key = (e.source_id, e.target_id, e.label)
+                    self._positive_edge_plans[key] = MatchPlan(
+                        subgraph, key, equivalent_properties)
+
+        self._connected_components = self._compile_connected_components()
+
+    def steps(self, mapped_ids):
+        """The matching steps after mapping the given template vertices
+
+        :type mapped_ids: frozenset
+        :return: the steps, and whether they map all the template vertices
+        :rtype: tuple
+        """
+        compiled = self._steps.get(mapped_ids)
+        if compiled is None:
+            compiled = self._compile_steps(mapped_ids)
+        return compiled
+
+    def positive_edge_plan(self, source_id, target_id, label):
+        """The plan of this subgraph, where the negative edge is positive
+
+        :rtype: MatchPlan
+        """
+        return self._positive_edge_plans.get((source_id, target_id, label))
+
+    def connected_component(self, v_id):
+        """Template vertex ids connected to v_id by positive edges
+
+        :rtype: frozenset
+        """
+        return self._connected_components.get(v_id, frozenset())
+
+    def get_vertex(self, v_id):
+        if v_id in self.properties:
+            return Vertex(v_id, self.properties[v_id].copy())
+
+    def get_edge(self, source_id, target_id, label):
+        for e in self.edges.get(source_id, ()):
+            if (e.source_id, e.target_id, e.label) == \
+                    (source_id, target_id, label):
+                return e
+
+    def choose_vertex(self, vertex_ids, curr_v_id=None):
+        """The first vertex without a negative edge (to curr_v_id if given)
+
+        If all of them have one, the first vertex.
+        """
+        for v_id in vertex_ids:
+            if not any(e.negative for e in self.edges[v_id]
+                       if curr_v_id is None or
+                       curr_v_id in (e.source_id, e.target_id)):
+                return v_id
+        return vertex_ids[0]
+
+    @staticmethod
+    def _template_edge(edge, positive_edge):
+        properties = edge.properties.copy()
+        if positive_edge == (edge.source_id, edge.target_id, edge.label):
+            properties[NEG_CONDITION] = False
+            properties[EProps.VITRAGE_IS_DELETED] = False
+        return TemplateEdge(edge.source_id, edge.target_id, edge.label,
+                            properties, bool(properties.get(NEG_CONDITION)))
+
+    def _all_edges(self):
+        return [e for v_id in self.vertex_ids for e in self.edges[v_id]
+                if e.source_id == v_id]
+
+    def _compile_steps(self, mapped_ids):
+        """Follow the matching from the mapped template vertices
+
+        Every step maps one more template vertex, a neighbor of a mapped
+        vertex. If some template vertices can not be reached, the matching
+        has no results.
+        """
+        mapped = set(mapped_ids)
+        neighbors_mapped = set()
+        steps = []
+        while len(mapped) < len(self.vertex_ids):
+            ids_with_unmapped_neighbors = [
+                v_id for v_id in self.vertex_ids
+                if v_id in mapped and v_id not in neighbors_mapped]
+            if not ids_with_unmapped_neighbors:
+                return tuple(steps), False
+
+            mapped_id = self.choose_vertex(ids_with_unmapped_neighbors)
+            unmapped_neighbors = [v_id for v_id in self.neighbors[mapped_id]
+                                  if v_id not in mapped]
+            if not unmapped_neighbors:
+                neighbors_mapped.add(mapped_id)
+                continue
+            v_id = self.choose_vertex(unmapped_neighbors, mapped_id)
+
+            edges = [e for e in self.edges[v_id]
+                     if (e.target_id if e.source_id == v_id
+                         else e.source_id) in mapped]
+            steps.append(Step(mapped_id,
+                              v_id,
+                              self.filters[v_id],
+                              tuple(e for e in edges if not e.negative),
+                              tuple(e for e in edges if e.negative)))
+            mapped.add(v_id)
+        return tuple(steps), True
+
+    def _compile_connected_components(self):
+        components = {}
+        for v_id in self.vertex_ids:
+            if v_id in components:
+                continue
+            component = [v_id]
+            for curr_id in component:
+                for e in self.edges[curr_id]:
+                    if e.negative:
+                        continue
+                    other = e.target_id if e.source_id == curr_id \
+                        else e.source_id
+                    if other not in component:
+                        component.append(other)
+            component = frozenset(component)
+            for curr_id in component:
+                components[curr_id] = component
+        return components
+
+
+class _Mapping(object):
+    """A partial mapping of the template vertices to the graph vertices
+
+    - graph_ids: template vertex id -> graph vertex id, or NEG_VERTEX for a
+      template vertex that is matched by a negative condition
+    - graph_vertices: template vertex id -> graph vertex
     """
-    final_subgraphs = []
-    initial_sg = _create_initial_subgraph(matches,
-                                          base_graph,
-                                          subgraph,
-                                          validate)
-    if not initial_sg:
-        LOG.warning('subgraph_matching:Initial sub-graph creation failed')
-        LOG.warning('subgraph_matching: Known matches: %s', str(matches))
-        return final_subgraphs
-    queue = [initial_sg]
-
-    while queue:
-        curr_subgraph = queue.pop(0)
-
-        # STEP 1: STOPPING CONDITION
-        mapped_vertices = list(filter(
-            lambda v: v.get(MAPPED_V_ID),
-            curr_subgraph.get_vertices()))
-        if len(mapped_vertices) == subgraph.num_vertices():
-            final_subgraphs.append(curr_subgraph)
-            continue
+    __slots__ = ('graph_ids', 'graph_vertices')
 
-        # STEP 2: CAN WE THROW THIS SUB-GRAPH?
-        vertices_with_unmapped_neighbors = list(filter(
-            lambda v: not v.get(NEIGHBORS_MAPPED),
-            mapped_vertices))
-        if not vertices_with_unmapped_neighbors:
-            continue
+    def __init__(self):
+        self.graph_ids = {}
+        self.graph_vertices = {}
 
-        # STEP 3: FIND A SUB-GRAPH VERTEX TO MAP
-        v_with_unmapped_neighbors = _choose_vertex(
-            vertices_with_unmapped_neighbors,
-            curr_subgraph)
-
-        unmapped_neighbors = list(filter(
-            lambda v: not v.get(MAPPED_V_ID),
-            curr_subgraph.neighbors(v_with_unmapped_neighbors.vertex_id)))
-        if not unmapped_neighbors:
-            # Mark vertex as NEIGHBORS_MAPPED=True
-            v_with_unmapped_neighbors[NEIGHBORS_MAPPED] = True
-            curr_subgraph.update_vertex(v_with_unmapped_neighbors)
-            queue.append(curr_subgraph)
-            continue
-        subgraph_vertex_to_map = _choose_vertex(
-            unmapped_neighbors,
-            curr_subgraph,
-            curr_v=v_with_unmapped_neighbors)
-
-        # STEP 4: PROPERTIES CHECK
-        graph_candidate_vertices = base_graph.neighbors(
-            v_id=v_with_unmapped_neighbors[MAPPED_V_ID],
-            vertex_attr_filter=subgraph_vertex_to_map)
-
-        graph_candidate_vertices = \
-            _remove_used_graph_candidates(graph_candidate_vertices,
-                                          curr_subgraph)
-
-        # STEP 5: STRUCTURE CHECK
-        edges = _get_edges_to_mapped_vertices(curr_subgraph,
-                                              subgraph_vertex_to_map.vertex_id)
-        neg_edges = set(e for e in edges if e.get(NEG_CONDITION))
-        pos_edges = edges.difference(neg_edges)
-
-        if not graph_candidate_vertices and neg_edges and not pos_edges:
-            subgraph_vertex_to_map[MAPPED_V_ID] = NEG_VERTEX
-            curr_subgraph.update_vertex(subgraph_vertex_to_map)
-            queue.append(curr_subgraph)
-            continue
 
-        found_subgraphs = []
-        remaining_items = len(graph_candidate_vertices)
-        for graph_vertex in graph_candidate_vertices:
-            subgraph_vertex_to_map[MAPPED_V_ID] = graph_vertex.vertex_id
-            subgraph_vertex_to_map[GRAPH_VERTEX] = graph_vertex
-            curr_subgraph.update_vertex(subgraph_vertex_to_map)
-            if not _graph_contains_subgraph_edges(base_graph,
-                                                  curr_subgraph,
-                                                  pos_edges):
-                continue
-            if not _graph_contains_subgraph_edges(base_graph,
-                                                  curr_subgraph,
-                                                  neg_edges):
-                del found_subgraphs[:]
-                break
-            if neg_edges and not pos_edges:
-                subgraph_vertex_to_map[MAPPED_V_ID] = NEG_VERTEX
-                curr_subgraph.update_vertex(subgraph_vertex_to_map)
+def subgraph_matching(base_graph, subgraph, matches, validate=False):
+    """Find all occurrences of subgraph in the graph
 
-            remaining_items -= 1  # no need to copy the last one
-            found_subgraphs.append(
-                curr_subgraph.copy() if remaining_items else curr_subgraph)
+    A depth first search with backtracking over partial mappings of the
+    template vertices to graph vertices. The known matches are mapped
+    first, and then the steps of the match plan, each one maps one more
+    template vertex:
+
+    - PROPERTIES CHECK
+      In the graph find candidate vertices that are linked to the mapped
+      neighbor and match the template vertex properties
+
+    - STRUCTURE CHECK
+      Filter candidate vertices according to edges, and continue the search
+      with each of the remaining candidates
+
+    When all the template vertices are mapped, the mapping is added to the
+    result.
+
+    A template vertex that is linked to the mapped vertices only by negative
+    edges (NEG_CONDITION) is mapped to NEG_VERTEX, and is not part of the
+    result. If a candidate has one of these negative edges, the partial
+    mapping is dropped.
+
+    :type base_graph: driver.Graph
+    :param subgraph: the template subgraph
+    :type subgraph: driver.Graph or MatchPlan
+    :param matches: the known matches
+    :type matches: list of Mapping
+    :type validate: bool
+    :return: the matches, template vertex id -> graph vertex
+    :rtype: list of dict
+    """
+    plan = subgraph if isinstance(subgraph, MatchPlan) else MatchPlan(subgraph)
+    result = []
+    mapping = _create_initial_mapping(matches, base_graph, plan, validate)
+    if mapping is None:
+        LOG.warning('subgraph_matching:Initial sub-graph creation failed')
+        LOG.warning('subgraph_matching: Known matches: %s', str(matches))
+        return result
 
-        queue.extend(found_subgraphs)
+    steps, complete = plan.steps(frozenset(mapping.graph_ids))
+    if complete:
+        _match(base_graph, steps, 0, mapping, result, set())
+    return result
 
-    # Last thing: Convert results to the expected format!
-    return _generate_result(final_subgraphs)
 
+def _match(graph, steps, index, mapping, result, seen):
+    if index == len(steps):
+        _add_result(mapping, result, seen)
+        return
 
-def _generate_result(final_subgraphs):
-    result = []
-    for mapping in final_subgraphs:
-        subgraph_vertices = dict()
-        for v in mapping.get_vertices():
-            v_id = v[MAPPED_V_ID]
-            if isinstance(v_id, six.string_types) and v_id is not NEG_VERTEX:
-                subgraph_vertices[v.vertex_id] = v[GRAPH_VERTEX]
-
-        if subgraph_vertices not in result:
-            result.append(subgraph_vertices)
-    return result
+    step = steps[index]
+    graph_ids = mapping.graph_ids
+    v_id = step.v_id
 
+    # PROPERTIES CHECK
+    candidates = _get_candidates(graph, mapping, step)
 
-def _choose_vertex(vertices, subgraph, curr_v=None):
-    """Return a vertex with a positive edge if exists, otherwise the first one.
+    # STRUCTURE CHECK
+    if not candidates and step.neg_edges and not step.pos_edges:
+        graph_ids[v_id] = NEG_VERTEX
+        _match(graph, steps, index + 1, mapping, result, seen)
+        del graph_ids[v_id]
+        return
 
+    found = []
+    for graph_vertex in candidates:
+        graph_ids[v_id] = graph_vertex.vertex_id
+        if not _graph_contains_subgraph_edges(graph, mapping, step.pos_edges):
+            continue
+        if not _graph_contains_subgraph_edges(graph, mapping, step.neg_edges):
+            del found[:]
+            break
+        found.append(graph_vertex)
+
+    is_negative = step.neg_edges and not step.pos_edges
+    for graph_vertex in found:
+        if is_negative:
+            # not part of the result, but its graph vertex is taken
+            graph_ids[v_id] = NEG_VERTEX
+            mapping.graph_vertices[v_id] = graph_vertex
+        else:
+            # the matches are passed on to the actions, so they are copies
+            # and not read-only views
+            graph_ids[v_id] = graph_vertex.vertex_id
+            mapping.graph_vertices[v_id] = graph_vertex.copy()
+        _match(graph, steps, index + 1, mapping, result, seen)
+
+    graph_ids.pop(v_id, None)
+    mapping.graph_vertices.pop(v_id, None)
+
+
+def _add_result(mapping, result, seen):
+    subgraph_vertices = dict()
+    for v_id, graph_id in mapping.graph_ids.items():
+        if isinstance(graph_id, six.string_types) and \
+                graph_id is not NEG_VERTEX:
+            subgraph_vertices[v_id] = mapping.graph_vertices[v_id]
+
+    # the same graph vertices can be reached more than once, e.g. over
+    # two edges between the same vertices
+    key = frozenset((v_id, v.vertex_id)
+                    for v_id, v in subgraph_vertices.items())
+    if key not in seen:
+        seen.add(key)
+        result.append(subgraph_vertices)
+
+
+def _get_candidates(graph, mapping, step):
+    """Graph neighbors of the mapped vertex that match the template vertex
+
+    Graph vertices that are already mapped are not candidates.
     """
-    for v in vertices:
-        curr_vertex_id = curr_v.vertex_id if curr_v else None
-        if not subgraph.get_edges(v.vertex_id, curr_vertex_id,
-                                  attr_filter={NEG_CONDITION: True}):
-            return v
-    return vertices.pop(0)
+    graph_id = mapping.graph_ids[step.mapped_id]
+    if graph_id is NEG_VERTEX:
+        return []
+    used_ids = set(v.vertex_id for v in mapping.graph_vertices.values())
+    if len(step.filters) == 1:
+        neighbors = graph.neighbors(graph_id,
+                                    vertex_attr_filter=step.filters[0],
+                                    read_only=True)
+    else:
+        neighbors = [v for v in graph.neighbors(graph_id, read_only=True)
+                     if _check_filters(v, step.filters)]
+    return [v for v in neighbors if v.vertex_id not in used_ids]
 
 
-def _get_edges_to_mapped_vertices(graph, vertex_id):
-    """Get all edges (to/from) vertex where neighbor has a MAPPED_V_ID
+def _check_filters(graph_vertex, filters):
+    return any(check_filter(graph_vertex, f) for f in filters)
 
-    :type graph: driver.Graph
-    :type vertex_id: str
-    :rtype: set of driver.Edge
+
+def _get_edges_to_mapped_vertices(plan, mapping, v_id):
+    """Template edges (to/from) the vertex, where the neighbor is mapped
+
+    :rtype: list of TemplateEdge
     """
-    subgraph_edges_to_mapped_vertices = []
-    for e in graph.get_edges(vertex_id):
-        t_neighbor = graph.get_vertex(e.other_vertex(vertex_id))
-        if not t_neighbor:
-            raise VitrageAlgorithmError('Cant get vertex for edge' + str(e))
-        if t_neighbor and t_neighbor.get(MAPPED_V_ID):
-            subgraph_edges_to_mapped_vertices.append(e)
-    return set(subgraph_edges_to_mapped_vertices)
+    graph_ids = mapping.graph_ids
+    return [e for e in plan.edges[v_id]
+            if graph_ids.get(e.target_id if e.source_id == v_id
+                             else e.source_id)]
 
 
-def _graph_contains_subgraph_edges(graph, subgraph, subgraph_edges):
+def _graph_contains_subgraph_edges(graph, mapping, subgraph_edges):
     """Check if graph contains all the expected edges
 
     For each (sub-graph) expected edge, check if a corresponding edge exists
     in the graph with relevant properties check
 
     :type graph: driver.Graph
-    :type subgraph: driver.Graph
-    :type subgraph_edges: set of driver.Edge
+    :type mapping: _Mapping
+    :type subgraph_edges: list of TemplateEdge
     :rtype: bool
     """
     for e in subgraph_edges:
-        graph_v_id_source = subgraph.get_vertex(e.source_id).get(MAPPED_V_ID)
-        graph_v_id_target = subgraph.get_vertex(e.target_id).get(MAPPED_V_ID)
+        graph_v_id_source = mapping.graph_ids.get(e.source_id)
+        graph_v_id_target = mapping.graph_ids.get(e.target_id)
         if not graph_v_id_source or not graph_v_id_target:
             raise VitrageAlgorithmError('Cant get vertex for edge' + str(e))
-        found_graph_edge = graph.get_edge(graph_v_id_source,
-                                          graph_v_id_target,
-                                          e.label)
-
-        if not found_graph_edge and e.get(NEG_CONDITION):
+        if NEG_VERTEX in (graph_v_id_source, graph_v_id_target):
+            found_graph_edge = None
+        else:
+            found_graph_edge = graph.get_edge(graph_v_id_source,
+                                              graph_v_id_target,
+                                              e.label,
+                                              read_only=True)
+
+        if not found_graph_edge and e.negative:
             continue
 
-        if not found_graph_edge or not check_filter(found_graph_edge, e,
+        if not found_graph_edge or not check_filter(found_graph_edge,
+                                                    e.properties,
                                                     NEG_CONDITION):
             return False
     return True
 
 
-def _create_initial_subgraph(known_matches, graph, subgraph, validate=False):
-    """Create initial mapping graph from sub graph and known matches
+def _create_initial_mapping(known_matches, graph, plan, validate=False):
+    """Map the known matches
 
-    copy the sub-graph to create the first candidate mapping graph.
-    In which known vertices mappings are added to vertices MAPPED_V_ID
+    :rtype: _Mapping
     """
-    mapping = subgraph.copy()
+    mapping = _Mapping()
     for match in known_matches:
         if match.is_vertex:
-            if not _update_mapping_for_vertex(match, mapping, graph, validate):
-                return None
             subgraph_id = match.subgraph_element.vertex_id
-            edges = _get_edges_to_mapped_vertices(mapping, subgraph_id)
+            if not _update_mapping(mapping, plan, graph, subgraph_id,
+                                   match.graph_element.vertex_id, validate):
+                return None
+            edges = _get_edges_to_mapped_vertices(plan, mapping, subgraph_id)
 
         else:  # is edge
-            if not _update_mapping_for_edge(match, mapping, graph, validate):
+            sub_source_id = match.subgraph_element.source_id
+            sub_target_id = match.subgraph_element.target_id
+            if not _update_mapping(mapping, plan, graph, sub_source_id,
+                                   match.graph_element.source_id, validate):
                 return None
-            edges = _get_related_edges(mapping, match, subgraph, validate)
+            if not _update_mapping(mapping, plan, graph, sub_target_id,
+                                   match.graph_element.target_id, validate):
+                return None
+            edges = _get_edges_to_mapped_vertices(plan, mapping,
+                                                  sub_source_id)
+            if not validate:  # no need to check the mapped edge
+                known_edge = plan.get_edge(sub_source_id,
+                                           sub_target_id,
+                                           match.subgraph_element.label)
+                edges.remove(known_edge)
         if not _graph_contains_subgraph_edges(graph, mapping, edges):
             return None
     return mapping
 
 
-def _get_related_edges(mapping, match, subgraph, validate):
-    sub_target_id = match.subgraph_element.target_id
-    sub_source_id = match.subgraph_element.source_id
-    edges = _get_edges_to_mapped_vertices(mapping, sub_source_id)
-    edges.union(_get_edges_to_mapped_vertices(mapping, sub_target_id))
-    if not validate:  # no need to check the mapped edge
-        known_edge = subgraph.get_edge(
-            sub_source_id,
-            sub_target_id,
-            match.subgraph_element.label
-        )
-        edges.remove(known_edge)
-    return edges
-
-
-def _update_mapping(subgraph, graph, subgraph_id, graph_id, validate):
-    subgraph_vertex = subgraph.get_vertex(subgraph_id)
+def _update_mapping(mapping, plan, graph, subgraph_id, graph_id, validate):
     graph_vertex = graph.get_vertex(graph_id)
     if validate:
-        if not check_filter(graph_vertex, subgraph_vertex, MAPPED_V_ID):
+        if not _check_filters(graph_vertex, plan.filters[subgraph_id]):
             return False
-    subgraph_vertex[MAPPED_V_ID] = graph_id
-    subgraph_vertex[GRAPH_VERTEX] = graph_vertex
-    subgraph.update_vertex(subgraph_vertex)
+    mapping.graph_ids[subgraph_id] = graph_id
+    mapping.graph_vertices[subgraph_id] = graph_vertex
     return True
-
-
-def _update_mapping_for_vertex(known_match, mapping, graph, validate):
-    subgraph_id = known_match.subgraph_element.vertex_id
-    graph_id = known_match.graph_element.vertex_id
-    return _update_mapping(mapping, graph, subgraph_id, graph_id, validate)
-
-
-def _update_mapping_for_edge(known_match, mapping, graph, validate):
-    s_id = known_match.graph_element.source_id
-    sub_s_id = known_match.subgraph_element.source_id
-    if not _update_mapping(mapping, graph, sub_s_id, s_id, validate):
-        return False
-
-    t_id = known_match.graph_element.target_id
-    sub_t_id = known_match.subgraph_element.target_id
-    return _update_mapping(mapping, graph, sub_t_id, t_id, validate)
-
-
-def _remove_used_graph_candidates(graph_candidate_vertices, curr_subgraph):
-    ver_to_remove = []
-    for candidate in graph_candidate_vertices:
-        for sub_ver in curr_subgraph.get_vertices():
-            if sub_ver.get(GRAPH_VERTEX, False) and \
-                    sub_ver[GRAPH_VERTEX].vertex_id == candidate.vertex_id:
-                ver_to_remove.append(candidate)
-    return [v for v in graph_candidate_vertices if v not in ver_to_remove]
@@ -0,0 +1,687 @@
+# Copyright 2018 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+from six.moves import cPickle
+
+from oslo_log import log as logging
+
+from vitrage.common.constants import VertexProperties as VProps
+from vitrage.common.exception import VitrageError
+from vitrage.graph.algo_driver.compact_algorithm import CompactAlgorithm
+from vitrage.graph.driver.elements import Edge
+from vitrage.graph.driver.elements import Vertex
+from vitrage.graph.driver.graph import Direction
+from vitrage.graph.driver.graph import Graph
+from vitrage.graph.driver.notifier import Notifier
+from vitrage.graph.driver.properties_index import PropertiesIndex
+from vitrage.graph.filter import check_filter
+from vitrage.graph.query import compile_query
+
+try:
+    from collections.abc import Mapping
+except ImportError:  # python 2.7
+    from collections import Mapping
+
+LOG = logging.getLogger(__name__)
+
+
+class _Missing(object):
+    """The value of a property that an element does not have"""
+
+    def __reduce__(self):
+        # unpickle as the module singleton, so 'is _MISSING' keeps working
+        return '_MISSING'
+
+    def __repr__(self):
+        return '_MISSING'
+
+
+_MISSING = _Missing()
+
+
+class _Columns(object):
+    """Columnar storage of the properties of graph elements
+
+    Every element is a row number. Every property key has a column, a list
+    holding the value of the property for each row, or _MISSING if the element
+    does not have this property. Columns grow lazily, up to the last row that
+    has the property.
+    """
+
+    def __init__(self):
+        self._columns = {}
+
+    def get(self, row, key, default=None):
+        column = self._columns.get(key)
+        if column is None or row >= len(column):
+            return default
+        value = column[row]
+        return default if value is _MISSING else value
+
+    def set(self, row, key, value):
+        column = self._columns.get(key)
+        if column is None:
+            column = self._columns[key] = []
+        if row >= len(column):
+            column.extend([_MISSING] * (row + 1 - len(column)))
+        column[row] = value
+
+    def discard(self, row, key):
+        column = self._columns.get(key)
+        if column is not None and row < len(column):
+            column[row] = _MISSING
+
+    def update(self, row, properties):
+        for key, value in properties.items():
+            self.set(row, key, value)
+
+    def clear_row(self, row):
+        for column in self._columns.values():
+            if row < len(column):
+                column[row] = _MISSING
+
+    def items(self, row):
+        return [(key, column[row]) for key, column in self._columns.items()
+                if row < len(column) and column[row] is not _MISSING]
+
+    def keys(self, row):
+        return [key for key, column in self._columns.items()
+                if row < len(column) and column[row] is not _MISSING]
+
+    def to_dict(self, row):
+        return dict(self.items(row))
+
+
+class _RowView(Mapping):
+    """A read-only mapping of the properties of a single row"""
+
+    __slots__ = ('_columns', '_row')
+
+    def __init__(self, columns, row):
+        self._columns = columns
+        self._row = row
+
+    def __getitem__(self, key):
+        value = self._columns.get(self._row, key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        return self._columns.get(self._row, key, default)
+
+    def __contains__(self, key):
+        return self._columns.get(self._row, key, _MISSING) is not _MISSING
+
+    def __iter__(self):
+        return iter(self._columns.keys(self._row))
+
+    def __len__(self):
+        return len(self._columns.keys(self._row))
+
+    def __repr__(self):
+        return repr(self.copy())
+
+    def items(self):
+        return self._columns.items(self._row)
+
+    def copy(self):
+        return self._columns.to_dict(self._row)
+
+
+def edge_copy(source_id, target_id, label, data):
+    return Edge(source_id=source_id, target_id=target_id,
+                label=label, properties=data.copy())
+
+
+def vertex_copy(v_id, data):
+    return Vertex(vertex_id=v_id, properties=data.copy())
+
+
+def edge_view(source_id, target_id, label, data):
+    return Edge(source_id=source_id, target_id=target_id,
+                label=label, properties=data)
+
+
+def vertex_view(v_id, data):
+    return Vertex(vertex_id=v_id, properties=data)
+
+
+class CompactGraph(Graph):
+    """A graph driver with array based storage
+
+    Vertices are numbered by integer rows, reused after a vertex is removed.
+    Edges are numbered the same way, and are kept in adjacency lists per
+    edge label, indexed by the row of the source (out edges) or the target
+    (in edges) vertex. The properties of the vertices and of the edges are
+    kept in columns, see _Columns.
+
+    This takes considerably less memory than the networkx dict of dicts, at
+    the cost of building the properties dictionary of an element when it is
+    copied from the graph. Prefer read-only views (see Graph) on read paths.
+    """
+
+    GRAPH_TYPE = "compact"
+
+    # Vertex properties that get_vertices can look up without a full scan
+    INDEXED_PROPERTIES = (VProps.VITRAGE_CATEGORY,
+                          VProps.VITRAGE_TYPE,
+                          VProps.ID,
+                          VProps.VITRAGE_IS_DELETED)
+
+    def __init__(self,
+                 name='compact_graph',
+                 vertices=None,
+                 edges=None):
+        super(CompactGraph, self).__init__(name, CompactGraph.GRAPH_TYPE)
+        self._init_storage()
+        self._index = PropertiesIndex(self.INDEXED_PROPERTIES)
+        self.add_vertices(vertices)
+        self.add_edges(edges)
+
+    def _init_storage(self):
+        # vertex id -> row, row -> vertex id (None for a free row)
+        self._vertex_rows = {}
+        self._vertex_ids = []
+        self._free_vertex_rows = []
+        self._vertex_props = _Columns()
+
+        # (source row, target row, label) -> edge row, and the other way
+        self._edge_rows = {}
+        self._edge_keys = []
+        self._free_edge_rows = []
+        self._edge_props = _Columns()
+
+        # label -> list of the edge rows of every vertex row (or None)
+        self._out_edges = {}
+        self._in_edges = {}
+
+    def __len__(self):
+        return len(self._vertex_rows)
+
+    @property
+    def algo(self):
+        return CompactAlgorithm(self)
+
+    def copy(self):
+        vertices = [vertex_view(v_id, data) for v_id, data in self._nodes()]
+        edges = [edge_view(u, v, label, data)
+                 for u, v, label, data in self._edges()]
+        return CompactGraph(self.name, vertices, edges)
+
+    def num_vertices(self):
+        return len(self._vertex_rows)
+
+    def num_edges(self):
+        return len(self._edge_rows)
+
+    @Notifier.update_notify
+    def add_vertex(self, v):
+        """Add a vertex to the graph
+
+        :type v: Vertex
+        """
+        # Call a private method, so to separate the notifier from logic
+        self._add_vertex(v)
+
+    def _add_vertex(self, v):
+        row = self._vertex_rows.get(v.vertex_id)
+        if row is None:
+            row = self._new_vertex_row(v.vertex_id)
+            if v.properties:
+                self._vertex_props.update(row, v.properties)
+            self._index.add(row, _RowView(self._vertex_props, row))
+        elif v.properties:
+            old_prop = self._indexed_values(row)
+            self._vertex_props.update(row, v.properties)
+            self._index.update(row, old_prop, self._indexed_values(row))
+
+    def _new_vertex_row(self, v_id):
+        if self._free_vertex_rows:
+            row = self._free_vertex_rows.pop()
+            self._vertex_ids[row] = v_id
+        else:
+            row = len(self._vertex_ids)
+            self._vertex_ids.append(v_id)
+        self._vertex_rows[v_id] = row
+        return row
+
+    def _indexed_values(self, row):
+        return {key: self._vertex_props.get(row, key)
+                for key in self._index.keys}
+
+    @Notifier.update_notify
+    def add_edge(self, e):
+        """Add an edge to the graph
+
+        :type e: Edge
+        """
+        # Call a private method, so to separate the notifier from logic
+        self._add_edge(e)
+
+    def _add_edge(self, e):
+        # like networkx, missing vertices are implicitly added
+        source_row = self._vertex_rows.get(e.source_id)
+        if source_row is None:
+            self._add_vertex(Vertex(e.source_id))
+            source_row = self._vertex_rows[e.source_id]
+        target_row = self._vertex_rows.get(e.target_id)
+        if target_row is None:
+            self._add_vertex(Vertex(e.target_id))
+            target_row = self._vertex_rows[e.target_id]
+
+        key = (source_row, target_row, e.label)
+        row = self._edge_rows.get(key)
+        if row is None:
+            row = self._new_edge_row(key)
+        if e.properties:
+            self._edge_props.update(row, e.properties)
+
+    def _new_edge_row(self, key):
+        if self._free_edge_rows:
+            row = self._free_edge_rows.pop()
+            self._edge_keys[row] = key
+        else:
+            row = len(self._edge_keys)
+            self._edge_keys.append(key)
+        self._edge_rows[key] = row
+        source_row, target_row, label = key
+        self._adjacency(self._out_edges, label, source_row, True).append(row)
+        self._adjacency(self._in_edges, label, target_row, True).append(row)
+        return row
+
+    @staticmethod
+    def _adjacency(edges_by_label, label, vertex_row, create=False):
+        """The edge rows of a vertex row with the given label
+
+        :rtype: list or None
+        """
+        adjacency = edges_by_label.get(label)
+        if adjacency is None:
+            if not create:
+                return None
+            adjacency = edges_by_label[label] = []
+        if vertex_row >= len(adjacency):
+            if not create:
+                return None
+            adjacency.extend([None] * (vertex_row + 1 - len(adjacency)))
+        if adjacency[vertex_row] is None and create:
+            adjacency[vertex_row] = []
+        return adjacency[vertex_row]
+
+    def get_vertex(self, v_id, read_only=False):
+        """Fetch a vertex from the graph
+
+        :rtype: Vertex
+        """
+        row = self._vertex_rows.get(v_id)
+        if row is not None:
+            make_vertex = vertex_view if read_only else vertex_copy
+            return make_vertex(v_id, _RowView(self._vertex_props, row))
+        LOG.debug("get_vertex item not found. v_id=%s", str(v_id))
+        return None
+
+    def get_edge(self, source_id, target_id, label, read_only=False):
+        row = self._edge_row(source_id, target_id, label)
+        if row is None:
+            LOG.debug("get_edge item not found. source_id=%s, target_id=%s, "
+                      "label=%s", str(source_id), str(target_id), str(label))
+            return None
+        make_edge = edge_view if read_only else edge_copy
+        return make_edge(source_id, target_id, label,
+                         _RowView(self._edge_props, row))
+
+    def _edge_row(self, source_id, target_id, label):
+        source_row = self._vertex_rows.get(source_id)
+        target_row = self._vertex_rows.get(target_id)
+        if source_row is None or target_row is None:
+            return None
+        return self._edge_rows.get((source_row, target_row, label))
+
+    def get_edges(self,
+                  v1_id,
+                  v2_id=None,
+                  direction=Direction.BOTH,
+                  attr_filter=None,
+                  read_only=False):
+        """Fetch multiple edges from the graph
+
+        :rtype: set of Edge
+        """
+        def check_edge(edge_data):
+            return check_filter(edge_data, attr_filter)
+
+        nodes, edges = self._neighboring_nodes_edges_query(
+            v1_id, edge_predicate=check_edge, direction=direction)
+
+        make_edge = edge_view if read_only else edge_copy
+        edge_copies = set(make_edge(u, v, label, data)
+                          for u, v, label, data in edges)
+
+        if v2_id:
+            edge_copies = [e for e in edge_copies if e.has_vertex(v2_id)]
+
+        return edge_copies
+
+    def _get_edges_by_direction(self, v_row, direction):
+        """Get the rows of all the edges of the vertex by the direction
+
+        :rtype: list of int
+        """
+        if direction == Direction.BOTH:
+            edges = self._get_edges_by_direction(v_row, Direction.IN)
+            edges.extend(self._get_edges_by_direction(v_row, Direction.OUT))
+            return edges
+        edges_by_label = \
+            self._out_edges if direction == Direction.OUT else self._in_edges
+        edges = []
+        for label in edges_by_label:
+            label_edges = self._adjacency(edges_by_label, label, v_row)
+            if label_edges:
+                edges.extend(label_edges)
+        return edges
+
+    @Notifier.update_notify
+    def update_vertex(self, v):
+        """Update the vertex properties
+
+        :type v: Vertex
+        """
+        row = self._vertex_rows.get(v.vertex_id)
+        if row is None:
+            self._add_vertex(v)
+            return
+        old_prop = self._indexed_values(row)
+        for prop, value in v.properties.items():
+            if value is None:
+                self._vertex_props.discard(row, prop)
+            else:
+                self._vertex_props.set(row, prop, value)
+        self._index.update(row, old_prop, self._indexed_values(row))
+
+    @Notifier.update_notify
+    def update_edge(self, e):
+        """Update the edge properties
+
+        :type e: Edge
+        """
+        row = self._edge_row(e.source_id, e.target_id, e.label)
+        if row is None:
+            self._add_edge(e)
+            return
+        for prop, value in e.properties.items():
+            if value is None:
+                self._edge_props.discard(row, prop)
+            else:
+                self._edge_props.set(row, prop, value)
+
+    @Notifier.remove_notify
+    def remove_vertex(self, v):
+        """Remove Vertex v and its edges from the graph
+
+        :type v: Vertex
+        """
+        row = self._vertex_rows.get(v.vertex_id)
+        if row is None:
+            raise VitrageError('The vertex %s is not in the graph.' %
+                               str(v.vertex_id))
+        for edge_row in self._get_edges_by_direction(row, Direction.BOTH):
+            # a self loop edge is listed twice
+            if self._edge_keys[edge_row] is not None:
+                self._remove_edge_row(edge_row)
+        self._index.remove(row, _RowView(self._vertex_props, row))
+        self._vertex_props.clear_row(row)
+        del self._vertex_rows[v.vertex_id]
+        self._vertex_ids[row] = None
+        self._free_vertex_rows.append(row)
+
+    @Notifier.remove_notify
+    def remove_edge(self, e):
+        """Remove an edge from the graph
+
+        :type e: Edge
+        """
+        row = self._edge_row(e.source_id, e.target_id, e.label)
+        if row is None:
+            raise VitrageError('The edge %s-%s-%s is not in the graph.' %
+                               (str(e.source_id), str(e.target_id),
+                                str(e.label)))
+        self._remove_edge_row(row)
+
+    def _remove_edge_row(self, row):
+        key = self._edge_keys[row]
+        source_row, target_row, label = key
+        self._adjacency(self._out_edges, label, source_row).remove(row)
+        self._adjacency(self._in_edges, label, target_row).remove(row)
+        self._edge_props.clear_row(row)
+        del self._edge_rows[key]
+        self._edge_keys[row] = None
+        self._free_edge_rows.append(row)
+
+    def get_vertices(self,
+                     vertex_attr_filter=None,  # Dictionary of key value
+                     query_dict=None,
+                     read_only=False):
+        def check_vertex(vertex_data):
+            return check_filter(vertex_data[1], vertex_attr_filter)
+
+        make_vertex = vertex_view if read_only else vertex_copy
+        if not query_dict:
+            nodes = self._indexed_nodes(self._filter_constraints(
+                vertex_attr_filter))
+            items = filter(check_vertex, nodes)
+            return [make_vertex(node, node_data) for node, node_data in items]
+        elif not vertex_attr_filter:
+            query = compile_query(query_dict)
+            nodes = self._indexed_nodes(query.constraints)
+            return [make_vertex(node, node_data) for node, node_data in nodes
+                    if query.match(node_data)]
+        else:
+            return []
+
+    def _indexed_nodes(self, constraints):
+        """The (vertex id, data) pairs that may satisfy the constraints
+
+        Uses the properties index to avoid scanning the entire graph, when
+        one of the constrained properties is indexed.
+        """
+        rows = self._index.candidates(constraints) if constraints else None
+        if rows is None:
+            return self._nodes()
+        return [(self._vertex_ids[row], _RowView(self._vertex_props, row))
+                for row in sorted(rows)]
+
+    def _nodes(self):
+        """All the (vertex id, data) pairs, ordered by row"""
+        return [(v_id, _RowView(self._vertex_props, row))
+                for row, v_id in enumerate(self._vertex_ids)
+                if v_id is not None]
+
+    def _edges(self):
+        """All the (source id, target id, label, data) tuples, by row"""
+        return [self._edge_tuple(row)
+                for row, key in enumerate(self._edge_keys)
+                if key is not None]
+
+    def _edge_tuple(self, row):
+        source_row, target_row, label = self._edge_keys[row]
+        return (self._vertex_ids[source_row],
+                self._vertex_ids[target_row],
+                label,
+                _RowView(self._edge_props, row))
+
+    @staticmethod
+    def _filter_constraints(vertex_attr_filter):
+        if not vertex_attr_filter:
+            return None
+        constraints = {}
+        for key, content in vertex_attr_filter.items():
+            if not isinstance(content, list):
+                content = [content]
+            constraints[key] = content
+        return constraints
+
+    def _rebuild_index(self):
+        self._index.clear()
+        for row, v_id in enumerate(self._vertex_ids):
+            if v_id is not None:
+                self._index.add(row, _RowView(self._vertex_props, row))
+
+    def get_vertices_by_key(self, key_values_hash):
+        # vertices are not indexed by their key values hash
+        return []
+
+    def neighbors(self, v_id, vertex_attr_filter=None, edge_attr_filter=None,
+                  direction=Direction.BOTH, read_only=False):
+
+        def check_edge(edge_data):
+            return check_filter(edge_data, edge_attr_filter)
+
+        def check_vertex(vertex_data):
+            return check_filter(vertex_data, vertex_attr_filter)
+
+        nodes, edges = self._neighboring_nodes_edges_query(
+            v_id=v_id, vertex_predicate=check_vertex,
+            edge_predicate=check_edge, direction=direction)
+        make_vertex = vertex_view if read_only else vertex_copy
+        vertices = [make_vertex(n, data) for n, data in nodes]
+        return vertices
+
+    def _neighboring_nodes_edges_query(self, v_id,
+                                       vertex_predicate=None,
+                                       edge_predicate=None,
+                                       direction=Direction.BOTH):
+        if not direction:
+            LOG.error("_neighboring_nodes_edges: direction cannot be None")
+            raise AttributeError("neighbors: direction cannot be None")
+
+        if not v_id:
+            LOG.error("_neighboring_nodes_edges: v_id cannot be None")
+            raise AttributeError("neighbors: v_id cannot be None")
+
+        v_row = self._vertex_rows.get(v_id)
+        if v_row is None:
+            return [], []
+
+        nodes = []
+        edges = []
+        for edge_row in self._get_edges_by_direction(v_row, direction):
+            edge_data = _RowView(self._edge_props, edge_row)
+            if edge_predicate and not edge_predicate(edge_data):
+                continue
+            source_row, target_row, label = self._edge_keys[edge_row]
+            node_row = source_row if target_row == v_row else target_row
+            node_data = _RowView(self._vertex_props, node_row)
+            if not vertex_predicate or vertex_predicate(node_data):
+                edges.append((self._vertex_ids[source_row],
+                              self._vertex_ids[target_row],
+                              label,
+                              edge_data))
+                nodes.append((self._vertex_ids[node_row], node_data))
+        return nodes, edges
+
+    def json_output_graph(self, **kwargs):
+        """Same json output as the networkx graph driver
+
+        :return: graph in json format
+        """
+        rows_to_index = {}
+        nodes = []
+        for row, v_id in enumerate(self._vertex_ids):
+            if v_id is None:
+                continue
+            rows_to_index[row] = len(nodes)
+            node = self._vertex_props.to_dict(row)
+            if VProps.ID in node:
+                node[VProps.GRAPH_INDEX] = len(nodes)
+            else:
+                node[VProps.ID] = v_id
+            nodes.append(node)
+
+        links = []
+        for row, key in enumerate(self._edge_keys):
+            if key is None:
+                continue
+            source_row, target_row, label = key
+            link = self._edge_props.to_dict(row)
+            link['source'] = rows_to_index[source_row]
+            link['target'] = rows_to_index[target_row]
+            link['key'] = label
+            links.append(link)
+
+        node_link_data = {'directed': True,
+                          'multigraph': True,
+                          'graph': {},
+                          'nodes': nodes,
+                          'links': links}
+        node_link_data.update(kwargs)
+        return json.dumps(node_link_data)
+
+    def write_gpickle(self):
+        return cPickle.dumps(self._get_storage(), cPickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def read_gpickle(data, graph_to_update=None):
+        if graph_to_update is not None:
+            graph_to_update.check_not_frozen()
+            graph = graph_to_update
+        else:
+            graph = CompactGraph()
+        graph._set_storage(cPickle.loads(data))
+        graph._rebuild_index()
+        return graph
+
+    def _get_storage(self):
+        return (self._vertex_ids,
+                self._vertex_props._columns,
+                self._edge_keys,
+                self._edge_props._columns)
+
+    def _set_storage(self, storage):
+        vertex_ids, vertex_columns, edge_keys, edge_columns = storage
+        self._init_storage()
+        self._vertex_ids = vertex_ids
+        self._vertex_props._columns = vertex_columns
+        self._edge_keys = edge_keys
+        self._edge_props._columns = edge_columns
+        for row, v_id in enumerate(vertex_ids):
+            if v_id is None:
+                self._free_vertex_rows.append(row)
+            else:
+                self._vertex_rows[v_id] = row
+        for row, key in enumerate(edge_keys):
+            if key is None:
+                self._free_edge_rows.append(row)
+                continue
+            source_row, target_row, label = key
+            self._edge_rows[key] = row
+            self._adjacency(self._out_edges, label, source_row,
+                            True).append(row)
+            self._adjacency(self._in_edges, label, target_row,
+                            True).append(row)
+
+    def union(self, other_graph):
+        """Union two graphs - add all vertices and edges of other graph
+
+        :type other_graph: Graph
+        """
+        self.check_not_frozen()
+        for vertex in other_graph.get_vertices(read_only=True):
+            self._add_vertex(vertex)
+        for vertex in other_graph.get_vertices(read_only=True):
+            for edge in other_graph.get_edges(vertex.vertex_id,
+                                              direction=Direction.OUT,
+                                              read_only=True):
+                self._add_edge(edge)
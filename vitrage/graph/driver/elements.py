@@ -12,8 +12,44 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+try:
+    from types import MappingProxyType
+except ImportError:  # python 2.7
+    import collections
+
+    class MappingProxyType(collections.Mapping):
+        """A read-only proxy of a mapping"""
+
+        def __init__(self, mapping):
+            self._mapping = mapping
+
+        def __getitem__(self, key):
+            return self._mapping[key]
+
+        def __iter__(self):
+            return iter(self._mapping)
+
+        def __len__(self):
+            return len(self._mapping)
+
+        def __repr__(self):
+            return repr(self._mapping)
+
+        def __eq__(self, other):
+            return self._mapping == other
+
+        def __ne__(self, other):
+            return self._mapping != other
+
+        def copy(self):
+            return self._mapping.copy()
+
 
 class PropertiesElement(object):
+    # Elements are created for every vertex and edge returned from the graph,
+    # so they are kept compact: no per-instance __dict__
+    __slots__ = ('properties',)
+
     def __init__(self, properties=None):
         self.properties = properties
 
@@ -23,7 +59,7 @@ class PropertiesElement(object):
 
     def __setitem__(self, key, value):
         """Set a property with 'element[key] = value'"""
-        if not self.properties:
+        if self.properties is None:
             self.properties = {}
         self.properties[key] = value
 
@@ -54,6 +90,8 @@ class Vertex(PropertiesElement):
 
     """
 
+    __slots__ = ('vertex_id',)
+
     def __init__(self, vertex_id, properties=None):
         """Create a Vertex instance
 
@@ -84,9 +122,13 @@ class Vertex(PropertiesElement):
         :type other: Vertex
         :rtype: bool
         """
-        return self.__dict__ == other.__dict__ and \
+        return isinstance(other, Vertex) and \
+            self.vertex_id == other.vertex_id and \
             self.properties == other.properties
 
+    def __ne__(self, other):
+        return not self == other
+
     def copy(self):
         return Vertex(vertex_id=self.vertex_id,
                       properties=self.properties.copy())
@@ -106,6 +148,8 @@ class Edge(PropertiesElement):
 
     """
 
+    __slots__ = ('source_id', 'target_id', 'label')
+
     def __init__(self, source_id, target_id, label, properties=None):
         """Create an Edge instance
 
@@ -154,9 +198,15 @@ class Edge(PropertiesElement):
         :type other: Edge
         :rtype: bool
         """
-        return self.__dict__ == other.__dict__ and \
+        return isinstance(other, Edge) and \
+            self.source_id == other.source_id and \
+            self.target_id == other.target_id and \
+            self.label == other.label and \
             self.properties == other.properties
 
+    def __ne__(self, other):
+        return not self == other
+
     def other_vertex(self, v_id):
         """If v_id == target_id return source_id, else return target_id
 
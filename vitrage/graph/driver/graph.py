@@ -20,6 +20,7 @@ vitrage.graph.driver namespace.
 
 """
 import abc
+import contextlib
 import copy
 import six
 
@@ -36,6 +37,37 @@ class Direction(object):
 
 @six.add_metaclass(abc.ABCMeta)
 class Graph(object):
+    """Graph interface
+
+    Read-only views:
+    ----------------
+    By default, get_vertex, get_vertices, get_edge, get_edges and neighbors
+    return copies of the graph elements, that the caller can change freely.
+    Callers that only read the elements should pass read_only=True to get
+    views instead, and avoid copying the properties of every element.
+
+    A view shares its properties with the graph, so it reflects later changes
+    to the graph element, and changing its properties raises a TypeError.
+    Call copy() on a view to get an element that can be changed. Views should
+    not be kept after the graph changes, and can not be pickled.
+
+    Batched changes:
+    ----------------
+    Every add and update notifies the subscribers with the element before
+    and after the change. Inside a batch() the notifications are held, and
+    when the outermost batch ends each changed element is notified once,
+    with its state before the batch and its state at the end of it.
+    Subscribers that read the graph while handling a notification, and must
+    see it as it was after each change, subscribe with immediate=True.
+
+    Frozen graphs:
+    --------------
+    A graph that is shared, and must not change, can be frozen. Adding,
+    updating or removing elements of a frozen graph raises a TypeError, like
+    changing the properties of a view. Its elements can still be read, and
+    copies of them changed.
+    """
+
     def __init__(self, name, graph_type, vertices=None, edges=None):
         """Create a Graph instance
 
@@ -48,13 +80,69 @@ class Graph(object):
         self.name = name
         self.graph_type = graph_type
         self.notifier = Notifier()
+        self.frozen = False
+
+    def subscribe(self, function, immediate=False):
+        self.notifier.subscribe(function, immediate)
+
+    def unsubscribe_all(self):
+        """Remove all the subscribers, including the immediate ones"""
+        self.notifier.unsubscribe_all()
 
-    def subscribe(self, function):
-        self.notifier.subscribe(function)
+    def freeze(self):
+        """Do not allow any further change of the graph"""
+        self.frozen = True
+
+    def check_not_frozen(self):
+        if self.frozen:
+            raise TypeError('graph %s is frozen' % self.name)
 
     def is_subscribed(self):
         return self.notifier.is_subscribed()
 
+    @contextlib.contextmanager
+    def batch(self):
+        """Coalesce the notifications of the changes made in the context
+
+        EXAMPLE
+        -------
+        with g.batch():
+            g.add_vertex(v1)
+            g.add_edge(e1)
+            g.update_vertex(v1)
+
+        notifies v1 once, as created with its final properties, and then e1.
+        Batches can be nested, the notifications are sent when the outermost
+        batch ends, also if it ends with an exception.
+        """
+        self.notifier.start_batch()
+        try:
+            yield self
+        finally:
+            self.notifier.end_batch(self)
+
+    @contextlib.contextmanager
+    def muted(self):
+        """Do not notify the subscribers of the changes made in the context
+
+        For changes that are known to be of no interest to the subscribers.
+        """
+        self.notifier.mute()
+        try:
+            yield self
+        finally:
+            self.notifier.unmute()
+
+    def apply_changes(self, changes):
+        """Apply many changes in one batch
+
+        :param changes: (function, item) pairs, e.g. (g.update_vertex, v1)
+        :type changes: list
+        """
+        with self.batch():
+            for func, item in changes:
+                func(item)
+
     def get_item(self, item):
         if isinstance(item, Edge):
             return self.get_edge(item.source_id, item.target_id, item.label)
@@ -169,19 +257,23 @@ class Graph(object):
             self.add_edge(e)
 
     @abc.abstractmethod
-    def get_vertex(self, v_id):
+    def get_vertex(self, v_id, read_only=False):
         """Fetch a vertex from the graph
 
         :param v_id: vertex id
         :type v_id: str
 
+        :param read_only: return a read-only view of the vertex instead of a
+                          copy. See Graph read-only views
+        :type read_only: bool
+
         :return: the vertex or None if it does not exist
         :rtype: Vertex
         """
         pass
 
     @abc.abstractmethod
-    def get_edge(self, source_id, target_id, label):
+    def get_edge(self, source_id, target_id, label, read_only=False):
         """Fetch an edge from the graph,
 
         Fetch an edge from the graph, according to its two vertices and label
@@ -195,6 +287,10 @@ class Graph(object):
         :param label: the label property of the edge
         :type label: str or None
 
+        :param read_only: return a read-only view of the edge instead of a
+                          copy. See Graph read-only views
+        :type read_only: bool
+
         :return: The edge between the two vertices or None
         :rtype: Edge
         """
@@ -205,7 +301,8 @@ class Graph(object):
                   v1_id,
                   v2_id=None,
                   direction=Direction.BOTH,
-                  attr_filter=None):
+                  attr_filter=None,
+                  read_only=False):
         """Fetch multiple edges from the graph,
 
         Fetch all edges from the graph, according to its two vertices.
@@ -236,6 +333,10 @@ class Graph(object):
         :param attr_filter: expected keys and values
         :type attr_filter: dict
 
+        :param read_only: return read-only views of the edges instead of
+                          copies. See Graph read-only views
+        :type read_only: bool
+
         :return: All edges matching the requirements
         :rtype: set of Edge
         """
@@ -302,7 +403,8 @@ class Graph(object):
     @abc.abstractmethod
     def get_vertices(self,
                      vertex_attr_filter=None,
-                     query_dict=None):
+                     query_dict=None,
+                     read_only=False):
         """Get vertices list with an optional match filter
 
         To filter the vertices, specify property values for
@@ -332,6 +434,9 @@ class Graph(object):
         :type vertex_attr_filter dict
         :param query_dict: expected query
         :type query_dict dict
+        :param read_only: return read-only views of the vertices instead of
+                          copies. See Graph read-only views
+        :type read_only: bool
         :return: A list of vertices that match the requested query
         :rtype: list of Vertex
         """
@@ -353,7 +458,8 @@ class Graph(object):
 
     @abc.abstractmethod
     def neighbors(self, v_id, vertex_attr_filter=None,
-                  edge_attr_filter=None, direction=Direction.BOTH):
+                  edge_attr_filter=None, direction=Direction.BOTH,
+                  read_only=False):
         """Get vertices that are neighboring to v_id vertex
 
         To filter the neighboring vertices, specify property values for
@@ -395,6 +501,9 @@ class Graph(object):
         :type vertex_attr_filter dict
         :param edge_attr_filter: expected keys and values
         :type edge_attr_filter: dict
+        :param read_only: return read-only views of the vertices instead of
+                          copies. See Graph read-only views
+        :type read_only: bool
         :return: A list of vertices that match the requested query
         :rtype: list of Vertex
         """
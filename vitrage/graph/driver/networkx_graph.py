@@ -24,12 +24,14 @@ from oslo_log import log as logging
 from vitrage.common.constants import VertexProperties as VProps
 from vitrage.graph.algo_driver.networkx_algorithm import NXAlgorithm
 from vitrage.graph.driver.elements import Edge
+from vitrage.graph.driver.elements import MappingProxyType
 from vitrage.graph.driver.elements import Vertex
 from vitrage.graph.driver.graph import Direction
 from vitrage.graph.driver.graph import Graph
 from vitrage.graph.driver.notifier import Notifier
+from vitrage.graph.driver.properties_index import PropertiesIndex
 from vitrage.graph.filter import check_filter
-from vitrage.graph.query import create_predicate
+from vitrage.graph.query import compile_query
 
 LOG = logging.getLogger(__name__)
 
@@ -43,16 +45,32 @@ def vertex_copy(v_id, data):
     return Vertex(vertex_id=v_id, properties=copy.copy(data))
 
 
+def edge_view(source_id, target_id, label, data):
+    return Edge(source_id=source_id, target_id=target_id,
+                label=label, properties=MappingProxyType(data))
+
+
+def vertex_view(v_id, data):
+    return Vertex(vertex_id=v_id, properties=MappingProxyType(data))
+
+
 class NXGraph(Graph):
 
     GRAPH_TYPE = "networkx"
 
+    # Vertex properties that get_vertices can look up without a full scan
+    INDEXED_PROPERTIES = (VProps.VITRAGE_CATEGORY,
+                          VProps.VITRAGE_TYPE,
+                          VProps.ID,
+                          VProps.VITRAGE_IS_DELETED)
+
     def __init__(self,
                  name='networkx_graph',
                  vertices=None,
                  edges=None):
         super(NXGraph, self).__init__(name, NXGraph.GRAPH_TYPE)
         self._g = nx.MultiDiGraph()
+        self._index = PropertiesIndex(self.INDEXED_PROPERTIES)
         self.add_vertices(vertices)
         self.add_edges(edges)
 
@@ -82,11 +100,15 @@ class NXGraph(Graph):
         self._add_vertex(v)
 
     def _add_vertex(self, v):
+        orig_prop = self._g.node.get(v.vertex_id)
+        if orig_prop is not None:
+            self._index.remove(v.vertex_id, orig_prop)
         properties_copy = copy.copy(v.properties)
         if properties_copy:
             self._g.add_node(n=v.vertex_id, **properties_copy)
         else:
             self._g.add_node(n=v.vertex_id)
+        self._index.add(v.vertex_id, self._g.node[v.vertex_id])
 
     @Notifier.update_notify
     def add_edge(self, e):
@@ -98,6 +120,9 @@ class NXGraph(Graph):
         self._add_edge(e)
 
     def _add_edge(self, e):
+        # networkx implicitly adds missing vertices, they must be indexed too
+        new_vertices = [v_id for v_id in (e.source_id, e.target_id)
+                        if v_id not in self._g.node]
         properties_copy = copy.copy(e.properties)
         if properties_copy:
             self._g.add_edge(u=e.source_id, v=e.target_id,
@@ -105,19 +130,22 @@ class NXGraph(Graph):
         else:
             self._g.add_edge(u=e.source_id, v=e.target_id,
                              key=e.label)
+        for v_id in new_vertices:
+            self._index.add(v_id, self._g.node[v_id])
 
-    def get_vertex(self, v_id):
+    def get_vertex(self, v_id, read_only=False):
         """Fetch a vertex from the graph
 
         :rtype: Vertex
         """
         properties = self._g.node.get(v_id, None)
         if properties is not None:
-            return vertex_copy(v_id, properties)
+            make_vertex = vertex_view if read_only else vertex_copy
+            return make_vertex(v_id, properties)
         LOG.debug("get_vertex item not found. v_id=%s", str(v_id))
         return None
 
-    def get_edge(self, source_id, target_id, label):
+    def get_edge(self, source_id, target_id, label, read_only=False):
         try:
             properties = self._g.adj[source_id][target_id][label]
         except KeyError:
@@ -125,14 +153,16 @@ class NXGraph(Graph):
                       "label=%s", str(source_id), str(target_id), str(label))
             return None
         if properties is not None:
-            return edge_copy(source_id, target_id, label, properties)
+            make_edge = edge_view if read_only else edge_copy
+            return make_edge(source_id, target_id, label, properties)
         return None
 
     def get_edges(self,
                   v1_id,
                   v2_id=None,
                   direction=Direction.BOTH,
-                  attr_filter=None):
+                  attr_filter=None,
+                  read_only=False):
         """Fetch multiple edges from the graph
 
         :rtype: set of Edge
@@ -143,7 +173,8 @@ class NXGraph(Graph):
         nodes, edges = self._neighboring_nodes_edges_query(
             v1_id, edge_predicate=check_edge, direction=direction)
 
-        edge_copies = set(edge_copy(u, v, label, data)
+        make_edge = edge_view if read_only else edge_copy
+        edge_copies = set(make_edge(u, v, label, data)
                           for u, v, label, data in edges)
 
         if v2_id:
@@ -183,10 +214,12 @@ class NXGraph(Graph):
         if not orig_prop:
             self._add_vertex(v)
             return
-        self._g.node[v.vertex_id].update(v.properties)
+        old_prop = {key: orig_prop.get(key) for key in self._index.keys}
+        orig_prop.update(v.properties)
         for prop, value in v.properties.items():
             if value is None:
-                del self._g.node[v.vertex_id][prop]
+                del orig_prop[prop]
+        self._index.update(v.vertex_id, old_prop, orig_prop)
 
     @Notifier.update_notify
     def update_edge(self, e):
@@ -206,14 +239,17 @@ class NXGraph(Graph):
             if value is None:
                 del self._g.adj[e.source_id][e.target_id][e.label][prop]
 
+    @Notifier.remove_notify
     def remove_vertex(self, v):
         """Remove Vertex v and its edges from the graph
 
         :type v: Vertex
         """
-
+        properties = self._g.node.get(v.vertex_id)
         self._g.remove_node(n=v.vertex_id)
+        self._index.remove(v.vertex_id, properties)
 
+    @Notifier.remove_notify
     def remove_edge(self, e):
         """Remove an edge from the graph
 
@@ -223,24 +259,53 @@ class NXGraph(Graph):
 
     def get_vertices(self,
                      vertex_attr_filter=None,  # Dictionary of key value
-                     query_dict=None):
+                     query_dict=None,
+                     read_only=False):
         def check_vertex(vertex_data):
             return check_filter(vertex_data[1], vertex_attr_filter)
 
+        make_vertex = vertex_view if read_only else vertex_copy
         if not query_dict:
-            items = filter(check_vertex, list(self._g.nodes(data=True)))
-            return [vertex_copy(node, node_data) for node, node_data in items]
+            nodes = self._indexed_nodes(self._filter_constraints(
+                vertex_attr_filter))
+            items = filter(check_vertex, nodes)
+            return [make_vertex(node, node_data) for node, node_data in items]
         elif not vertex_attr_filter:
-            vertices = []
-            match_func = create_predicate(query_dict)
-            for node, node_data in self._g.nodes(data=True):
-                v = vertex_copy(node, node_data)
-                if match_func(v):
-                    vertices.append(v)
-            return vertices
+            query = compile_query(query_dict)
+            nodes = self._indexed_nodes(query.constraints)
+            return [make_vertex(node, node_data) for node, node_data in nodes
+                    if query.match(node_data)]
         else:
             return []
 
+    def _indexed_nodes(self, constraints):
+        """The (node, data) pairs that may satisfy the constraints
+
+        Uses the properties index to avoid scanning the entire graph, when
+        one of the constrained properties is indexed.
+        """
+        node_ids = self._index.candidates(constraints) \
+            if constraints else None
+        if node_ids is None:
+            return list(self._g.nodes(data=True))
+        return [(node_id, self._g.node[node_id]) for node_id in node_ids]
+
+    @staticmethod
+    def _filter_constraints(vertex_attr_filter):
+        if not vertex_attr_filter:
+            return None
+        constraints = {}
+        for key, content in vertex_attr_filter.items():
+            if not isinstance(content, list):
+                content = [content]
+            constraints[key] = content
+        return constraints
+
+    def _rebuild_index(self):
+        self._index.clear()
+        for node, node_data in self._g.nodes(data=True):
+            self._index.add(node, node_data)
+
     def get_vertices_by_key(self, key_values_hash):
 
         if key_values_hash in self.key_to_vertex_ids:
@@ -251,7 +316,7 @@ class NXGraph(Graph):
         return []
 
     def neighbors(self, v_id, vertex_attr_filter=None, edge_attr_filter=None,
-                  direction=Direction.BOTH):
+                  direction=Direction.BOTH, read_only=False):
 
         def check_edge(edge_data):
             return check_filter(edge_data, edge_attr_filter)
@@ -262,7 +327,8 @@ class NXGraph(Graph):
         nodes, edges = self._neighboring_nodes_edges_query(
             v_id=v_id, vertex_predicate=check_vertex,
             edge_predicate=check_edge, direction=direction)
-        vertices = [vertex_copy(n, data) for n, data in nodes]
+        make_vertex = vertex_view if read_only else vertex_copy
+        vertices = [make_vertex(n, data) for n, data in nodes]
         return vertices
 
     def _neighboring_nodes_edges_query(self, v_id,
@@ -331,10 +397,12 @@ class NXGraph(Graph):
     @staticmethod
     def read_gpickle(data, graph_to_update=None):
         if graph_to_update is not None:
+            graph_to_update.check_not_frozen()
             graph = graph_to_update
         else:
             graph = NXGraph()
         graph._g = cPickle.loads(data)
+        graph._rebuild_index()
         return graph
 
     def union(self, other_graph):
@@ -342,4 +410,6 @@ class NXGraph(Graph):
 
         :type other_graph: NXGraph
         """
+        self.check_not_frozen()
         self._g = compose(self._g, other_graph._g)
+        self._rebuild_index()
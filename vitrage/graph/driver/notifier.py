@@ -12,43 +12,165 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import collections
 import functools
 
+from vitrage.graph.driver.elements import Edge
 from vitrage.graph.driver.elements import Vertex
 
 
 def _before_func(graph, item):
-    if not graph.is_subscribed():
+    if not graph.notifier.is_subscribed(batched=True):
         return
     return graph.get_item(item)
 
 
 def _after_func(graph, item, data_before=None):
-    if not graph.is_subscribed():
+    if not graph.notifier.is_subscribed(batched=True):
         return
     element = graph.get_item(item)
     is_vertex = isinstance(element, Vertex) or isinstance(item, Vertex)
     graph.notifier.notify(data_before, element, is_vertex, graph)
 
 
+def _element_key(item):
+    if isinstance(item, Vertex):
+        return item.vertex_id
+    return item.source_id, item.target_id, item.label
+
+
+class _PendingChange(object):
+    """The net change of a graph element during a batch
+
+    after is None as long as the element is in the graph, and its current
+    state is read when the batch ends.
+    """
+    __slots__ = ('item', 'before', 'after')
+
+    def __init__(self, item, before):
+        self.item = item
+        self.before = before
+        self.after = None
+
+
 class Notifier(object):
     def __init__(self):
         self._subscriptions = []
+        self._immediate_subscriptions = []
+        self._batch_depth = 0
+        self._muted = 0
+        self._pending = collections.OrderedDict()
 
-    def subscribe(self, function):
-        self._subscriptions.append(function)
+    def subscribe(self, function, immediate=False):
+        """Subscribe to the graph changes
 
-    def is_subscribed(self):
-        return len(self._subscriptions) != 0
+        :param immediate: notify every change also inside a batch, for
+                          subscribers that read the graph while handling a
+                          notification and must see every step of the change
+        """
+        if immediate:
+            self._immediate_subscriptions.append(function)
+        else:
+            self._subscriptions.append(function)
+
+    def unsubscribe_all(self):
+        self._subscriptions = []
+        self._immediate_subscriptions = []
+
+    def is_subscribed(self, batched=False):
+        """Are there subscribers to notify now
+
+        :param batched: inside a batch, only the immediate subscribers are
+                        notified on every change
+        """
+        if self._muted:
+            return False
+        if batched and self.in_batch():
+            return len(self._immediate_subscriptions) != 0
+        return len(self._subscriptions) + \
+            len(self._immediate_subscriptions) != 0
 
     def notify(self, *args, **kwargs):
-        for func in self._subscriptions:
+        if self._muted:
+            return
+        if not self.in_batch():
+            for func in self._subscriptions:
+                func(*args, **kwargs)
+        for func in self._immediate_subscriptions:
             func(*args, **kwargs)
 
+    def in_batch(self):
+        return self._batch_depth > 0
+
+    def mute(self):
+        self._muted += 1
+
+    def unmute(self):
+        self._muted -= 1
+
+    def start_batch(self):
+        self._batch_depth += 1
+
+    def end_batch(self, graph):
+        """End a batch, and notify the net changes of the outermost batch
+
+        Every changed element is notified once, in the order of its first
+        change, with its state before the batch and its state now.
+        """
+        self._batch_depth -= 1
+        if self._batch_depth > 0:
+            return
+        pending, self._pending = self._pending, collections.OrderedDict()
+        for change in pending.values():
+            after = change.after
+            if after is None:
+                after = graph.get_item(change.item)
+            if after is None:
+                continue
+            for func in self._subscriptions:
+                func(change.before, after, isinstance(change.item, Vertex),
+                     graph)
+
+    def _record_change(self, graph, item):
+        if not self._subscriptions or self._muted:
+            return
+        key = _element_key(item)
+        change = self._pending.get(key)
+        if change is None:
+            # keep only the ids, the caller may change the item later
+            if isinstance(item, Vertex):
+                item = Vertex(item.vertex_id)
+            else:
+                item = Edge(item.source_id, item.target_id, item.label)
+            self._pending[key] = _PendingChange(item, graph.get_item(item))
+        else:
+            # the element was removed and added again during the batch
+            change.after = None
+
+    def _record_removal(self, graph, item):
+        """Keep the last state of the changed elements that are removed
+
+        Removals are not notified, so subscribers get the last state of a
+        removed element, as they would without a batch.
+        """
+        if isinstance(item, Vertex):
+            keys = [key for key in self._pending
+                    if key == item.vertex_id or
+                    (isinstance(key, tuple) and item.vertex_id in key[:2])]
+        else:
+            keys = [_element_key(item)]
+        for key in keys:
+            change = self._pending.get(key)
+            if change is not None and change.after is None:
+                change.after = graph.get_item(change.item)
+
     @staticmethod
     def update_notify(func):
         @functools.wraps(func)
         def notified_func(graph, item, *args, **kwargs):
+            graph.check_not_frozen()
+            if graph.notifier.in_batch():
+                graph.notifier._record_change(graph, item)
             data_before = _before_func(graph, item)
             func(graph, item, *args, **kwargs)
             _after_func(graph, item, data_before)
@@ -58,6 +180,20 @@ class Notifier(object):
     def add_notify(func):
         @functools.wraps(func)
         def notified_func(graph, item, *args, **kwargs):
+            graph.check_not_frozen()
+            if graph.notifier.in_batch():
+                graph.notifier._record_change(graph, item)
             func(graph, item, *args, **kwargs)
             _after_func(graph, item)
         return notified_func
+
+    @staticmethod
+    def remove_notify(func):
+        """Removals are not notified, but they may end a batched change"""
+        @functools.wraps(func)
+        def notified_func(graph, item, *args, **kwargs):
+            graph.check_not_frozen()
+            if graph.notifier.in_batch() and graph.notifier._pending:
+                graph.notifier._record_removal(graph, item)
+            return func(graph, item, *args, **kwargs)
+        return notified_func
@@ -0,0 +1,113 @@
+# Copyright 2018 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from collections import defaultdict
+
+
+class PropertiesIndex(object):
+    """Hash index of graph elements by the values of selected properties
+
+    For every indexed property key, the index maps each property value to the
+    set of element ids holding it. Elements that do not have the property are
+    indexed under None, so a lookup gives the same answer as data.get(key).
+
+    The index is a candidates filter only: a lookup may return a superset of
+    the matching elements (e.g. True and 1 share a bucket), so callers must
+    still check the returned elements.
+    """
+
+    def __init__(self, keys):
+        self.keys = frozenset(keys)
+        self._index = {}
+        self._unhashable = {}
+        self.clear()
+
+    def clear(self):
+        self._index = {key: defaultdict(set) for key in self.keys}
+        self._unhashable = {key: set() for key in self.keys}
+
+    def add(self, element_id, properties):
+        for key in self.keys:
+            self._add_value(key, element_id, properties.get(key))
+
+    def remove(self, element_id, properties):
+        for key in self.keys:
+            self._remove_value(key, element_id, properties.get(key))
+
+    def update(self, element_id, old_properties, new_properties):
+        for key in self.keys:
+            old_value = old_properties.get(key)
+            new_value = new_properties.get(key)
+            if old_value is new_value:
+                continue
+            self._remove_value(key, element_id, old_value)
+            self._add_value(key, element_id, new_value)
+
+    def lookup(self, key, values):
+        """Ids of the elements whose property key may be one of the values
+
+        :type key: str
+        :type values: collections.Iterable
+        :return: set of element ids, or None if the lookup can not be
+                 answered by the index
+        :rtype: set or None
+        """
+        index = self._index.get(key)
+        if index is None:
+            return None
+        result = set(self._unhashable[key])
+        for value in values:
+            try:
+                element_ids = index.get(value)
+            except TypeError:
+                return None
+            if element_ids:
+                result.update(element_ids)
+        return result
+
+    def candidates(self, constraints):
+        """Intersect the lookups of all the indexed constraints
+
+        :param constraints: property key to the possible values it may have
+        :type constraints: dict
+        :return: set of candidate element ids, or None if no constraint is
+                 indexed and a full scan is needed
+        :rtype: set or None
+        """
+        lookups = []
+        for key, values in constraints.items():
+            element_ids = self.lookup(key, values)
+            if element_ids is not None:
+                lookups.append(element_ids)
+        if not lookups:
+            return None
+        lookups.sort(key=len)
+        return lookups[0].intersection(*lookups[1:])
+
+    def _add_value(self, key, element_id, value):
+        try:
+            self._index[key][value].add(element_id)
+        except TypeError:
+            self._unhashable[key].add(element_id)
+
+    def _remove_value(self, key, element_id, value):
+        try:
+            element_ids = self._index[key].get(value)
+        except TypeError:
+            self._unhashable[key].discard(element_id)
+            return
+        if element_ids is not None:
+            element_ids.discard(element_id)
+            if not element_ids:
+                del self._index[key][value]
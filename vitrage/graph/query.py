@@ -12,28 +12,40 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+from collections import namedtuple
+import operator
+
 from oslo_log import log as logging
-import six
 
 from vitrage.common.exception import VitrageError
 
 LOG = logging.getLogger(__name__)
 
-operators = [
-    '<',
-    '<=',
+operators = {
+    '<': operator.lt,
+    '<=': operator.le,
     # '=',
-    '==',
-    '!=',
-    '>=',
-    '>',
-]
+    '==': operator.eq,
+    '!=': operator.ne,
+    '>=': operator.ge,
+    '>': operator.gt,
+}
 
 logical_operations = [
     'and',
     'or'
 ]
 
+# A query compiled into a predicate.
+# match - the predicate, match(item) is True if the item matches the query
+# constraints - selectivity hints for the query planner, the values that every
+# matching item must have per property. See get_equality_constraints
+CompiledQuery = namedtuple('CompiledQuery', ['match', 'constraints'])
+
+# Compiled queries, keyed by the canonical form of the query dict
+_compiled_queries = {}
+MAX_COMPILED_QUERIES = 1024
+
 
 def create_predicate(query_dict):
     """Create predicate from a logical and/or/==/>/etc expression
@@ -52,6 +64,7 @@ def create_predicate(query_dict):
 
     Example Output:
     --------------
+    a predicate equivalent to
     lambda item: ((item['CATEGORY']== 'ALARM') and
                   ((item['TIME']> 150) or (item['VITRAGE_IS_DELETED']== True)))
 
@@ -64,58 +77,166 @@ def create_predicate(query_dict):
     :param query_dict:
     :return: a predicate "match(item)"
     """
+    return compile_query(query_dict).match
+
+
+def compile_query(query_dict):
+    """Compile a query dict into a predicate, or get it from the cache
+
+    The query is compiled into a tree of closures, one per query operation.
+    Compiled queries are cached by the canonical form of the query dict, so
+    the same query is compiled only once.
+
+    :param query_dict: see create_predicate
+    :rtype: CompiledQuery
+    """
+    try:
+        key = _canonical_form(query_dict)
+        compiled_query = _compiled_queries.get(key)
+    except TypeError:
+        # Unhashable values can not be cached
+        key, compiled_query = None, None
+
+    if compiled_query is not None:
+        return compiled_query
+
     try:
-        expression = _create_query_expression(query=query_dict)
-        LOG.debug('create_predicate::%s', expression)
-        expression = 'lambda item: ' + expression
-        return eval(expression)
+        compiled_query = CompiledQuery(
+            match=_compile_query_expression(query_dict),
+            constraints=get_equality_constraints(query_dict))
+        LOG.debug('compile_query::%s', query_dict)
     except Exception as e:
         LOG.error('invalid query format %s. Exception: %s',
                   query_dict, e)
         raise VitrageError('invalid query format %s. Exception: %s',
                            query_dict, e)
 
+    if key is not None:
+        if len(_compiled_queries) >= MAX_COMPILED_QUERIES:
+            _compiled_queries.clear()
+        _compiled_queries[key] = compiled_query
+    return compiled_query
 
-def _create_query_expression(query, parent_operator=None):
-    expressions = []
 
+def _compile_query_expression(query, parent_operator=None):
     # First element or element under logical operation
     if not parent_operator and isinstance(query, dict):
         (key, value) = query.copy().popitem()
-        return _create_query_expression(value, key)
+        return _compile_query_expression(value, key)
 
     # Continue recursion on logical (and/or) operation
     elif parent_operator in logical_operations and isinstance(query, list):
-        for val in query:
-            expressions.append(_create_query_expression(val))
+        expressions = [_compile_query_expression(val) for val in query]
         return _join_logical_operator(parent_operator, expressions)
 
     # Recursion evaluate leaf (stop condition)
     elif parent_operator in operators:
-        for key, val in query.items():
-            expressions.append('item.get(' + _evaluable_str(key) + ')' +
-                               parent_operator + ' ' + _evaluable_str(val))
+        op = operators[parent_operator]
+        expressions = [_create_term(op, key, val)
+                       for key, val in query.items()]
         return _join_logical_operator('and', expressions)
     else:
         raise VitrageError('invalid partial query format',
                            parent_operator, query)
 
 
-def _evaluable_str(value):
-    """wrap string/unicode with back tick"""
-    if isinstance(value, six.string_types):
-        return '\'' + value + '\''
-    else:
-        return str(value)
+def _create_term(op, key, value):
+    def term(item):
+        return op(item.get(key), value)
+    return term
 
 
 def _join_logical_operator(op, expressions):
-    """Create an expressions string
+    """Create a predicate joining the expressions predicates
 
     Example input:
-        op='AND'
-        expressions=['a == b', 'c < d']
-    Example output: (a == b AND c < d)
+        op='and'
+        expressions=[a == b, c < d]
+    Example output: predicate of (a == b and c < d)
+    """
+    if not expressions:
+        return lambda item: False
+    if len(expressions) == 1:
+        return expressions[0]
+    if op == 'and':
+        return lambda item: all(expr(item) for expr in expressions)
+    return lambda item: any(expr(item) for expr in expressions)
+
+
+def _canonical_form(query):
+    """A hashable representation of the query
+
+    :raises TypeError: if the query contains unhashable values
+    """
+    if isinstance(query, dict):
+        return dict, tuple((key, _canonical_form(val))
+                           for key, val in query.items())
+    if isinstance(query, list):
+        return list, tuple(_canonical_form(val) for val in query)
+    hash(query)
+    return type(query), query
+
+
+def get_equality_constraints(query_dict):
+    """Get the property values that every item matching the query must have
+
+    Only '==' terms are considered. A term under an 'or' is kept only if the
+    same property is constrained by all the 'or' operands.
+
+    Example Input:
+    --------------
+    query_dict = {
+        'and': [
+            {'==': {'CATEGORY': 'ALARM'}},
+            {'or': [
+                {'==': {'TYPE': 'nova.host'}},
+                {'==': {'TYPE': 'nova.instance'}}
+            ]}
+        ]
+    }
+
+    Example Output:
+    --------------
+    {'CATEGORY': frozenset(['ALARM']),
+     'TYPE': frozenset(['nova.host', 'nova.instance'])}
+
+    :param query_dict:
+    :return: property key to the frozenset of values it may have
+    :rtype: dict
     """
-    separator = ' ' + op + ' '
-    return '(' + separator.join(expressions) + ')'
+    try:
+        return _get_equality_constraints(query_dict)
+    except (TypeError, AttributeError, ValueError, KeyError):
+        return {}
+
+
+def _get_equality_constraints(query, parent_operator=None):
+    if not parent_operator and isinstance(query, dict):
+        (key, value) = query.copy().popitem()
+        return _get_equality_constraints(value, key)
+
+    elif parent_operator == 'and':
+        constraints = {}
+        for val in query:
+            for key, values in _get_equality_constraints(val).items():
+                if key in constraints:
+                    constraints[key] = constraints[key] & values
+                else:
+                    constraints[key] = values
+        return constraints
+
+    elif parent_operator == 'or':
+        operands = [_get_equality_constraints(val) for val in query]
+        if not operands:
+            return {}
+        constraints = operands[0]
+        for operand in operands[1:]:
+            constraints = {key: values | operand[key]
+                           for key, values in constraints.items()
+                           if key in operand}
+        return constraints
+
+    elif parent_operator == '==':
+        return {key: frozenset([val]) for key, val in query.items()}
+
+    return {}
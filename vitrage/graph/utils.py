@@ -13,11 +13,30 @@
 # under the License.
 
 import re
+
+from six.moves import intern
+
 from vitrage.common.constants import EdgeProperties as EConst
 from vitrage.common.constants import VertexProperties as VConst
 from vitrage.graph.driver.elements import Edge
 from vitrage.graph.driver.elements import Vertex
 
+# Properties with a small set of possible values, shared by many elements.
+# Their values are interned so all the elements hold the same string object
+INTERNED_PROPERTIES = frozenset([
+    VConst.VITRAGE_CATEGORY,
+    VConst.VITRAGE_TYPE,
+    VConst.STATE,
+    VConst.PROJECT_ID,
+    VConst.VITRAGE_STATE,
+    VConst.VITRAGE_AGGREGATED_STATE,
+    VConst.VITRAGE_OPERATIONAL_STATE,
+    VConst.SEVERITY,
+    VConst.VITRAGE_AGGREGATED_SEVERITY,
+    VConst.VITRAGE_OPERATIONAL_SEVERITY,
+    EConst.RELATIONSHIP_TYPE,
+])
+
 
 def create_vertex(vitrage_id,
                   vitrage_category=None,
@@ -72,7 +91,8 @@ def create_vertex(vitrage_id,
     }
     if metadata:
         properties.update(metadata)
-    properties = {k: v for k, v in properties.items() if v is not None}
+    properties = intern_properties(
+        {k: v for k, v in properties.items() if v is not None})
     vertex = Vertex(vertex_id=vitrage_id, properties=properties)
     return vertex
 
@@ -106,14 +126,34 @@ def create_edge(source_id,
     }
     if metadata:
         properties.update(metadata)
-    properties = {k: v for k, v in properties.items() if v is not None}
+    properties = intern_properties(
+        {k: v for k, v in properties.items() if v is not None})
     edge = Edge(source_id=source_id,
                 target_id=target_id,
-                label=relationship_type,
+                label=_intern(relationship_type),
                 properties=properties)
     return edge
 
 
+def intern_properties(properties):
+    """Create a compact copy of the properties
+
+    Property keys and the values of INTERNED_PROPERTIES are interned, so the
+    many elements of the graph share the same string objects instead of
+    holding equal copies of them.
+
+    :type properties: dict
+    :rtype: dict
+    """
+    return {_intern(k): _intern(v) if k in INTERNED_PROPERTIES else v
+            for k, v in properties.items()}
+
+
+def _intern(value):
+    # only native strings can be interned (not unicode on python 2.7)
+    return intern(value) if type(value) is str else value
+
+
 def check_property_with_regex(key, regex, data):
     """Checks if the contents of data[key] matches the given regex
 
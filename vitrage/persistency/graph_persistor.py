@@ -18,7 +18,7 @@ from oslo_log import log
 
 from dateutil import parser
 from vitrage.common.constants import DatasourceProperties as DSProps
-from vitrage.graph.driver.networkx_graph import NXGraph
+from vitrage.entity_graph import get_graph_driver
 from vitrage import storage
 from vitrage.storage.sqlalchemy import models
 from vitrage.utils import datetime
@@ -32,6 +32,7 @@ class GraphPersistor(object):
     def __init__(self, conf):
         super(GraphPersistor, self).__init__()
         self.db_connection = storage.get_connection_from_config(conf)
+        self.graph_driver = get_graph_driver(conf)
         self.last_event_timestamp = datetime.datetime.utcnow()
 
     def store_graph(self, graph):
@@ -48,7 +49,8 @@ class GraphPersistor(object):
     def load_graph(self, timestamp=None):
         db_row = self.db_connection.graph_snapshots.query(timestamp) if \
             timestamp else self.db_connection.graph_snapshots.query(utcnow())
-        return NXGraph.read_gpickle(db_row.graph_snapshot) if db_row else None
+        return self.graph_driver.read_gpickle(db_row.graph_snapshot) \
+            if db_row else None
 
     def delete_graph_snapshots(self, timestamp):
         """Deletes all graph snapshots until timestamp"""
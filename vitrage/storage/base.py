@@ -43,6 +43,10 @@ class Connection(object):
     def webhooks(self):
         return None
 
+    @property
+    def scenario_costs(self):
+        return None
+
     @abc.abstractmethod
     def upgrade(self, nocreate=False):
         raise NotImplementedError('upgrade is not implemented')
@@ -103,6 +107,26 @@ class ActiveActionsConnection(object):
         """Delete all active actions that match the filters."""
         raise NotImplementedError('delete active actions is not implemented')
 
+    @abc.abstractmethod
+    def bulk_update(self, active_actions):
+        """Create or update the actions, in one transaction.
+
+        :type active_actions:
+        list of vitrage.storage.sqlalchemy.models.ActiveAction
+        """
+        raise NotImplementedError(
+            'bulk update active actions is not implemented')
+
+    @abc.abstractmethod
+    def bulk_delete(self, actions):
+        """Delete the actions, in one transaction.
+
+        :param actions: (action_id, trigger) of the actions to delete
+        :type actions: list of tuple
+        """
+        raise NotImplementedError(
+            'bulk delete active actions is not implemented')
+
 
 @six.add_metaclass(abc.ABCMeta)
 class WebhooksConnection(object):
@@ -137,6 +161,35 @@ class WebhooksConnection(object):
         raise NotImplementedError('delete webhook is not implemented')
 
 
+@six.add_metaclass(abc.ABCMeta)
+class ScenarioCostsConnection(object):
+
+    @abc.abstractmethod
+    def update(self, scenario_costs):
+        """Add the costs to the stored costs, in one transaction.
+
+        The evaluations, matches, actions and duration of each scenario are
+        added to the ones that are stored for it.
+
+        :type scenario_costs:
+        list of vitrage.storage.sqlalchemy.models.ScenarioCost
+        """
+        raise NotImplementedError('update scenario costs is not implemented')
+
+    @abc.abstractmethod
+    def query(self, scenario_id=None):
+        """Yields a lists of scenario costs that match filters.
+
+        :rtype: list of vitrage.storage.sqlalchemy.models.ScenarioCost
+        """
+        raise NotImplementedError('query scenario costs is not implemented')
+
+    @abc.abstractmethod
+    def delete(self, scenario_id=None):
+        """Delete all scenario costs that match the filters."""
+        raise NotImplementedError('delete scenario costs is not implemented')
+
+
 @six.add_metaclass(abc.ABCMeta)
 class TemplatesConnection(object):
 
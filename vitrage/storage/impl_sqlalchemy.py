@@ -46,6 +46,7 @@ class Connection(base.Connection):
         self._graph_snapshots = GraphSnapshotsConnection(self._engine_facade)
         self._webhooks = WebhooksConnection(
             self._engine_facade)
+        self._scenario_costs = ScenarioCostsConnection(self._engine_facade)
 
     @property
     def webhooks(self):
@@ -55,6 +56,10 @@ class Connection(base.Connection):
     def active_actions(self):
         return self._active_actions
 
+    @property
+    def scenario_costs(self):
+        return self._scenario_costs
+
     @property
     def events(self):
         return self._events
@@ -84,7 +89,8 @@ class Connection(base.Connection):
                             models.Template.__table__,
                             models.Webhooks.__table__,
                             models.Event.__table__,
-                            models.GraphSnapshot.__table__])
+                            models.GraphSnapshot.__table__,
+                            models.ScenarioCost.__table__])
         # TODO(idan_hefetz) upgrade logic is missing
 
     def disconnect(self):
@@ -200,6 +206,48 @@ class ActiveActionsConnection(base.ActiveActionsConnection, BaseTableConn):
             trigger=trigger)
         return query.delete()
 
+    def bulk_update(self, active_actions):
+        session = self._engine_facade.get_session()
+        with session.begin():
+            for active_action in active_actions:
+                session.merge(active_action)
+
+    def bulk_delete(self, actions):
+        session = self._engine_facade.get_session()
+        with session.begin():
+            for action_id, trigger in actions:
+                session.query(models.ActiveAction).filter_by(
+                    action_id=action_id, trigger=trigger).delete()
+
+
+class ScenarioCostsConnection(base.ScenarioCostsConnection, BaseTableConn):
+    def __init__(self, engine_facade):
+        super(ScenarioCostsConnection, self).__init__(engine_facade)
+
+    def update(self, scenario_costs):
+        session = self._engine_facade.get_session()
+        with session.begin():
+            for cost in scenario_costs:
+                stored = session.query(models.ScenarioCost).get(
+                    cost.scenario_id)
+                if stored is None:
+                    session.add(cost)
+                    continue
+                stored.evaluations += cost.evaluations
+                stored.matches += cost.matches
+                stored.actions += cost.actions
+                stored.duration += cost.duration
+
+    def query(self, scenario_id=None):
+        query = self.query_filter(models.ScenarioCost,
+                                  scenario_id=scenario_id)
+        return query.all()
+
+    def delete(self, scenario_id=None):
+        query = self.query_filter(models.ScenarioCost,
+                                  scenario_id=scenario_id)
+        return query.delete()
+
 
 class WebhooksConnection(base.WebhooksConnection,
                          BaseTableConn):
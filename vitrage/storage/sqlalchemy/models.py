@@ -17,7 +17,7 @@ import zlib
 from oslo_db.sqlalchemy import models
 
 from sqlalchemy import Column, DateTime, INTEGER, String, \
-    SmallInteger, BigInteger, Index, Boolean
+    SmallInteger, BigInteger, Index, Boolean, Float
 from sqlalchemy.ext.declarative import declarative_base
 
 import sqlalchemy.types as types
@@ -202,3 +202,29 @@ class Webhooks(Base):
                 self.headers,
                 self.regex_filter
             )
+
+
+class ScenarioCost(Base, models.TimestampMixin):
+    __tablename__ = 'scenario_costs'
+
+    scenario_id = Column(String(128), primary_key=True)
+    evaluations = Column(BigInteger(), nullable=False, default=0)
+    matches = Column(BigInteger(), nullable=False, default=0)
+    actions = Column(BigInteger(), nullable=False, default=0)
+    duration = Column(Float(), nullable=False, default=0)
+
+    def __repr__(self):
+        return \
+            "<ScenarioCost(" \
+            "scenario_id='%s', " \
+            "evaluations='%s', " \
+            "matches='%s', " \
+            "actions='%s', " \
+            "duration='%s')>" % \
+            (
+                self.scenario_id,
+                self.evaluations,
+                self.matches,
+                self.actions,
+                self.duration
+            )
@@ -21,6 +21,8 @@ from oslotest import base
 import sys
 from testtools.matchers import HasLength
 
+from vitrage.graph.driver.graph import Direction
+
 
 IsEmpty = lambda: HasLength(0)
 
@@ -73,23 +75,20 @@ class BaseTest(base.BaseTestCase):
         This relies on assert_dict_equal when comparing the nodes and the
         edges of each graph.
         """
-        g1_nodes = g1._g.node
-        g1_edges = g1._g.adj
-        g2_nodes = g2._g.node
-        g2_edges = g2._g.adj
         self.assertEqual(g1.num_vertices(), g2.num_vertices(),
                          "Two graphs have different amount of nodes")
         self.assertEqual(g1.num_edges(), g2.num_edges(),
                          "Two graphs have different amount of edges")
-        for n_id in g1_nodes:
-            self.assert_dict_equal(g1_nodes.get(n_id),
-                                   g2_nodes.get(n_id),
+        for v1 in g1.get_vertices(read_only=True):
+            v2 = g2.get_vertex(v1.vertex_id, read_only=True)
+            self.assert_dict_equal(dict(v1.properties),
+                                   dict(v2.properties) if v2 else None,
                                    "Nodes of each graph are not equal")
 
-        for e_source_id in g1_edges:
-            self.assert_dict_equal(dict(g1_edges.get(e_source_id)),
-                                   dict(g2_edges.get(e_source_id)),
-                                   "Edges of each graph are not equal")
+            g1_edges = g1.get_edges(v1.vertex_id, direction=Direction.OUT)
+            g2_edges = g2.get_edges(v1.vertex_id, direction=Direction.OUT)
+            self.assertEqual(g1_edges, g2_edges,
+                             "Edges of each graph are not equal")
 
     @staticmethod
     def path_get(project_file=None):
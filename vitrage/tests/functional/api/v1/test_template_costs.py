@@ -0,0 +1,62 @@
+# Copyright 2018 - Nokia Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+# noinspection PyPackageRequirements
+from mock import mock
+
+from vitrage.tests.functional.api.v1 import FunctionalTest
+
+COSTS = [{'scenario id': 'template-scenario0',
+          'evaluations': 3,
+          'matches': 2,
+          'actions': 1,
+          'duration': 0.5}]
+
+
+class TemplateCostsTest(FunctionalTest):
+
+    def __init__(self, *args, **kwds):
+        super(TemplateCostsTest, self).__init__(*args, **kwds)
+        self.auth = 'noauth'
+
+    def setUp(self):
+        self.client = mock.Mock()
+        self.client.call.return_value = json.dumps({'costs': COSTS})
+        patcher = mock.patch('vitrage.api.hooks.vitrage_rpc.get_client',
+                             return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super(TemplateCostsTest, self).setUp()
+
+    def test_get_costs_as_admin(self):
+        data = self.get_json('/template/costs/',
+                             headers={'X-Roles': 'admin',
+                                      'X-Project-Id': 'admin'})
+
+        self.assertEqual(1, self.client.call.call_count)
+        self.assertEqual('get_scenario_costs',
+                         self.client.call.call_args[0][1])
+        self.assertEqual(COSTS, data)
+
+    def test_get_costs_as_non_admin(self):
+        resp = self.get_json('/template/costs/',
+                             headers={'X-Roles': 'member',
+                                      'X-Project-Id': 'project'},
+                             expect_errors=True)
+
+        self.assertEqual(403, resp.status_int)
+        self.assertEqual(0, self.client.call.call_count)
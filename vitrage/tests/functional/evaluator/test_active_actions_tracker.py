@@ -0,0 +1,119 @@
+# Copyright 2018 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from mock import mock
+from oslo_config import cfg
+
+from vitrage.common.constants import VertexProperties as VProps
+from vitrage.datasources.nova.host import NOVA_HOST_DATASOURCE
+from vitrage.evaluator.actions.base import ActionMode
+from vitrage.evaluator.actions.base import ActionType
+from vitrage.evaluator.scenario_evaluator import ActionInfo
+from vitrage.evaluator.scenario_evaluator import ActiveActionsTracker
+from vitrage.evaluator.scenario_evaluator import TARGET
+from vitrage.evaluator.template_data import ActionSpecs
+from vitrage.evaluator.template_fields import TemplateFields as TFields
+from vitrage.graph import Vertex
+from vitrage.opts import register_opts
+from vitrage.tests.base import IsEmpty
+from vitrage.tests.functional.base import TestFunctionalBase
+from vitrage.tests.functional.test_configuration import TestConfiguration
+
+
+class TestActiveActionsTracker(TestFunctionalBase, TestConfiguration):
+
+    # noinspection PyPep8Naming
+    @classmethod
+    def setUpClass(cls):
+        super(TestActiveActionsTracker, cls).setUpClass()
+        cls.conf = cfg.ConfigOpts()
+        cls.conf.register_opts(cls.PROCESSOR_OPTS, group='entity_graph')
+        cls.conf.register_opts(cls.DATASOURCES_OPTS, group='datasources')
+        cls.add_db(cls.conf)
+
+        for datasource_name in cls.conf.datasources.types:
+            register_opts(cls.conf, datasource_name, cls.conf.datasources.path)
+
+    def setUp(self):
+        super(TestActiveActionsTracker, self).setUp()
+        self._db.active_actions.delete()
+        self.host = Vertex('host-1', {VProps.VITRAGE_ID: 'host-1',
+                                      VProps.VITRAGE_TYPE:
+                                          NOVA_HOST_DATASOURCE})
+
+    def test_do_and_undo_actions(self):
+        tracker = ActiveActionsTracker(self.conf, self._db)
+        warning = self._raise_alarm('warning', 'WARNING', 1)
+        critical = self._raise_alarm('critical', 'CRITICAL', 2)
+
+        self.assertEqual((True, False), tracker.calc_do_action(warning))
+        self.assertEqual((True, False), tracker.calc_do_action(critical))
+        self.assertEqual((False, True), tracker.calc_do_action(warning))
+
+        tracker.flush()
+        self.assertEqual(
+            {'warning', 'critical'},
+            set(a.action_id for a in self._db.active_actions.query()))
+
+        # a new tracker is loaded from the database
+        tracker = ActiveActionsTracker(self.conf, self._db)
+        is_highest_score, second_highest = \
+            tracker.calc_undo_action(critical)
+        self.assertTrue(is_highest_score)
+        self.assertEqual('warning', second_highest.action_id)
+        self.assertEqual(1, second_highest.trigger)
+
+        tracker.flush()
+        self.assertEqual(
+            ['warning'],
+            [a.action_id for a in self._db.active_actions.query()])
+
+    def test_undo_pending_action(self):
+        tracker = ActiveActionsTracker(self.conf, self._db)
+        warning = self._raise_alarm('warning', 'WARNING', 1)
+
+        tracker.calc_do_action(warning)
+        self.assertEqual((True, None), tracker.calc_undo_action(warning))
+        self.assertEqual((True, False), tracker.calc_do_action(warning))
+
+        tracker.flush()
+        self.assertEqual(
+            ['warning'],
+            [a.action_id for a in self._db.active_actions.query()])
+
+    def test_failed_write_is_retried(self):
+        tracker = ActiveActionsTracker(self.conf, self._db)
+        warning = self._raise_alarm('warning', 'WARNING', 1)
+        critical = self._raise_alarm('critical', 'CRITICAL', 2)
+        with mock.patch.object(self._db.active_actions, 'bulk_update',
+                               side_effect=Exception('db error')):
+            tracker.calc_do_action(warning)
+            tracker.calc_do_action(critical)
+            tracker.flush()
+        self.assertThat(self._db.active_actions.query(), IsEmpty())
+
+        # a newer change of the same action is kept
+        tracker.calc_undo_action(warning)
+        tracker.flush()
+        self.assertEqual(
+            ['critical'],
+            [a.action_id for a in self._db.active_actions.query()])
+
+    def _raise_alarm(self, action_id, severity, trigger_id):
+        specs = ActionSpecs(id=action_id,
+                            type=ActionType.RAISE_ALARM,
+                            targets={TARGET: self.host},
+                            properties={TFields.ALARM_NAME: 'alarm',
+                                        TFields.SEVERITY: severity})
+        return ActionInfo(specs, ActionMode.DO, action_id, trigger_id)
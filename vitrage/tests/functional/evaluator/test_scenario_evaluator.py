@@ -11,6 +11,7 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+import json
 from oslo_log import log
 from testtools import matchers
 
@@ -20,8 +21,10 @@ LOG = log.getLogger(__name__)
 
 from six.moves import queue
 
+from mock import mock
 from oslo_config import cfg
 
+from vitrage.api_handler.apis.template import TemplateApis
 from vitrage.common.constants import DatasourceAction
 from vitrage.common.constants import DatasourceProperties as DSProps
 from vitrage.common.constants import EdgeLabel
@@ -40,11 +43,19 @@ from vitrage.datasources.nova.instance import NOVA_INSTANCE_DATASOURCE
 from vitrage.datasources.nova.zone import NOVA_ZONE_DATASOURCE
 from vitrage.entity_graph.mappings.operational_resource_state import \
     OperationalResourceState
+from vitrage.evaluator.actions.base import ActionMode
+from vitrage.evaluator.actions.base import ActionType
 from vitrage.evaluator.actions.evaluator_event_transformer \
     import VITRAGE_DATASOURCE
 from vitrage.evaluator.scenario_evaluator import ScenarioEvaluator
+from vitrage.evaluator.scenario_evaluator import TARGET
 from vitrage.evaluator.scenario_repository import ScenarioRepository
+from vitrage.evaluator.template_data import ActionSpecs
+from vitrage.evaluator.template_functions.compiled_properties import \
+    compile_properties
+from vitrage.evaluator.template_functions.v2.functions import get_attr
 from vitrage.graph import create_edge
+from vitrage.storage.sqlalchemy import models
 from vitrage.tests.base import IsEmpty
 from vitrage.tests.functional.base import \
     TestFunctionalBase
@@ -115,6 +126,82 @@ class TestScenarioEvaluator(TestFunctionalBase, TestConfiguration):
         self.assertEqual('AVAILABLE', host_v[VProps.VITRAGE_AGGREGATED_STATE],
                          'host should be AVAILABLE when alarm disabled')
 
+    def test_batch_evaluation(self):
+
+        event_queue, processor, evaluator = self._init_system(batched=True)
+
+        test_vals = {NagiosProperties.STATUS: NagiosTestStatus.WARNING,
+                     NagiosProperties.SERVICE: 'cause_suboptimal_state'}
+        test_vals.update(_NAGIOS_TEST_INFO)
+        generator = mock_driver.simple_nagios_alarm_generators(1, 1, test_vals)
+        warning_test = mock_driver.generate_random_events_list(generator)[0]
+        ok_test = warning_test.copy()
+        ok_test[NagiosProperties.STATUS] = NagiosTestStatus.OK
+
+        # the alarm is raised and disabled in the same batch
+        with evaluator.evaluation_batch():
+            processor.process_event(warning_test)
+            processor.process_event(ok_test)
+        self.assertTrue(event_queue.empty())
+
+        with evaluator.evaluation_batch():
+            processor.process_event(warning_test)
+        self.assertEqual(1, event_queue.qsize())
+        host_v = self.get_host_after_event(event_queue, event_queue.get(),
+                                           processor, _TARGET_HOST)
+        self.assertEqual(OperationalResourceState.SUBOPTIMAL,
+                         host_v[VProps.VITRAGE_AGGREGATED_STATE],
+                         'host should be SUBOPTIMAL with warning alarm')
+
+        with evaluator.evaluation_batch():
+            processor.process_event(ok_test)
+        self.assertEqual(1, event_queue.qsize())
+        host_v = self.get_host_after_event(event_queue, event_queue.get(),
+                                           processor, _TARGET_HOST)
+        self.assertEqual('AVAILABLE', host_v[VProps.VITRAGE_AGGREGATED_STATE],
+                         'host should be AVAILABLE when alarm disabled')
+
+    def test_damped_actions(self):
+
+        event_queue, processor, evaluator = \
+            self._init_system(damping_window=60)
+
+        test_vals = {NagiosProperties.STATUS: NagiosTestStatus.WARNING,
+                     NagiosProperties.SERVICE: 'cause_suboptimal_state'}
+        test_vals.update(_NAGIOS_TEST_INFO)
+        generator = mock_driver.simple_nagios_alarm_generators(1, 1, test_vals)
+        warning_test = mock_driver.generate_random_events_list(generator)[0]
+        ok_test = warning_test.copy()
+        ok_test[NagiosProperties.STATUS] = NagiosTestStatus.OK
+
+        # the host state is set and cleared in the damping window
+        processor.process_event(warning_test)
+        processor.process_event(ok_test)
+        evaluator._actions_damper.flush()
+        self.assertEqual(1, event_queue.qsize())
+        host_v = self.get_host_after_event(event_queue, event_queue.get(),
+                                           processor, _TARGET_HOST)
+        self.assertEqual('AVAILABLE', host_v[VProps.VITRAGE_AGGREGATED_STATE],
+                         'host should be AVAILABLE when alarm disabled')
+        self.assertEqual(1, sum(evaluator._actions_damper.suppressed.values()))
+
+        # the held actions are executed when the active actions are written
+        processor.process_event(warning_test)
+        self.assertTrue(event_queue.empty())
+        evaluator.flush_active_actions()
+        host_v = self.get_host_after_event(event_queue, event_queue.get(),
+                                           processor, _TARGET_HOST)
+        self.assertEqual(OperationalResourceState.SUBOPTIMAL,
+                         host_v[VProps.VITRAGE_AGGREGATED_STATE],
+                         'host should be SUBOPTIMAL with warning alarm')
+
+        processor.process_event(ok_test)
+        evaluator._actions_damper.flush()
+        host_v = self.get_host_after_event(event_queue, event_queue.get(),
+                                           processor, _TARGET_HOST)
+        self.assertEqual('AVAILABLE', host_v[VProps.VITRAGE_AGGREGATED_STATE],
+                         'host should be AVAILABLE when alarm disabled')
+
     def test_overlapping_deduced_state_1(self):
 
         event_queue, processor, evaluator = self._init_system()
@@ -1229,6 +1316,130 @@ class TestScenarioEvaluator(TestFunctionalBase, TestConfiguration):
         alarms = self._get_alarms_on_host(host_v, processor.entity_graph)
         self.assertThat(alarms, IsEmpty())
 
+    def test_scenario_costs(self):
+        event_queue, processor, evaluator = self._init_system()
+        self._db.scenario_costs.delete()
+
+        test_vals = {NagiosProperties.STATUS: NagiosTestStatus.WARNING,
+                     NagiosProperties.SERVICE: 'cause_suboptimal_state'}
+        test_vals.update(_NAGIOS_TEST_INFO)
+        generator = mock_driver.simple_nagios_alarm_generators(1, 1, test_vals)
+        warning_test = mock_driver.generate_random_events_list(generator)[0]
+        self.get_host_after_event(event_queue, warning_test,
+                                  processor, _TARGET_HOST)
+
+        evaluator.flush_scenario_costs()
+        costs = self._db.scenario_costs.query()
+        self.assertThat(costs, matchers.Not(IsEmpty()))
+        scenario_ids = set(
+            s.id for s in self.scenario_repository._all_scenarios)
+        for cost in costs:
+            self.assertIn(cost.scenario_id, scenario_ids)
+            self.assertGreater(cost.evaluations, 0)
+
+        # the costs that failed to be stored are stored by the next flush
+        ok_test = warning_test.copy()
+        ok_test[NagiosProperties.STATUS] = NagiosTestStatus.OK
+        self.get_host_after_event(event_queue, ok_test,
+                                  processor, _TARGET_HOST)
+        with mock.patch.object(type(self._db.scenario_costs), 'update',
+                               side_effect=Exception('db error')):
+            evaluator.flush_scenario_costs()
+        self.assertEqual(
+            sorted((c.scenario_id, c.evaluations) for c in costs),
+            sorted((c.scenario_id, c.evaluations)
+                   for c in self._db.scenario_costs.query()))
+        failed_evaluations = sum(c.evaluations for c in costs)
+        evaluator.flush_scenario_costs()
+        costs = self._db.scenario_costs.query()
+        self.assertGreater(sum(c.evaluations for c in costs),
+                           failed_evaluations)
+
+        # the costs are added to the stored costs
+        evaluator.flush_scenario_costs()
+        self.assertEqual(
+            sorted((c.scenario_id, c.evaluations) for c in costs),
+            sorted((c.scenario_id, c.evaluations)
+                   for c in self._db.scenario_costs.query()))
+
+        # the costs api shows the most costly scenarios first
+        api_costs = json.loads(
+            TemplateApis(db=self._db).get_scenario_costs({}))['costs']
+        self.assertEqual(
+            sorted(((c.scenario_id, c.actions, c.duration) for c in costs),
+                   key=lambda cost: -cost[2]),
+            [(c['scenario id'], c['actions'], c['duration'])
+             for c in api_costs])
+        self.assertGreater(sum(c['actions'] for c in api_costs), 0)
+
+    def test_sweep_portions(self):
+        event_queue, processor, evaluator = self._init_system()
+
+        test_vals = {NagiosProperties.STATUS: NagiosTestStatus.WARNING,
+                     NagiosProperties.SERVICE: 'cause_suboptimal_state'}
+        test_vals.update(_NAGIOS_TEST_INFO)
+        generator = mock_driver.simple_nagios_alarm_generators(1, 1, test_vals)
+        warning_test = mock_driver.generate_random_events_list(generator)[0]
+        self.get_host_after_event(event_queue, warning_test,
+                                  processor, _TARGET_HOST)
+
+        def sweep_actions(sweeps):
+            return sorted((vertex_id, [(a.action_id, a.mode, a.trigger_id)
+                                       for a in actions])
+                          for sweep in sweeps
+                          for vertex_id, actions in sweep)
+
+        sweep = evaluator.sweep(ActionMode.DO)
+        self.assertThat(sweep, matchers.Not(IsEmpty()))
+        self.assertEqual(
+            sweep_actions([sweep]),
+            sweep_actions([evaluator.sweep(ActionMode.DO, i, 3)
+                           for i in range(3)]))
+
+        # the graph of each worker may iterate the vertices in another order
+        vertices = processor.entity_graph.get_vertices()
+        sweeps = []
+        for i in range(3):
+            with mock.patch.object(processor.entity_graph, 'get_vertices',
+                                   return_value=vertices[i:] + vertices[:i]):
+                sweeps.append(evaluator.sweep(ActionMode.DO, i, 3))
+        self.assertEqual(sweep_actions([sweep]), sweep_actions(sweeps))
+
+    def test_stored_action_properties(self):
+        event_queue, processor, evaluator = self._init_system()
+        host_v = self._get_entity_from_graph(NOVA_HOST_DATASOURCE,
+                                             _TARGET_HOST,
+                                             _TARGET_HOST,
+                                             processor.entity_graph)
+
+        # the second highest action is built from the stored action
+        properties = compile_properties(
+            {'workflow': 'wf',
+             'input': {'host_name': 'get_attr(host, name)',
+                       'instance_name': 'get_attr(instance, name)'}},
+            {'get_attr': get_attr})
+        action_spec = ActionSpecs('test_stored_action_properties',
+                                  ActionType.EXECUTE_MISTRAL,
+                                  {TARGET: 'host'},
+                                  properties)
+        actions = self.scenario_repository.actions
+        actions[action_spec.id] = action_spec
+        self.addCleanup(actions.pop, action_spec.id)
+        db_action = models.ActiveAction(
+            action_type=action_spec.type,
+            extra_info='',
+            source_vertex_id=None,
+            target_vertex_id=host_v.vertex_id,
+            action_id=action_spec.id,
+            score=0,
+            trigger=0)
+
+        action = evaluator._db_action_to_action_info(db_action)
+        self.assertEqual(
+            {'workflow': 'wf',
+             'input': {'host_name': _TARGET_HOST, 'instance_name': None}},
+            action.specs.properties)
+
     def test_both_and_or_operator_for_tracker(self):
         """(alarm_a or alarm_b) and alarm_c use case
 
@@ -1360,7 +1571,7 @@ class TestScenarioEvaluator(TestFunctionalBase, TestConfiguration):
                                              processor.entity_graph)
         return host_v
 
-    def _init_system(self):
+    def _init_system(self, batched=False, damping_window=0):
         processor = self._create_processor_with_graph(self.conf)
         event_queue = queue.Queue()
 
@@ -1378,7 +1589,9 @@ class TestScenarioEvaluator(TestFunctionalBase, TestConfiguration):
                                       processor.entity_graph,
                                       self.scenario_repository,
                                       actions_callback,
-                                      enabled=True)
+                                      enabled=True,
+                                      batched=batched,
+                                      damping_window=damping_window)
         return event_queue, processor, evaluator
 
     @staticmethod
@@ -44,6 +44,19 @@ class UtilsTest(base.BaseTest):
         self._check_portions_bad_params(all_items, -1, 0)
         self._check_portions_bad_params(all_items, 10, 10)
 
+    def test_get_balanced_portion(self):
+        all_items = ['a', 'b', 'c', 'd', 'e', 'f']
+        weights = [1, 7, 3, 3, 2, 2]
+        portions = [utils.get_balanced_portion(all_items, weights, 2, i)
+                    for i in range(2)]
+
+        self.assertEqual([['b', 'f'], ['c', 'd', 'e', 'a']], portions)
+        self.assertEqual(
+            portions[1],
+            utils.get_balanced_portion(all_items, weights, 2, 1))
+        self.assertThat(
+            utils.get_balanced_portion(all_items, weights, 7, 6), IsEmpty())
+
     def _check_portions_bad_params(self, all_items, num, ind):
         exception = None
         try:
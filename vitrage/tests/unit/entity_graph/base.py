@@ -38,6 +38,8 @@ class TestEntityGraphUnitBase(base.BaseTest):
     PROCESSOR_OPTS = [
         cfg.StrOpt('datasources_values_dir',
                    default=utils.get_resources_dir() + '/datasources_values'),
+        cfg.StrOpt('graph_driver',
+                   default='networkx'),
     ]
 
     DATASOURCES_OPTS = [
@@ -0,0 +1,128 @@
+# Copyright 2018 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from vitrage.common.constants import EdgeLabel
+from vitrage.common.constants import EdgeProperties as EProps
+from vitrage.common.constants import VertexProperties as VProps
+from vitrage.entity_graph.graph_updates import apply_updates
+from vitrage.entity_graph.graph_updates import encode_updates
+from vitrage.graph.driver.networkx_graph import NXGraph
+from vitrage.graph import utils as graph_utils
+from vitrage.tests import base
+
+
+class GraphUpdatesTest(base.BaseTest):
+
+    def setUp(self):
+        super(GraphUpdatesTest, self).setUp()
+        self.graph = NXGraph('entity graph')
+        self.host = graph_utils.create_vertex('host', entity_id='host-1',
+                                              entity_state='AVAILABLE')
+        self.graph.add_vertex(self.host)
+        self.clone = self.graph.copy()
+
+        self.updates = []
+        self.graph.subscribe(
+            lambda before, current, is_vertex, *args:
+            self.updates.append((before, current, is_vertex)))
+
+    def test_apply_updates(self):
+        vm = graph_utils.create_vertex('vm', entity_id='vm-1')
+        self.graph.add_vertex(vm)
+        edge = graph_utils.create_edge('host', 'vm', EdgeLabel.CONTAINS)
+        self.graph.add_edge(edge)
+
+        host = self.graph.get_vertex('host')
+        host[VProps.VITRAGE_STATE] = 'ERROR'
+        self.graph.update_vertex(host)
+        edge[EProps.VITRAGE_IS_DELETED] = True
+        self.graph.update_edge(edge)
+
+        apply_updates(self.clone, encode_updates(self.updates))
+
+        self._assert_same_graph()
+
+    def test_encode_changed_properties(self):
+        host = self.graph.get_vertex('host')
+        host[VProps.VITRAGE_STATE] = 'ERROR'
+        self.graph.update_vertex(host)
+
+        self.assertEqual(1, len(self.updates))
+        data = encode_updates(self.updates)
+        self.assertNotIn(b'AVAILABLE', data)
+        self.assertIn(b'ERROR', data)
+
+        apply_updates(self.clone, data)
+        self._assert_same_graph()
+
+    def test_apply_removed_properties(self):
+        edge = graph_utils.create_edge('host', 'host', EdgeLabel.ATTACHED)
+        edge[EProps.VITRAGE_IS_DELETED] = True
+        self.graph.add_edge(edge)
+        self.clone.add_edge(edge)
+        self.updates = []
+
+        host = self.graph.get_vertex('host')
+        host['entity_state'] = None
+        self.graph.update_vertex(host)
+        edge[EProps.VITRAGE_IS_DELETED] = None
+        self.graph.update_edge(edge)
+
+        apply_updates(self.clone, encode_updates(self.updates))
+
+        self.assertNotIn('entity_state',
+                         self.clone.get_vertex('host').properties)
+        self.assertNotIn(EProps.VITRAGE_IS_DELETED,
+                         self.clone.get_edge('host', 'host',
+                                             EdgeLabel.ATTACHED).properties)
+        self._assert_same_graph()
+
+    def test_apply_notified_updates(self):
+        vm = graph_utils.create_vertex('vm', entity_id='vm-1')
+        self.graph.add_vertex(vm)
+        host = self.graph.get_vertex('host')
+        host[VProps.VITRAGE_STATE] = 'ERROR'
+        self.graph.update_vertex(host)
+
+        notified = []
+        self.clone.subscribe(
+            lambda before, current, is_vertex, *args:
+            notified.append(current.vertex_id), immediate=True)
+        apply_updates(self.clone, encode_updates(self.updates),
+                      lambda element, is_vertex: element.vertex_id == 'vm')
+
+        self.assertEqual(['vm'], notified)
+        self._assert_same_graph()
+
+    def test_apply_removed_element(self):
+        vm = graph_utils.create_vertex('vm', entity_id='vm-1')
+        self.graph.add_vertex(vm)
+        self.clone.add_vertex(vm)
+
+        apply_updates(self.clone, encode_updates([(vm, None, True)]))
+
+        self.assertIsNone(self.clone.get_vertex('vm'))
+        apply_updates(self.clone, encode_updates([(vm, None, True)]))
+
+    def _assert_same_graph(self):
+        self.assertEqual(
+            sorted((v.vertex_id, v.properties)
+                   for v in self.graph.get_vertices()),
+            sorted((v.vertex_id, v.properties)
+                   for v in self.clone.get_vertices()))
+        self.assertEqual(
+            sorted(((e.source_id, e.target_id, e.label), e.properties)
+                   for e in self.graph.get_edges('host')),
+            sorted(((e.source_id, e.target_id, e.label), e.properties)
+                   for e in self.clone.get_edges('host')))
@@ -11,8 +11,10 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+import contextlib
 import threading
 
+from vitrage.entity_graph import graph_init
 from vitrage.entity_graph.graph_init import EventsCoordination
 from vitrage.tests import base
 
@@ -65,6 +67,56 @@ class EventsCoordinationTest(base.BaseTest):
         self._start_and_join(t1, t2, t3, t4)
         self.assertEqual(20000, self.calc_result, explain)
 
+    def test_multiple_low_priority_batches(self):
+        batches = []
+
+        @contextlib.contextmanager
+        def batch():
+            batches.append(self.calc_result)
+            yield
+
+        priority_listener = EventsCoordination(None, self.do_work, None, None,
+                                               batch_func=batch)
+        self.calc_result = 0
+        events_num = graph_init.EVENTS_BATCH_SIZE * 2 + 1
+        priority_listener.handle_multiple_low_priority([False] * events_num)
+
+        self.assertEqual(events_num, self.calc_result)
+        self.assertEqual([0,
+                          graph_init.EVENTS_BATCH_SIZE,
+                          graph_init.EVENTS_BATCH_SIZE * 2], batches)
+
+    def test_high_priority_during_low_priority_batch(self):
+        batches = []
+
+        @contextlib.contextmanager
+        def batch():
+            batches.append(self.calc_result)
+            yield
+
+        priority_listener = EventsCoordination(None, self.do_work, None, None,
+                                               batch_func=batch)
+        high_done = threading.Event()
+
+        def do_work(x):
+            self.do_work(x)
+            if self.calc_result == 3:
+                # a high priority event arrives in the middle of the batch
+                threading.Thread(
+                    target=lambda: (priority_listener._do_high_priority_work(
+                        True), high_done.set())).start()
+                while not priority_listener._high_events_waiting:
+                    pass
+
+        priority_listener._do_work_func = do_work
+        self.calc_result = 0
+        priority_listener.handle_multiple_low_priority([False] * 10)
+        high_done.wait()
+
+        # the batch ends after the event in progress, for the high one
+        self.assertEqual([0, 6], batches)
+        self.assertEqual(13, self.calc_result)
+
     def _start_and_join(self, *args):
         for t in args:
             t.start()
@@ -12,6 +12,13 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+from vitrage.evaluator.template_functions.compiled_properties import \
+    compile_properties
+from vitrage.evaluator.template_functions.compiled_properties import \
+    evaluate_properties
+from vitrage.evaluator.template_functions.compiled_properties import \
+    TemplateFunction
+from vitrage.evaluator.template_functions.v2.functions import FUNCTIONS
 from vitrage.evaluator.template_functions.v2.functions import get_attr
 from vitrage.graph.driver import Vertex
 from vitrage.tests import base
@@ -52,6 +59,34 @@ class TemplateFunctionsTest(base.BaseTest):
         attr = get_attr(match, 'non_existing_entity', 'attr1')
         self.assertIsNone(attr)
 
+    def test_compile_properties(self):
+        properties = {'workflow': 'wf_1',
+                      'input': {'name': 'get_attr ( instance , name ) ',
+                                'other': 'unknown(instance)',
+                                'retries': 5}}
+        compiled = compile_properties(properties, FUNCTIONS)
+
+        func = compiled['input']['name']
+        self.assertIsInstance(func, TemplateFunction)
+        self.assertEqual(('instance', 'name'), func.args)
+        self.assertEqual('unknown(instance)', compiled['input']['other'])
+        self.assertEqual('get_attr ( instance , name ) ',
+                         properties['input']['name'])
+
+        for name in ('vm_1', 'vm_2'):
+            evaluated = evaluate_properties(
+                compiled, self._create_match('instance', {'name': name}))
+            self.assertEqual({'workflow': 'wf_1',
+                              'input': {'name': name,
+                                        'other': 'unknown(instance)',
+                                        'retries': 5}}, evaluated)
+        self.assertIs(func, compiled['input']['name'])
+
+    def test_evaluate_properties_without_functions(self):
+        properties = compile_properties({'state': 'ERROR'}, FUNCTIONS)
+        self.assertIs(properties, evaluate_properties(
+            properties, self._create_match('instance', {})))
+
     @staticmethod
     def _create_match(template_id, properties):
         entity = Vertex(vertex_id='f89fe840-b595-4010-8a09-a444c7642865',
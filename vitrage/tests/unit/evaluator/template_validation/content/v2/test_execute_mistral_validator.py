@@ -110,6 +110,19 @@ class ExecuteMistralValidatorTest(BaseExecuteMistralValidatorTest):
         # Test assertions
         self._assert_warning_result(result, 138)
 
+    def test_v2_validate_execute_mistral_action_with_unknown_func(self):
+        # Test setup
+        idx = DEFINITIONS_INDEX_MOCK.copy()
+        action = \
+            self._create_v2_execute_mistral_action(
+                'wf_1', 'host_2', 'down', func1='get_name(alarm)')
+
+        # Test action
+        result = self.validator.validate(action, idx)
+
+        # Test assertions
+        self._assert_fault_result(result, 139)
+
     def _create_execute_mistral_action(self, workflow, host, host_state):
         return self.\
             _create_v2_execute_mistral_action(workflow, host, host_state)
@@ -12,6 +12,9 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+from vitrage.common.exception import VitrageError
+from vitrage.evaluator.condition import ConditionVar
+from vitrage.evaluator.condition import parse_condition
 from vitrage.evaluator.condition import SymbolResolver
 from vitrage.evaluator.template_data import EdgeDescription
 from vitrage.evaluator.template_loading.template_loader import TemplateLoader
@@ -86,6 +89,35 @@ class ConditionTest(base.BaseTest):
         self._check_get_condition_common_targets(
             'complex_not_unsupported.yaml', [])
 
+    def test_parse_condition(self):
+        self.assertEqual([[ConditionVar('a', True)]], parse_condition('a'))
+        self.assertEqual([[ConditionVar('a', True), ConditionVar('b', True)]],
+                         parse_condition('b and a'))
+        self.assertEqual([[ConditionVar('a', True)],
+                          [ConditionVar('b', False)]],
+                         parse_condition('not b or a'))
+        self.assertEqual([[ConditionVar('a', True), ConditionVar('b', True)],
+                          [ConditionVar('a', True), ConditionVar('c', False)]],
+                         parse_condition('a and (b or not c)'))
+        self.assertEqual(
+            [[ConditionVar('a', False), ConditionVar('b', False)]],
+            parse_condition('not (a or b)'))
+        self.assertEqual([[ConditionVar('E', True), ConditionVar('I', True)]],
+                         parse_condition('E and not not I'))
+
+    def test_parse_condition_cache(self):
+        first = parse_condition('a or b and c')
+        first[0].append(ConditionVar('d', True))
+
+        self.assertEqual([[ConditionVar('a', True)],
+                          [ConditionVar('b', True), ConditionVar('c', True)]],
+                         parse_condition('a or b and c'))
+
+    def test_parse_invalid_condition(self):
+        for condition in ('', 'a and', '(a or b', 'a or b)', 'a b',
+                          'not', 'a and or b'):
+            self.assertRaises(VitrageError, parse_condition, condition)
+
     def _check_get_condition_common_targets(self,
                                             template_name,
                                             valid_targets):
@@ -11,9 +11,18 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+import random
+import time
+
+from vitrage.evaluator.actions.base import ActionMode
 from vitrage.evaluator.actions.base import ActionType
+from vitrage.evaluator.scenario_evaluator import ActionInfo
+from vitrage.evaluator.scenario_evaluator import ActionsDamper
 from vitrage.evaluator.scenario_evaluator import ScenarioEvaluator
+from vitrage.evaluator.scenario_evaluator import TARGET
 from vitrage.evaluator.template_data import ActionSpecs
+from vitrage.evaluator.template_fields import TemplateFields as TFields
+from vitrage.graph import Vertex
 from vitrage.tests import base
 
 
@@ -46,3 +55,143 @@ class TestScenarioEvaluator(base.BaseTest):
                          _generate_action_id(execute_mistral_action_spec_1),
                          ScenarioEvaluator.
                          _generate_action_id(execute_mistral_action_spec_2))
+
+
+class TestActionsDamper(base.BaseTest):
+
+    def test_no_damping(self):
+        executed = []
+        damper = ActionsDamper(executed.append)
+        actions = [self._set_state('host-1', 'ERROR'),
+                   self._set_state('host-1', 'SUBOPTIMAL')]
+
+        damper.add(actions)
+        self.assertEqual(actions, executed)
+
+    def test_merge_repeated_actions(self):
+        executed = []
+        damper = ActionsDamper(executed.append, window=60)
+        error = self._set_state('host-1', 'ERROR')
+        mark_down = self._mark_down('host-2', ActionMode.DO)
+        mistral = self._execute_mistral()
+
+        damper.add([self._set_state('host-1', 'SUBOPTIMAL'),
+                    self._raise_alarm('alarm-1', ActionMode.DO),
+                    error])
+        damper.add([self._raise_alarm('alarm-1', ActionMode.UNDO),
+                    mark_down, mistral, mistral])
+        self.assertEqual([], executed)
+
+        damper.flush()
+        self.assertEqual([error, mark_down, mistral, mistral], executed)
+        self.assertEqual({ActionType.SET_STATE: 1,
+                          ActionType.RAISE_ALARM: 2}, damper.suppressed)
+
+    def test_damped_graph_state(self):
+        for seed in range(20):
+            actions = self._random_actions(random.Random(seed))
+            damper = ActionsDamper(lambda action: None, window=60)
+            damped = []
+            damper._execute = damped.append
+            for i in range(0, len(actions), 7):
+                damper.add(actions[i:i + 7])
+            damper.flush()
+
+            self.assertLess(len(damped), len(actions))
+            self.assertEqual(self._graph_state(actions),
+                             self._graph_state(damped))
+
+    def test_rate_limit(self):
+        damper = ActionsDamper(None, rate_limit=2)
+        actions = [self._raise_alarm('alarm-%s' % i, ActionMode.DO)
+                   for i in range(5)] + [self._set_state('host-1', 'ERROR')]
+        for action in actions:
+            damper._hold(action, 0)
+
+        self.assertEqual((actions[:2], 1), damper._release(100, False))
+        self.assertEqual(([], 0.5), damper._release(100.5, False))
+        # the set_state action waits for the actions before it
+        self.assertEqual((actions[2:4], 1), damper._release(101, False))
+        self.assertEqual((actions[4:], None), damper._release(102, False))
+
+    def test_held_actions_are_executed(self):
+        executed = []
+        damper = ActionsDamper(executed.append, window=0.01, rate_limit=100)
+        actions = [self._raise_alarm('alarm-%s' % i, ActionMode.DO)
+                   for i in range(3)]
+
+        damper.add(actions)
+        for _ in range(500):
+            if len(executed) == len(actions):
+                break
+            time.sleep(0.01)
+        self.assertEqual(actions, executed)
+
+    def _random_actions(self, rand):
+        actions = []
+        active_alarms = set()
+        for _ in range(100):
+            host = 'host-%s' % rand.randint(1, 3)
+            kind = rand.randint(0, 2)
+            if kind == 0:
+                actions.append(self._set_state(
+                    host, rand.choice(['ERROR', 'SUBOPTIMAL', None])))
+            elif kind == 1:
+                actions.append(self._mark_down(
+                    host, rand.choice([ActionMode.DO, ActionMode.UNDO])))
+            else:
+                alarm = 'alarm-%s' % rand.randint(1, 3)
+                mode = ActionMode.UNDO if alarm in active_alarms \
+                    else ActionMode.DO
+                active_alarms ^= {alarm}
+                actions.append(self._raise_alarm(alarm, mode))
+        return actions
+
+    @staticmethod
+    def _graph_state(actions):
+        """The state of the graph after the actions, as the recipes set it"""
+        state = {}
+        for action in actions:
+            specs = action.specs
+            target_id = specs.targets[TARGET].vertex_id
+            if specs.type == ActionType.RAISE_ALARM:
+                # an alarm that was raised and deleted is not shown
+                key = (specs.properties[TFields.ALARM_NAME], target_id)
+                if action.mode == ActionMode.DO:
+                    state[key] = True
+                else:
+                    state.pop(key, None)
+            elif specs.type == ActionType.MARK_DOWN:
+                state[ActionType.MARK_DOWN, target_id] = \
+                    action.mode == ActionMode.DO
+            elif action.mode == ActionMode.DO:
+                state[ActionType.SET_STATE, target_id] = \
+                    specs.properties[TFields.STATE]
+            else:
+                state[ActionType.SET_STATE, target_id] = None
+        return state
+
+    def _set_state(self, host, state):
+        mode = ActionMode.UNDO if state is None else ActionMode.DO
+        return self._action(ActionType.SET_STATE, host, mode,
+                            {TFields.STATE: state or 'ERROR'})
+
+    def _mark_down(self, host, mode):
+        return self._action(ActionType.MARK_DOWN, host, mode, {})
+
+    def _raise_alarm(self, alarm_name, mode):
+        return self._action(ActionType.RAISE_ALARM, 'host-1', mode,
+                            {TFields.ALARM_NAME: alarm_name,
+                             TFields.SEVERITY: 'WARNING'})
+
+    def _execute_mistral(self):
+        return self._action(ActionType.EXECUTE_MISTRAL, 'host-1',
+                            ActionMode.DO, {'workflow': 'wf_1'})
+
+    @staticmethod
+    def _action(action_type, host, mode, properties):
+        specs = ActionSpecs(id=action_type,
+                            type=action_type,
+                            targets={TARGET: Vertex(host, {})},
+                            properties=properties)
+        return ActionInfo(specs, mode, action_type, 1)
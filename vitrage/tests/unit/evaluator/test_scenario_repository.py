@@ -12,16 +12,29 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import gc
+import weakref
+
 from oslo_config import cfg
 from testtools import matchers
 
+from vitrage.common.constants import EdgeProperties as EProps
 from vitrage.common.constants import EntityCategory
+from vitrage.common.constants import TemplateStatus
 from vitrage.common.constants import TemplateTypes as TType
 from vitrage.common.constants import VertexProperties as VProps
+from vitrage.evaluator.actions.base import ActionType
+from vitrage.evaluator.scenario_evaluator import TARGET
 from vitrage.evaluator.scenario_repository import ScenarioRepository
+from vitrage.evaluator.template_data import ActionSpecs
+from vitrage.evaluator.template_data import EdgeDescription
+from vitrage.evaluator.template_data import Scenario
 from vitrage.evaluator.template_validation.template_syntax_validator import \
     syntax_validation
+from vitrage.graph import Edge
+from vitrage.graph.filter import check_filter
 from vitrage.graph import Vertex
+from vitrage.storage.sqlalchemy import models
 from vitrage.tests import base
 from vitrage.tests.base import IsEmpty
 from vitrage.tests.functional.test_configuration import TestConfiguration
@@ -94,19 +107,271 @@ class ScenarioRepositoryTest(base.BaseTest, TestConfiguration):
             # worth noting when handling equivalence
             self.assertTrue(entity_props in equivalence)
             for equivalent_props in equivalence:
-                # Verify equivalent scenarios are present in repository
-                self.assertTrue(equivalent_props in
-                                self.scenario_repository.entity_scenarios)
+                # Verify the scenarios are found by the equivalent entities
+                self.assertEqual(
+                    self.scenario_repository.get_scenarios_by_vertex(
+                        Vertex('v', dict(entity_props))),
+                    self.scenario_repository.get_scenarios_by_vertex(
+                        Vertex('v', dict(equivalent_props))))
 
     def test_get_scenario_by_edge(self):
-        pass
+        repository = self.scenario_repository
+        self.assertThat(repository.relationship_scenarios,
+                        matchers.Not(IsEmpty()))
+        for key, value in repository.relationship_scenarios.items():
+            edge_desc = EdgeDescription(
+                Edge('s', 't', key.label),
+                Vertex('s', dict(key.source)),
+                Vertex('t', dict(key.target)))
+
+            scenarios = repository.get_scenarios_by_edge(edge_desc)
+
+            self.assertEqual(self._edge_scenarios(edge_desc), scenarios)
+            for edge_scenario in value:
+                self.assertIn(edge_scenario, scenarios)
 
     def test_get_scenario_by_entity(self):
-        pass
+        repository = self.scenario_repository
+        self.assertThat(repository.entity_scenarios, matchers.Not(IsEmpty()))
+        for key, value in repository.entity_scenarios.items():
+            vertex = Vertex('v', dict(key))
+
+            scenarios = repository.get_scenarios_by_vertex(vertex)
+
+            self.assertEqual(self._vertex_scenarios(vertex), scenarios)
+            for entity_scenario in value:
+                self.assertIn(entity_scenario, scenarios)
+
+        vertex = Vertex('v', {VProps.VITRAGE_CATEGORY: EntityCategory.ALARM,
+                              VProps.VITRAGE_TYPE: 'no such type'})
+        self.assertThat(repository.get_scenarios_by_vertex(vertex),
+                        IsEmpty())
+
+    def test_trigger_filter(self):
+        repository = self.scenario_repository
+        trigger_filter = repository.get_trigger_filter()
+
+        for key in repository.entity_scenarios:
+            self.assertTrue(trigger_filter(Vertex('v', dict(key)), True))
+        for key in repository.relationship_scenarios:
+            self.assertTrue(trigger_filter(Edge('s', 't', key.label), False))
+
+        # alarms are also defined by name, so all of them may trigger
+        vertex = Vertex('v', {VProps.VITRAGE_CATEGORY: EntityCategory.ALARM,
+                              VProps.VITRAGE_TYPE: 'no such type'})
+        self.assertTrue(trigger_filter(vertex, True))
+        vertex = Vertex('v', {VProps.VITRAGE_CATEGORY: 'no such category',
+                              VProps.VITRAGE_TYPE: 'no such type'})
+        self.assertFalse(trigger_filter(vertex, True))
+        self.assertFalse(trigger_filter(Edge('s', 't', 'no such label'),
+                                        False))
+
+    def test_trigger_filter_relevant_change(self):
+        repository = self.scenario_repository
+        trigger_filter = repository.get_trigger_filter()
+        key = next(iter(repository.entity_scenarios))
+        before = Vertex('v', dict(key))
+        current = Vertex('v', dict(key))
+
+        self.assertTrue(trigger_filter.is_relevant_change(None, current,
+                                                          True))
+        self.assertTrue(trigger_filter.is_relevant_change(before, None, True))
+        current['no_such_property'] = 'changed'
+        self.assertFalse(trigger_filter.is_relevant_change(before, current,
+                                                           True))
+        current[VProps.VITRAGE_IS_DELETED] = True
+        self.assertTrue(trigger_filter.is_relevant_change(before, current,
+                                                          True))
+        for prop_key, value in key:
+            current = Vertex('v', dict(key))
+            current[prop_key] = 'changed'
+            self.assertTrue(trigger_filter.is_relevant_change(before, current,
+                                                              True))
+
+        label = next(iter(repository.relationship_scenarios)).label
+        before = Edge('s', 't', label, {EProps.VITRAGE_IS_DELETED: False})
+        current = Edge('s', 't', label, {EProps.VITRAGE_IS_DELETED: False,
+                                         'no_such_property': 'changed'})
+        self.assertFalse(trigger_filter.is_relevant_change(before, current,
+                                                           False))
+        current[EProps.VITRAGE_IS_DELETED] = True
+        self.assertTrue(trigger_filter.is_relevant_change(before, current,
+                                                          False))
+        self.assertFalse(trigger_filter.is_relevant_change(
+            None, Edge('s', 't', 'no such label'), False))
+
+    def test_balanced_worker_scenarios(self):
+        scenario_ids = sorted(
+            set(s.id for s in self.scenario_repository._all_scenarios))
+        heavy_id = scenario_ids[0]
+        self.addCleanup(self._db.scenario_costs.delete)
+        self._db.scenario_costs.update(
+            [models.ScenarioCost(scenario_id=scenario_id,
+                                 evaluations=1,
+                                 matches=0,
+                                 duration=len(scenario_ids)
+                                 if scenario_id == heavy_id else 1)
+             for scenario_id in scenario_ids])
+
+        enabled = []
+        for worker_index in range(2):
+            repository = ScenarioRepository(self.conf, worker_index, 2)
+            enabled.append(set(s.id for s in repository._all_scenarios
+                               if s.enabled))
+
+        self.assertEqual(set(scenario_ids), enabled[0] | enabled[1])
+        self.assertThat(enabled[0] & enabled[1], IsEmpty())
+        # the heaviest scenario is balanced by all the others
+        self.assertEqual({heavy_id}, enabled[0])
+
+    def test_similar_actions_in_same_worker(self):
+        host = Vertex('host', {VProps.VITRAGE_TYPE: 'nova.host'})
+        instance = Vertex('instance', {VProps.VITRAGE_TYPE: 'nova.instance'})
+        resource = Vertex('resource', {})
+
+        def scenario(scenario_id, action_type, target, **properties):
+            action = ActionSpecs(scenario_id + '-action0', action_type,
+                                 {TARGET: target.vertex_id}, properties)
+            return Scenario(scenario_id, '2', None, [action], [],
+                            {target.vertex_id: target}, {})
+
+        # an ERROR host state dominates a SUBOPTIMAL one of other scenarios
+        scenarios = [
+            scenario('host_error', ActionType.SET_STATE, host,
+                     state='ERROR'),
+            scenario('host_suboptimal', ActionType.SET_STATE, host,
+                     state='SUBOPTIMAL'),
+            scenario('instance_error', ActionType.SET_STATE, instance,
+                     state='ERROR'),
+            scenario('host_alarm', ActionType.RAISE_ALARM, host,
+                     alarm_name='alarm', severity='WARNING'),
+            scenario('instance_alarm', ActionType.RAISE_ALARM, instance,
+                     alarm_name='alarm', severity='WARNING'),
+            scenario('resource_alarm', ActionType.RAISE_ALARM, resource,
+                     alarm_name='alarm', severity='CRITICAL'),
+            scenario('other_alarm', ActionType.RAISE_ALARM, resource,
+                     alarm_name='other alarm', severity='CRITICAL'),
+        ]
+        repository = ScenarioRepository(self.conf)
+        repository._all_scenarios = scenarios
+
+        self.assertEqual(
+            [['host_error', 'host_suboptimal'],
+             ['instance_error'],
+             ['host_alarm', 'instance_alarm', 'resource_alarm'],
+             ['other_alarm']],
+            [[s.id for s in group]
+             for group in repository._group_by_actions()])
+
+        enabled = []
+        for worker_index in range(2):
+            repository._enable_worker_scenarios(worker_index, 2)
+            enabled.append(set(s.id for s in scenarios if s.enabled))
+        self.assertEqual(set(s.id for s in scenarios),
+                         enabled[0] | enabled[1])
+        self.assertThat(enabled[0] & enabled[1], IsEmpty())
+        self.assertIn({'host_error', 'host_suboptimal'},
+                      [enabled[0] & {'host_error', 'host_suboptimal'},
+                       enabled[1] & {'host_error', 'host_suboptimal'}])
+
+    def test_update_templates(self):
+        repository = ScenarioRepository(self.conf, 0, 2)
+        template = [t for t in self._db.templates.query(
+            template_type=TType.STANDARD)
+            if t.uuid in repository.templates][0]
+        self.addCleanup(self._db.templates.update,
+                        template.uuid, 'status', TemplateStatus.ACTIVE)
+
+        self._db.templates.update(template.uuid, 'status',
+                                  TemplateStatus.DELETED)
+        repository.update_templates([template.uuid])
+        self.assertNotIn(template.uuid, repository.templates)
+        self._assert_same_repository(ScenarioRepository(self.conf, 0, 2),
+                                     repository)
+
+        self._db.templates.update(template.uuid, 'status',
+                                  TemplateStatus.ACTIVE)
+        repository.update_templates([template.uuid])
+        self.assertIn(template.uuid, repository.templates)
+        self._assert_same_repository(ScenarioRepository(self.conf, 0, 2),
+                                     repository)
+
+    def test_connected_components(self):
+        repository = ScenarioRepository(self.conf)
+        for scenario in repository._all_scenarios:
+            for subgraph, plan in zip(scenario.subgraphs,
+                                      scenario.match_plans):
+                self.assertTrue(subgraph.frozen)
+                for vertex in subgraph.get_vertices():
+                    self.assertIn(vertex.vertex_id,
+                                  plan.connected_component(vertex.vertex_id))
+
+        # the components are dropped with the scenarios of the template
+        template = [t for t in self._db.templates.query(
+            template_type=TType.STANDARD)
+            if t.uuid in repository.templates][0]
+        self.addCleanup(self._db.templates.update,
+                        template.uuid, 'status', TemplateStatus.ACTIVE)
+        plans = [weakref.ref(plan) for scenario in
+                 repository._template_scenarios[template.uuid]
+                 for plan in scenario.match_plans]
+        self._db.templates.update(template.uuid, 'status',
+                                  TemplateStatus.DELETED)
+        repository.update_templates([template.uuid])
+        gc.collect()
+        self.assertTrue(plans)
+        self.assertEqual([], [plan for plan in plans if plan() is not None])
 
     def test_add_template(self):
         pass
 
+    def _assert_same_repository(self, expected, actual):
+        def scenario_ids(scenarios):
+            return sorted((s.id, s.enabled) for _, s in scenarios)
+
+        self.assertEqual(
+            sorted((s.id, s.enabled) for s in expected._all_scenarios),
+            sorted((s.id, s.enabled) for s in actual._all_scenarios))
+        self.assertEqual(
+            {k: scenario_ids(v) for k, v in expected.entity_scenarios.items()},
+            {k: scenario_ids(v) for k, v in actual.entity_scenarios.items()})
+        self.assertEqual(
+            {k: scenario_ids(v)
+             for k, v in expected.relationship_scenarios.items()},
+            {k: scenario_ids(v)
+             for k, v in actual.relationship_scenarios.items()})
+        self.assertEqual(sorted(expected.actions), sorted(actual.actions))
+        for key in expected.entity_scenarios:
+            vertex = Vertex('v', dict(key))
+            self.assertEqual(
+                scenario_ids(expected.get_scenarios_by_vertex(vertex)),
+                scenario_ids(actual.get_scenarios_by_vertex(vertex)))
+
+    def _vertex_scenarios(self, vertex):
+        """All the matching entity scenarios, without the index"""
+        repository = self.scenario_repository
+        scenarios = []
+        for key, value in repository.entity_scenarios.items():
+            if any(check_filter(vertex.properties, props) for props in
+                   repository.get_equivalent_properties(dict(key))):
+                scenarios += [(e, s) for e, s in value if s.enabled]
+        return scenarios
+
+    def _edge_scenarios(self, edge_desc):
+        """All the matching relationship scenarios, without the index"""
+        repository = self.scenario_repository
+        scenarios = []
+        for key, value in repository.relationship_scenarios.items():
+            if key.label == edge_desc.edge.label and \
+                    any(check_filter(edge_desc.source.properties, props)
+                        for props in repository.get_equivalent_properties(
+                            dict(key.source))) and \
+                    any(check_filter(edge_desc.target.properties, props)
+                        for props in repository.get_equivalent_properties(
+                            dict(key.target))):
+                scenarios += [(e, s) for e, s in value if s.enabled]
+        return scenarios
+
 
 class RegExTemplateTest(base.BaseTest, TestConfiguration):
 
@@ -204,16 +469,38 @@ class EquivalentScenarioTest(base.BaseTest, TestConfiguration):
                           TType.DEFINITION)
         cls.scenario_repository = ScenarioRepository(cls.conf)
 
-    def test_expansion(self):
-        entity_scenarios = self.scenario_repository.entity_scenarios
-        for key, scenarios in entity_scenarios.items():
-            if (VProps.VITRAGE_CATEGORY, EntityCategory.ALARM) in key:
-                # scenarios expanded on the other alarm
-                self.assertThat(scenarios, matchers.HasLength(2))
-            if (VProps.VITRAGE_CATEGORY, EntityCategory.RESOURCE) in key:
-                # Scenarios expanded on the two alarms. Each alarm is expanded
-                # to two equivalent alarms. Thus 2 x 2 = 4 in total
-                self.assertThat(scenarios, matchers.HasLength(4))
-        # each relationship is expand to two. Thus 2 x 2 = 4 in total
-        relationships = self.scenario_repository.relationship_scenarios.keys()
-        self.assertThat(relationships, matchers.HasLength(4))
+    def test_equivalence(self):
+        repository = self.scenario_repository
+        # the scenario is not expanded on the equivalent alarms
+        self.assertThat(repository._all_scenarios, matchers.HasLength(1))
+        scenario = repository._all_scenarios[0]
+        self.assertThat(repository.entity_scenarios, matchers.HasLength(3))
+        self.assertThat(repository.relationship_scenarios,
+                        matchers.HasLength(2))
+
+        host = Vertex('host', {VProps.VITRAGE_CATEGORY:
+                               EntityCategory.RESOURCE,
+                               VProps.VITRAGE_TYPE: 'nova.host'})
+        for alarm_type in ('nagios', 'vitrage'):
+            alarm = Vertex('alarm', {VProps.VITRAGE_CATEGORY:
+                                     EntityCategory.ALARM,
+                                     VProps.VITRAGE_TYPE: alarm_type,
+                                     VProps.NAME: 'cpu_high'})
+            self.assertEqual(
+                [scenario],
+                [s for _, s in repository.get_scenarios_by_vertex(alarm)])
+            edge_desc = EdgeDescription(Edge('alarm', 'host', 'on'),
+                                        alarm, host)
+            self.assertEqual(
+                [scenario],
+                [s for _, s in repository.get_scenarios_by_edge(edge_desc)])
+
+        trigger_filter = repository.get_trigger_filter()
+        self.assertTrue(trigger_filter(alarm, True))
+        for match_plan in scenario.match_plans:
+            alarm_id = [v_id for v_id in match_plan.vertex_ids
+                        if v_id != 'host'][0]
+            self.assertThat(match_plan.filters[alarm_id],
+                            matchers.HasLength(2))
+            self.assertThat(match_plan.filters['host'],
+                            matchers.HasLength(1))
@@ -124,6 +124,9 @@ def rand_vertex_id(entity_type, items_count, max_id):
 
 class GraphTestBase(base.BaseTest):
 
+    # The graph driver under test
+    graph_driver = NXGraph
+
     def __init__(self, *args, **kwds):
         super(GraphTestBase, self).__init__(*args, **kwds)
 
@@ -139,7 +142,7 @@ class GraphTestBase(base.BaseTest):
                              num_of_tests_per_host):
 
         start = time.time()
-        g = NXGraph(name)
+        g = cls.graph_driver(name)
         g.add_vertex(v_node)
         g.add_vertex(v_switch)
         g.add_edge(e_node_to_switch)
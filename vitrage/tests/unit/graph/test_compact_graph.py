@@ -0,0 +1,80 @@
+# Copyright 2018 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+test_vitrage compact graph
+----------------------------------
+
+Runs the graph driver and graph algorithm tests against the compact graph
+"""
+from testtools import matchers
+
+from vitrage.common.constants import VertexProperties as VProps
+from vitrage.graph.driver.compact_graph import CompactGraph
+from vitrage.tests.unit.graph import test_graph
+from vitrage.tests.unit.graph import test_graph_algo
+from vitrage.tests.unit.graph import test_sub_graph_matching
+
+
+class TestCompactGraph(test_graph.TestGraph):
+
+    graph_driver = CompactGraph
+
+    def test_reuse_removed_rows(self):
+        g = CompactGraph('test_reuse_removed_rows')
+        g.add_vertex(test_graph.v_node)
+        g.add_vertex(test_graph.v_host)
+        g.add_edge(test_graph.e_node_to_host)
+        g.remove_vertex(test_graph.v_host)
+        self.assertEqual(0, g.num_edges(), 'vertex edges are removed')
+
+        g.add_vertex(test_graph.v_instance)
+        g.add_edge(test_graph.e_node_to_switch)
+        self.assertThat(g, matchers.HasLength(3))
+        self.assertEqual(test_graph.v_instance,
+                         g.get_vertex(test_graph.v_instance.vertex_id),
+                         'vertex in a reused row has only its properties')
+        self.assertThat(g.neighbors(test_graph.v_instance.vertex_id),
+                        matchers.HasLength(0),
+                        'vertex in a reused row has only its edges')
+
+    def test_gpickle(self):
+        g = CompactGraph('test_gpickle')
+        g.add_vertex(test_graph.v_node)
+        g.add_vertex(test_graph.v_host)
+        g.add_vertex(test_graph.v_switch)
+        g.add_edge(test_graph.e_node_to_host)
+        g.add_edge(test_graph.e_node_to_switch)
+        g.remove_vertex(test_graph.v_host)
+
+        graph = CompactGraph.read_gpickle(g.write_gpickle())
+        self.assert_graph_equal(g, graph)
+        self.assertThat(
+            graph.get_vertices(vertex_attr_filter={
+                VProps.VITRAGE_TYPE: test_graph.SWITCH}),
+            matchers.HasLength(1), 'the index is rebuilt')
+        graph.add_vertex(test_graph.v_host)
+        self.assertThat(graph, matchers.HasLength(3),
+                        'free rows are reused after loading')
+
+
+class TestCompactGraphAlgorithm(test_graph_algo.GraphAlgorithmTest):
+
+    graph_driver = CompactGraph
+
+
+class TestCompactSubGraphMatching(
+        test_sub_graph_matching.SubGraphMatchingTest):
+
+    graph_driver = CompactGraph
@@ -33,7 +33,7 @@ LOG = logging.getLogger(__name__)
 class TestGraph(GraphTestBase):
 
     def test_graph(self):
-        g = NXGraph('test_graph')
+        g = self.graph_driver('test_graph')
         self.assertEqual('test_graph', g.name, 'graph name')
         self.assertThat(g, IsEmpty(), 'graph __len__')
 
@@ -68,7 +68,7 @@ class TestGraph(GraphTestBase):
                          'graph copy vertex unchanged after update')
 
     def test_vertex_crud(self):
-        g = NXGraph('test_vertex_crud')
+        g = self.graph_driver('test_vertex_crud')
         g.add_vertex(v_node)
         v = g.get_vertex(v_node.vertex_id)
         self.assertEqual(v_node[VProps.ID], v[VProps.ID],
@@ -141,7 +141,7 @@ class TestGraph(GraphTestBase):
     def test_update_vertices(self):
 
         # Test Setup
-        g = NXGraph('test_update_vertices')
+        g = self.graph_driver('test_update_vertices')
         g.add_vertex(v_node)
         v_node_copy = g.get_vertex(v_node.vertex_id)
         v_node_copy[VProps.NAME] = 'test_node'
@@ -163,7 +163,7 @@ class TestGraph(GraphTestBase):
         self.assertEqual('test_host', updated_v_host[VProps.NAME])
 
     def test_edge_crud(self):
-        g = NXGraph('test_edge_crud')
+        g = self.graph_driver('test_edge_crud')
         g.add_vertex(v_node)
         g.add_vertex(v_host)
         g.add_edge(e_node_to_host)
@@ -257,6 +257,52 @@ class TestGraph(GraphTestBase):
         edge = g.get_edge(None, v_node.vertex_id, '333')
         self.assertIsNone(edge)
 
+    def test_read_only_views(self):
+        g = self.graph_driver('test_read_only_views')
+        g.add_vertex(v_node)
+        g.add_vertex(v_host)
+        g.add_edge(e_node_to_host)
+
+        v = g.get_vertex(v_host.vertex_id, read_only=True)
+        self.assertEqual(v_host, v, 'vertex view equals the vertex')
+        e = g.get_edge(e_node_to_host.source_id, e_node_to_host.target_id,
+                       e_node_to_host.label, read_only=True)
+        self.assertEqual(e_node_to_host, e, 'edge view equals the edge')
+
+        def set_property(element):
+            element['KUKU'] = 'KUKU'
+
+        def delete_property(element):
+            del element[VProps.VITRAGE_TYPE]
+
+        self.assertRaises(TypeError, set_property, v)
+        self.assertRaises(TypeError, delete_property, v)
+        self.assertRaises(TypeError, set_property, e)
+
+        # A view reflects the changes of the graph element
+        updated_v = g.get_vertex(v_host.vertex_id)
+        updated_v['KUKU'] = 'KUKU'
+        g.update_vertex(updated_v)
+        self.assertEqual('KUKU', v.get('KUKU'), 'view reflects the update')
+
+        # A copy of a view can be changed, without changing the graph
+        v_copy = v.copy()
+        v_copy['KUKU'] = 'KAKA'
+        self.assertEqual('KUKU', g.get_vertex(v_host.vertex_id)['KUKU'],
+                         'changing a view copy should not affect the graph')
+
+        views = g.get_vertices(
+            vertex_attr_filter={VProps.VITRAGE_TYPE: NOVA_HOST_DATASOURCE},
+            read_only=True)
+        self.assertThat(views, matchers.HasLength(1))
+        self.assertRaises(TypeError, set_property, views[0])
+        views = g.neighbors(v_node.vertex_id, read_only=True)
+        self.assertThat(views, matchers.HasLength(1))
+        self.assertRaises(TypeError, set_property, views[0])
+        views = g.get_edges(v_node.vertex_id, read_only=True)
+        self.assertThat(views, matchers.HasLength(1))
+        self.assertRaises(TypeError, set_property, views.pop())
+
     def test_neighbors(self):
         relationship_a = 'RELATIONSHIP_A'
         relationship_b = 'RELATIONSHIP_B'
@@ -271,7 +317,7 @@ class TestGraph(GraphTestBase):
             vitrage_category=EntityCategory.RESOURCE,
             vitrage_type=NOVA_HOST_DATASOURCE)
 
-        g = NXGraph('test_neighbors')
+        g = self.graph_driver('test_neighbors')
         g.add_vertex(v1)
         g.add_vertex(v2)
         g.add_vertex(v3)
@@ -401,7 +447,7 @@ class TestGraph(GraphTestBase):
                                'Check neighbors for not connected vertex')
 
     def test_get_vertices(self):
-        g = NXGraph('test_get_vertices')
+        g = self.graph_driver('test_get_vertices')
         g.add_vertex(v_node)
         g.add_vertex(v_host)
         g.add_edge(e_node_to_host)
@@ -427,6 +473,93 @@ class TestGraph(GraphTestBase):
         self.assertEqual(OPENSTACK_CLUSTER, found_vertex[VProps.VITRAGE_TYPE],
                          'get_vertices check node vertex')
 
+    def test_get_vertices_indexed_properties(self):
+        g = self.graph_driver('test_get_vertices_indexed_properties')
+        g.add_vertex(v_node)
+        g.add_vertex(v_host)
+        g.add_vertex(v_instance)
+        g.add_vertex(v_alarm)
+        host_query = {'==': {VProps.VITRAGE_TYPE: NOVA_HOST_DATASOURCE}}
+        resources_query = {
+            'and': [
+                {'==': {VProps.VITRAGE_CATEGORY: RESOURCE}},
+                {'or': [
+                    {'==': {VProps.VITRAGE_TYPE: NOVA_HOST_DATASOURCE}},
+                    {'==': {VProps.VITRAGE_TYPE: NOVA_INSTANCE_DATASOURCE}}
+                ]}
+            ]
+        }
+
+        self.assertThat(g.get_vertices(query_dict=host_query),
+                        matchers.HasLength(1),
+                        'get_vertices by indexed vitrage_type')
+        self.assertThat(g.get_vertices(query_dict=resources_query),
+                        matchers.HasLength(2),
+                        'get_vertices by indexed and/or query')
+
+        # The index follows the updates of the vertex
+        updated_host = g.get_vertex(v_host.vertex_id)
+        updated_host[VProps.VITRAGE_TYPE] = SWITCH
+        g.update_vertex(updated_host)
+        self.assertThat(g.get_vertices(query_dict=host_query), IsEmpty(),
+                        'vitrage_type removed from the index on update')
+        self.assertThat(
+            g.get_vertices(vertex_attr_filter={VProps.VITRAGE_TYPE: SWITCH}),
+            matchers.HasLength(1),
+            'vitrage_type added to the index on update')
+
+        # A property set to None is indexed as a missing property
+        updated_host[VProps.VITRAGE_TYPE] = None
+        g.update_vertex(updated_host)
+        self.assertThat(
+            g.get_vertices(vertex_attr_filter={VProps.VITRAGE_TYPE: SWITCH}),
+            IsEmpty(), 'deleted vitrage_type removed from the index')
+        self.assertThat(
+            g.get_vertices(query_dict={'==': {VProps.VITRAGE_TYPE: None}}),
+            matchers.HasLength(1), 'deleted vitrage_type indexed as None')
+
+        # The index follows the removal of the vertex
+        g.remove_vertex(v_instance)
+        self.assertThat(g.get_vertices(query_dict=resources_query),
+                        IsEmpty(), 'removed vertex removed from the index')
+        self.assertThat(
+            g.get_vertices(query_dict={'==': {VProps.VITRAGE_CATEGORY: ALARM,
+                                              VProps.VITRAGE_IS_DELETED:
+                                                  False}}),
+            matchers.HasLength(1), 'get_vertices by two indexed properties')
+
+    def test_compact_elements(self):
+        self.assertFalse(hasattr(v_host, '__dict__'), 'vertex has no __dict__')
+        self.assertFalse(hasattr(e_node_to_host, '__dict__'),
+                         'edge has no __dict__')
+        self.assertRaises(AttributeError, setattr, v_host, 'x', 1)
+
+        self.assertEqual(v_host, v_host.copy(), 'copied vertex equals')
+        self.assertNotEqual(v_host, v_instance, 'other vertex not equals')
+        self.assertNotEqual(v_host, e_node_to_host, 'vertex not equals edge')
+        self.assertEqual(e_node_to_host, e_node_to_host.copy(),
+                         'copied edge equals')
+        self.assertNotEqual(e_node_to_host, e_node_to_switch,
+                            'other edge not equals')
+
+        # Property keys and enum-like values are shared between the elements
+        vitrage_type = ''.join(['nova', '.', 'host'])
+        state = ''.join(['ACT', 'IVE'])
+        name = ''.join(['host', '-1'])
+        v1 = graph_utils.create_vertex('1', vitrage_type=vitrage_type,
+                                       entity_state=state,
+                                       metadata={name: name})
+        v2 = graph_utils.create_vertex('2', vitrage_type=NOVA_HOST_DATASOURCE,
+                                       entity_state='ACTIVE',
+                                       metadata={'host-1': 'host-1'})
+        self.assertIs(v1[VProps.VITRAGE_TYPE], v2[VProps.VITRAGE_TYPE],
+                      'vitrage_type is interned')
+        self.assertIs(v1[VProps.STATE], v2[VProps.STATE], 'state is interned')
+        v1_key = [k for k in v1.properties if k == name][0]
+        v2_key = [k for k in v2.properties if k == name][0]
+        self.assertIs(v1_key, v2_key, 'property key is interned')
+        self.assertIsNot(v1[name], v2[name], 'other values are not interned')
+
     def _check_callback_result(self, result, msg, exp_prev, exp_curr):
 
         def assert_none_or_equals(exp, act, message):
@@ -451,7 +584,7 @@ class TestGraph(GraphTestBase):
     # noinspection PyAttributeOutsideInit
     def test_graph_callbacks(self):
 
-        g = NXGraph('test_graph_callbacks')
+        g = self.graph_driver('test_graph_callbacks')
         self.result = None
 
         def callback(pre_item,
@@ -497,6 +630,136 @@ class TestGraph(GraphTestBase):
         self._check_callback_result(self.result, 'update edge', e_node_to_host,
                                     updated_edge)
 
+    def test_graph_batch_callbacks(self):
+        g = self.graph_driver('test_graph_batch_callbacks')
+        g.add_vertex(v_host)
+        results = []
+
+        def callback(pre_item, current_item, is_vertex, graph):
+            results.append((pre_item, current_item, is_vertex))
+
+        immediate_results = []
+
+        def immediate_callback(pre_item, current_item, is_vertex, graph):
+            immediate_results.append((pre_item, current_item, is_vertex))
+
+        g.subscribe(callback)
+        g.subscribe(immediate_callback, immediate=True)
+
+        with g.batch():
+            g.add_vertex(v_node)
+            with g.batch():
+                g.add_edge(e_node_to_host)
+                updated_host = g.get_vertex(v_host.vertex_id)
+                updated_host['ZIG'] = 'ZAG'
+                g.update_vertex(updated_host)
+            updated_node = g.get_vertex(v_node.vertex_id)
+            updated_node['ZIG'] = 'ZAG'
+            g.update_vertex(updated_node)
+            self.assertThat(results, IsEmpty(),
+                            'Got notifications inside a batch')
+
+        # one notification per element, in the order of the first change,
+        # with the state before the batch and the state at its end
+        self.assertThat(results, matchers.HasLength(3))
+        self._check_callback_result(results[0], 'add vertex',
+                                    None, updated_node)
+        self._check_callback_result(results[1], 'add edge',
+                                    None, e_node_to_host)
+        self._check_callback_result(results[2], 'update vertex',
+                                    v_host, updated_host)
+        self.assertEqual([True, False, True], [r[2] for r in results])
+        self.assertThat(immediate_results, matchers.HasLength(4),
+                        'immediate subscribers get every change')
+
+        # a removed element is notified with its last state
+        del results[:]
+        with g.batch():
+            updated_edge = g.get_edge(e_node_to_host.source_id,
+                                      e_node_to_host.target_id,
+                                      e_node_to_host.label)
+            updated_edge[EProps.VITRAGE_IS_DELETED] = True
+            g.update_edge(updated_edge)
+            g.remove_vertex(v_node)
+        self.assertThat(results, matchers.HasLength(1))
+        self._check_callback_result(results[0], 'remove vertex',
+                                    e_node_to_host, updated_edge)
+
+        # apply_changes notifies like a batch
+        del results[:]
+        g.apply_changes([(g.add_vertex, v_node),
+                         (g.update_vertex, updated_node),
+                         (g.add_edge, e_node_to_host)])
+        self.assertThat(results, matchers.HasLength(2))
+        self._check_callback_result(results[0], 'apply changes',
+                                    None, updated_node)
+
+    def test_graph_muted_callbacks(self):
+        g = self.graph_driver('test_graph_muted_callbacks')
+        results = []
+
+        def callback(pre_item, current_item, is_vertex, graph):
+            results.append((pre_item, current_item, is_vertex))
+
+        g.subscribe(callback)
+        g.subscribe(callback, immediate=True)
+
+        with g.muted():
+            g.add_vertex(v_node)
+            with g.batch():
+                g.add_vertex(v_host)
+        self.assertThat(results, IsEmpty(), 'Got notifications when muted')
+
+        with g.batch():
+            g.add_edge(e_node_to_host)
+            with g.muted():
+                g.update_vertex(v_host)
+        self.assertThat(results, matchers.HasLength(2))
+        self.assertEqual([False, False], [r[2] for r in results])
+
+    def test_unsubscribe_all(self):
+        g = self.graph_driver('test_unsubscribe_all')
+        results = []
+
+        def callback(pre_item, current_item, is_vertex, graph):
+            results.append(current_item)
+
+        g.subscribe(callback)
+        g.subscribe(callback, immediate=True)
+        g.unsubscribe_all()
+
+        self.assertFalse(g.is_subscribed())
+        g.add_vertex(v_node)
+        self.assertThat(results, IsEmpty())
+
+    def test_frozen_graph(self):
+        g = self.graph_driver('test_frozen_graph')
+        g.add_vertex(v_node)
+        g.add_vertex(v_host)
+        g.add_edge(e_node_to_host)
+        g.freeze()
+
+        vertex = g.get_vertex(v_node.vertex_id)
+        vertex[VProps.VITRAGE_CATEGORY] = ALARM
+        edge = g.get_edge(e_node_to_host.source_id,
+                          e_node_to_host.target_id,
+                          e_node_to_host.label)
+        self.assertRaises(TypeError, g.add_vertex, v_instance)
+        self.assertRaises(TypeError, g.update_vertex, vertex)
+        self.assertRaises(TypeError, g.remove_vertex, vertex)
+        self.assertRaises(TypeError, g.add_edge, e_node_to_switch)
+        self.assertRaises(TypeError, g.update_edge, edge)
+        self.assertRaises(TypeError, g.remove_edge, edge)
+        self.assertRaises(TypeError, g.union, self.graph_driver('other'))
+
+        self.assertThat(g, matchers.HasLength(2))
+        self.assertEqual(
+            v_node[VProps.VITRAGE_CATEGORY],
+            g.get_vertex(v_node.vertex_id)[VProps.VITRAGE_CATEGORY])
+        graph_copy = g.copy()
+        graph_copy.add_vertex(v_instance)
+        self.assertThat(graph_copy, matchers.HasLength(3))
+
     def test_union(self):
         v1 = v_node
         v2 = v_host
@@ -513,14 +776,14 @@ class TestGraph(GraphTestBase):
                                     target_id=v4.vertex_id,
                                     relationship_type='KUKU_v3_v4')
 
-        g1 = NXGraph('test_union')
+        g1 = self.graph_driver('test_union')
         g1.add_vertex(v1)
         g1.add_vertex(v2)
         g1.add_vertex(v3)
         g1.add_edge(e_v1_v2)
         g1.add_edge(e_v2_v3)
 
-        g2 = NXGraph('test_union_')
+        g2 = self.graph_driver('test_union_')
         g2.add_vertex(v3)
         g2.add_vertex(v4)
         g2.add_edge(e_v3_v4)
@@ -0,0 +1,116 @@
+# Copyright 2018 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+test_vitrage graph query
+----------------------------------
+
+Tests for `vitrage` graph query compilation
+"""
+
+from vitrage.common.constants import VertexProperties as VProps
+from vitrage.common.exception import VitrageError
+from vitrage.graph.query import compile_query
+from vitrage.graph.query import create_predicate
+from vitrage.graph.query import get_equality_constraints
+from vitrage.tests import base
+
+QUERY = {
+    'and': [
+        {'==': {VProps.VITRAGE_CATEGORY: 'ALARM'}},
+        {'or': [
+            {'>': {VProps.UPDATE_TIMESTAMP: 150}},
+            {'==': {VProps.VITRAGE_IS_DELETED: True}}
+        ]}
+    ]
+}
+
+
+class TestQuery(base.BaseTest):
+
+    def test_create_predicate(self):
+        match = create_predicate(QUERY)
+
+        self.assertTrue(match({VProps.VITRAGE_CATEGORY: 'ALARM',
+                               VProps.UPDATE_TIMESTAMP: 200,
+                               VProps.VITRAGE_IS_DELETED: False}))
+        self.assertTrue(match({VProps.VITRAGE_CATEGORY: 'ALARM',
+                               VProps.UPDATE_TIMESTAMP: 100,
+                               VProps.VITRAGE_IS_DELETED: True}))
+        self.assertFalse(match({VProps.VITRAGE_CATEGORY: 'ALARM',
+                                VProps.UPDATE_TIMESTAMP: 100,
+                                VProps.VITRAGE_IS_DELETED: False}))
+        self.assertFalse(match({VProps.VITRAGE_CATEGORY: 'RESOURCE',
+                                VProps.UPDATE_TIMESTAMP: 200,
+                                VProps.VITRAGE_IS_DELETED: True}))
+
+    def test_create_predicate_operators(self):
+        item = {VProps.NAME: 'b', VProps.UPDATE_TIMESTAMP: 5}
+
+        self.assertTrue(create_predicate({'<': {VProps.NAME: 'c'}})(item))
+        self.assertTrue(create_predicate({'<=': {VProps.NAME: 'b'}})(item))
+        self.assertTrue(create_predicate({'!=': {VProps.NAME: 'a'}})(item))
+        self.assertTrue(create_predicate({'>=': {VProps.NAME: 'b'}})(item))
+        self.assertFalse(create_predicate({'>': {VProps.NAME: 'b'}})(item))
+        self.assertTrue(create_predicate(
+            {'==': {VProps.NAME: 'b', VProps.UPDATE_TIMESTAMP: 5}})(item))
+        self.assertFalse(create_predicate(
+            {'==': {VProps.NAME: 'b', VProps.UPDATE_TIMESTAMP: 6}})(item))
+        self.assertTrue(create_predicate({'==': {VProps.ID: None}})(item))
+
+    def test_invalid_query(self):
+        self.assertRaises(VitrageError, create_predicate,
+                          {'=': {VProps.NAME: 'b'}})
+        self.assertRaises(VitrageError, create_predicate,
+                          {'and': {'==': {VProps.NAME: 'b'}}})
+
+    def test_compiled_query_cache(self):
+        query_copy = {
+            'and': [
+                {'==': {VProps.VITRAGE_CATEGORY: 'ALARM'}},
+                {'or': [
+                    {'>': {VProps.UPDATE_TIMESTAMP: 150}},
+                    {'==': {VProps.VITRAGE_IS_DELETED: True}}
+                ]}
+            ]
+        }
+        other_query = {'==': {VProps.VITRAGE_CATEGORY: 'ALARM'}}
+
+        self.assertIs(compile_query(QUERY), compile_query(query_copy))
+        self.assertIsNot(compile_query(QUERY), compile_query(other_query))
+
+    def test_get_equality_constraints(self):
+        query = {
+            'and': [
+                {'==': {VProps.VITRAGE_CATEGORY: 'RESOURCE'}},
+                {'==': {VProps.VITRAGE_IS_DELETED: False}},
+                {'or': [
+                    {'==': {VProps.VITRAGE_TYPE: 'nova.host'}},
+                    {'==': {VProps.VITRAGE_TYPE: 'nova.instance',
+                            VProps.NAME: 'vm'}}
+                ]},
+                {'or': [
+                    {'==': {VProps.PROJECT_ID: 'project'}},
+                    {'>': {VProps.UPDATE_TIMESTAMP: 150}}
+                ]}
+            ]
+        }
+
+        self.assertEqual(
+            {VProps.VITRAGE_CATEGORY: {'RESOURCE'},
+             VProps.VITRAGE_IS_DELETED: {False},
+             VProps.VITRAGE_TYPE: {'nova.host', 'nova.instance'}},
+            get_equality_constraints(query))
+        self.assertEqual(get_equality_constraints(query),
+                         compile_query(query).constraints)
@@ -0,0 +1,247 @@
+# Copyright 2018 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+test_vitrage sub graph matching
+----------------------------------
+
+Differential test of the subgraph matching against the breadth first
+implementation it replaced
+"""
+import itertools
+
+from vitrage.common.constants import EdgeProperties as EProps
+from vitrage.graph.algo_driver.algorithm import Mapping
+from vitrage.graph.algo_driver.sub_graph_matching import MatchPlan
+from vitrage.graph.algo_driver.sub_graph_matching import NEG_CONDITION
+from vitrage.graph.algo_driver.sub_graph_matching import subgraph_matching
+from vitrage.graph.driver.graph import Direction
+from vitrage.tests.unit.graph.base import *  # noqa
+from vitrage.tests.unit.graph import bfs_sub_graph_matching
+
+NODE = (RESOURCE, OPENSTACK_CLUSTER)
+HOST = (RESOURCE, NOVA_HOST_DATASOURCE)
+VM = (RESOURCE, NOVA_INSTANCE_DATASOURCE)
+SWITCH_ = (RESOURCE, SWITCH)
+HOST_ALARM = (ALARM, ALARM_ON_HOST)
+VM_ALARM = (ALARM, ALARM_ON_VM)
+HOST_TEST = (TEST, TEST_ON_HOST)
+
+# template vertices, and template edges between their indexes
+TEMPLATES = [
+    ([HOST_ALARM, HOST],
+     [(0, 1, ELabel.ON)]),
+    ([HOST_ALARM, HOST, VM],
+     [(0, 1, ELabel.ON), (1, 2, ELabel.CONTAINS)]),
+    ([NODE, HOST, VM, VM_ALARM],
+     [(0, 1, ELabel.CONTAINS), (1, 2, ELabel.CONTAINS), (3, 2, ELabel.ON)]),
+    ([NODE, HOST, SWITCH_],
+     [(0, 1, ELabel.CONTAINS), (1, 2, 'USES'), (0, 2, ELabel.CONTAINS)]),
+    ([HOST_ALARM, HOST, VM, VM_ALARM, HOST_TEST],
+     [(0, 1, ELabel.ON), (1, 2, ELabel.CONTAINS), (3, 2, ELabel.ON),
+      (4, 1, ELabel.ON)]),
+    ([HOST, VM, VM, VM_ALARM, VM_ALARM],
+     [(0, 1, ELabel.CONTAINS), (0, 2, ELabel.CONTAINS), (3, 1, ELabel.ON),
+      (4, 2, ELabel.ON)]),
+]
+
+
+class SubGraphMatchingTest(GraphTestBase):
+
+    @classmethod
+    def setUpClass(cls):
+        super(SubGraphMatchingTest, cls).setUpClass()
+        cls.vm_id = 10000000
+        cls.vm_alarm_id = 30000000
+        cls.vms = []
+        cls.host_alarm_id = 20000000
+        cls.host_test_id = 40000000
+        cls.entity_graph = cls._create_entity_graph(
+            'entity_graph',
+            num_of_hosts_per_node=3,
+            num_of_vms_per_host=3,
+            num_of_alarms_per_host=2,
+            num_of_alarms_per_vm=2,
+            num_of_tests_per_host=1)
+
+        # deleted edges, for the negative conditions
+        edges = [e for v_id in (cls.vms[0].vertex_id,
+                                cls.vms[4].vertex_id,
+                                NOVA_HOST_DATASOURCE + '1')
+                 for e in cls.entity_graph.get_edges(v_id)]
+        for i, edge in enumerate(sorted(
+                edges, key=lambda e: (e.source_id, e.target_id, e.label))):
+            if i % 2:
+                edge[EProps.VITRAGE_IS_DELETED] = True
+                cls.entity_graph.update_edge(edge)
+
+    def test_differential_vertex_matches(self):
+        for template in self._templates():
+            for t_vertex in template.get_vertices():
+                for g_vertex in self._graph_vertices(t_vertex):
+                    for validate in (False, True):
+                        self._assert_same_matches(
+                            template, Mapping(t_vertex, g_vertex, True),
+                            validate)
+
+    def test_differential_edge_matches(self):
+        for template in self._templates():
+            for t_vertex in template.get_vertices():
+                for t_edge in template.get_edges(t_vertex.vertex_id,
+                                                 direction=Direction.OUT):
+                    for g_edge in self._graph_edges(template, t_edge):
+                        self._assert_same_matches(
+                            template, Mapping(t_edge, g_edge, False), True)
+
+    def test_match_plan(self):
+        template = list(self._templates())[1]
+        t_vertex = template.get_vertex('0')
+        g_vertex = self._graph_vertices(t_vertex)[0]
+        known_match = Mapping(t_vertex, g_vertex, True)
+
+        self.assertEqual(
+            subgraph_matching(self.entity_graph, template, [known_match]),
+            subgraph_matching(self.entity_graph, MatchPlan(template),
+                              [known_match]))
+
+    def test_match_plan_steps(self):
+        plan = MatchPlan(self._template(1, (False, False)))
+
+        steps, complete = plan.steps(frozenset(['0']))
+        self.assertTrue(complete)
+        self.assertEqual([('0', '1'), ('1', '2')],
+                         [(step.mapped_id, step.v_id) for step in steps])
+        self.assertEqual([ELabel.ON], [e.label for e in steps[0].pos_edges])
+
+        steps, complete = plan.steps(frozenset(['1', '2']))
+        self.assertTrue(complete)
+        self.assertEqual([('1', '0')],
+                         [(step.mapped_id, step.v_id) for step in steps])
+
+    def test_match_plan_positive_edge(self):
+        plan = MatchPlan(self._template(1, (False, True)))
+        positive_plan = MatchPlan(self._template(1, (False, False)))
+        edge_key = ('1', '2', ELabel.CONTAINS)
+
+        self.assertTrue(plan.get_edge(*edge_key).negative)
+        self.assertIsNone(plan.positive_edge_plan('0', '1', ELabel.ON))
+        switched = plan.positive_edge_plan(*edge_key)
+        self.assertFalse(switched.get_edge(*edge_key).negative)
+        self.assertFalse(
+            switched.get_edge(*edge_key).get(EProps.VITRAGE_IS_DELETED))
+
+        for g_edge in self._graph_edges(self._template(1, (False, False)),
+                                        plan.get_edge(*edge_key)):
+            self.assertEqual(
+                subgraph_matching(
+                    self.entity_graph, positive_plan,
+                    [Mapping(positive_plan.get_edge(*edge_key), g_edge,
+                             False)]),
+                subgraph_matching(
+                    self.entity_graph, switched,
+                    [Mapping(switched.get_edge(*edge_key), g_edge, False)]))
+
+    def test_match_plan_connected_component(self):
+        plan = MatchPlan(self._template(2, (False, True, False)))
+
+        self.assertEqual(frozenset(['0', '1']), plan.connected_component('0'))
+        self.assertEqual(frozenset(['2', '3']), plan.connected_component('3'))
+        self.assertEqual(frozenset(), plan.connected_component('4'))
+
+    def test_match_plan_equivalent_properties(self):
+        host_alarm = self._template(0, (False,))
+        host_test = self._template(0, (False,))
+        test_props = host_test.get_vertex('0')
+        test_props[VProps.VITRAGE_CATEGORY] = TEST
+        test_props[VProps.VITRAGE_TYPE] = TEST_ON_HOST
+        host_test.update_vertex(test_props)
+        plan = MatchPlan(host_alarm,
+                         equivalent_properties={'0': [test_props.properties]})
+
+        matched_types = set()
+        for g_vertex in self._graph_vertices(host_alarm.get_vertex('1')):
+            known_match = Mapping(host_alarm.get_vertex('1'), g_vertex, True)
+            expected = \
+                subgraph_matching(self.entity_graph, host_alarm,
+                                  [known_match]) + \
+                subgraph_matching(self.entity_graph, host_test, [known_match])
+            self.assertEqual(
+                sorted(m['0'].vertex_id for m in expected),
+                sorted(m['0'].vertex_id for m in subgraph_matching(
+                    self.entity_graph, plan, [known_match])))
+            matched_types.update(m['0'][VProps.VITRAGE_TYPE]
+                                 for m in expected)
+        self.assertEqual({ALARM_ON_HOST, TEST_ON_HOST}, matched_types)
+
+        # a validated known match may be an equivalent vertex
+        for g_vertex in self._graph_vertices(host_test.get_vertex('0')):
+            known_match = Mapping(host_alarm.get_vertex('0'), g_vertex, True)
+            self.assertEqual(
+                [], subgraph_matching(self.entity_graph, host_alarm,
+                                      [known_match], True))
+            self.assertEqual(
+                subgraph_matching(self.entity_graph, host_test,
+                                  [known_match], True),
+                subgraph_matching(self.entity_graph, plan,
+                                  [known_match], True))
+
+    def _assert_same_matches(self, template, known_match, validate):
+        expected = bfs_sub_graph_matching.subgraph_matching(
+            self.entity_graph, template, [known_match], validate)
+        actual = subgraph_matching(
+            self.entity_graph, template, [known_match], validate)
+        self.assertEqual(expected, actual,
+                         'template %s known match %s' %
+                         (template.name, str(known_match)))
+
+    def _templates(self):
+        """All the templates, with every combination of negative edges"""
+        for index, (vertices, edges) in enumerate(TEMPLATES):
+            for negatives in itertools.product((False, True),
+                                               repeat=len(edges)):
+                yield self._template(index, negatives)
+
+    def _template(self, index, negatives):
+        vertices, edges = TEMPLATES[index]
+        template = self.graph_driver(
+            'template %s negative edges %s' % (index, negatives))
+        for i, (category, vitrage_type) in enumerate(vertices):
+            t_vertex = graph_utils.create_vertex(
+                vitrage_id=str(i),
+                vitrage_category=category,
+                vitrage_type=vitrage_type)
+            del t_vertex[VProps.VITRAGE_ID]
+            template.add_vertex(t_vertex)
+        for (source, target, label), negative in zip(edges, negatives):
+            t_edge = graph_utils.create_edge(str(source), str(target), label)
+            if negative:
+                t_edge[NEG_CONDITION] = True
+                t_edge[EProps.VITRAGE_IS_DELETED] = True
+            template.add_edge(t_edge)
+        return template
+
+    def _graph_vertices(self, t_vertex):
+        return sorted(
+            self.entity_graph.get_vertices(vertex_attr_filter={
+                VProps.VITRAGE_CATEGORY: t_vertex[VProps.VITRAGE_CATEGORY],
+                VProps.VITRAGE_TYPE: t_vertex[VProps.VITRAGE_TYPE]}),
+            key=lambda v: v.vertex_id)[:4]
+
+    def _graph_edges(self, template, t_edge):
+        source = template.get_vertex(t_edge.source_id)
+        edges = [e for v in self._graph_vertices(source)
+                 for e in self.entity_graph.get_edges(
+                     v.vertex_id, direction=Direction.OUT)
+                 if e.label == t_edge.label]
+        return sorted(edges, key=lambda e: (e.source_id, e.target_id))[:4]